@@ -0,0 +1,49 @@
+"""Compare hashing engines from pythagoras hash_signatures.
+
+Usage: python benchmarks/hash_signatures_benchmark.py
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_hash_signature, HASHING_ENGINES)
+
+
+def make_values() -> dict:
+    rng = np.random.default_rng(42)
+    values = dict()
+    values["bytes, 64 MB"] = rng.bytes(2**26)
+    values["float64 array, 128 MB"] = rng.random(2**24)
+    values["float64 array, F-order"] = np.asfortranarray(
+        rng.random((4096, 4096)))
+    values["DataFrame, 10 numeric cols"] = pd.DataFrame(
+        rng.random((1_000_000, 10)), columns=[f"c{i}" for i in range(10)])
+    values["DataFrame, mixed cols"] = pd.DataFrame({
+        "x": rng.random(200_000)
+        , "s": [str(i) for i in range(200_000)]})
+    try:
+        import torch
+        values["float32 tensor, 64 MB"] = torch.rand(2**24)
+    except ImportError:
+        pass
+    values["small dict"] = {"a": 1, "b": [1, 2, 3], "c": "text"}
+    return values
+
+
+def main(repeat: int = 3) -> None:
+    values = make_values()
+    print(f"{'value':<30}" + "".join(f"{e:>12}" for e in HASHING_ENGINES))
+    for name, value in values.items():
+        timings = []
+        for engine in HASHING_ENGINES:
+            t = min(timeit.repeat(
+                lambda: get_hash_signature(value, engine)
+                , number=1, repeat=repeat))
+            timings.append(t)
+        print(f"{name:<30}" + "".join(f"{t:>11.4f}s" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
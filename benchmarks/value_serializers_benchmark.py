@@ -0,0 +1,74 @@
+"""Compare write / read times of value serializers against pickle.
+
+Usage: python benchmarks/value_serializers_benchmark.py
+"""
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from pythagoras._800_persidict_extensions.value_serializers import (
+    VALUE_SERIALIZERS)
+
+
+def make_values() -> dict:
+    rng = np.random.default_rng(42)
+    values = dict()
+    values["float64 array, 128 MB"] = rng.random(2**24)
+    values["DataFrame, 10 numeric cols"] = pd.DataFrame(
+        rng.random((1_000_000, 10)), columns=[f"c{i}" for i in range(10)])
+    values["DataFrame, mixed cols"] = pd.DataFrame({
+        "x": rng.random(200_000)
+        , "s": [str(i) for i in range(200_000)]})
+    try:
+        import torch
+        values["float32 tensor, 64 MB"] = torch.rand(2**24)
+    except ImportError:
+        pass
+    return values
+
+
+def touch(value) -> None:
+    """Read all numeric data of a value.
+
+    Otherwise memory-mapped formats would look unfairly fast.
+    """
+    if isinstance(value, pd.DataFrame):
+        value = value.select_dtypes("number").to_numpy()
+    np.asarray(value).sum()
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    values = make_values()
+    print(f"{'value':<30}{'format':>10}{'write':>10}{'read':>10}{'MB':>10}")
+    with tempfile.TemporaryDirectory() as dir_name:
+        for name, value in values.items():
+            file_name = os.path.join(dir_name, "value.pkl")
+            write = timed(lambda: joblib.dump(value, file_name))
+            read = timed(lambda: touch(joblib.load(file_name)))
+            size = os.path.getsize(file_name) / 2**20
+            print(f"{name:<30}{'pkl':>10}{write:>9.3f}s{read:>9.3f}s"
+                + f"{size:>10.1f}")
+            for serializer in VALUE_SERIALIZERS:
+                if not serializer.can_save(value):
+                    continue
+                file_name = os.path.join(
+                    dir_name, "value." + serializer.file_type)
+                write = timed(lambda: serializer.save(value, file_name))
+                read = timed(lambda: touch(serializer.load(file_name)))
+                size = os.path.getsize(file_name) / 2**20
+                print(f"{name:<30}{serializer.file_type:>10}{write:>9.3f}s"
+                    + f"{read:>9.3f}s{size:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
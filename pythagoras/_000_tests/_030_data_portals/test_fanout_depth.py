@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pytest
+
+from pythagoras import DataPortal, ValueAddr, NotAllowedError
+from pythagoras import PureCodePortal, pure, migrate_fanout_depth
+from pythagoras import _PortalTester
+from pythagoras._800_persidict_extensions.sharded_dict import (
+    get_shard_names, is_sharded_key, shard_key, unshard_key)
+
+
+def square(x):
+    return x*x
+
+
+def all_files(base_dir, store_name):
+    result = []
+    for dir_name, _, files in os.walk(os.path.join(base_dir, store_name)):
+        result += [os.path.join(dir_name, f)
+            for f in files if not f.startswith(".")]
+    return result
+
+
+def test_shard_keys():
+    assert get_shard_names("len_3_abcdef", 2) == ["ef", "cd"]
+    assert get_shard_names("a", 1) == ["_a"]
+    key = ("int", "abcdef")
+    assert shard_key(key, 2).str_chain == ("int", "ef", "cd", "abcdef")
+    assert unshard_key(shard_key(key, 2), 2).str_chain == key
+    assert shard_key(key, 0).str_chain == key
+    assert is_sharded_key(shard_key(key, 2), 2)
+    assert is_sharded_key(shard_key(("abcdef",), 1), 1)
+    assert not is_sharded_key(key, 1) # stored before sharding
+    assert not is_sharded_key(("int", "EF", "abcdef"), 1)
+
+
+def test_fanout_depth_is_persistent(tmpdir):
+    values = [1, "hello", np.arange(1000), list(range(100))]
+    with _PortalTester(DataPortal, root_dict=tmpdir, fanout_depth=2) as t:
+        addrs = [ValueAddr(v) for v in values]
+        for addr in addrs:
+            file_name, = [f for f in all_files(tmpdir, "value_store")
+                if os.path.basename(f).startswith(addr.hash_signature)]
+            shards = get_shard_names(addr.hash_signature, 2)
+            assert file_name.split(os.sep)[-4:-1] == [addr.prefix, *shards]
+        assert len(t.portal.value_store) == len(values)
+        assert ({k.str_chain for k in t.portal.value_store.keys()}
+            == {a.str_chain for a in addrs})
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        assert t.portal.fanout_depth == 2
+        for addr, value in zip(addrs, values):
+            new_addr = ValueAddr.from_strings(prefix=addr.prefix
+                , hash_signature=addr.hash_signature, assert_readiness=False)
+            assert new_addr.ready
+            assert np.array_equal(new_addr.get(), value)
+    with pytest.raises(NotAllowedError):
+        with _PortalTester(DataPortal, root_dict=tmpdir, fanout_depth=1):
+            pass
+
+
+def test_migrate_fanout_depth(tmpdir):
+    with _PortalTester(PureCodePortal, root_dict=tmpdir
+            , chunking_threshold=2**10) as t:
+        pure_square = pure()(square)
+        for i in range(5):
+            assert pure_square(x=i) == i*i
+        big_addr = ValueAddr(list(range(10_000)))
+        n_files = len(all_files(tmpdir, "value_store"))
+
+    for fanout_depth in [2, 1, 0]:
+        assert migrate_fanout_depth(tmpdir, fanout_depth) > 0
+        assert migrate_fanout_depth(tmpdir, fanout_depth) == 0
+        assert len(all_files(tmpdir, "value_store")) == n_files
+        with _PortalTester(PureCodePortal, root_dict=tmpdir
+                , chunking_threshold=2**10) as t:
+            assert t.portal.fanout_depth == fanout_depth
+            assert len(t.portal.execution_results) == 5
+            pure_square = pure()(square)
+            for i in range(5):
+                address = pure_square.get_address(x=i)
+                assert address.ready
+                assert address.get() == i*i
+            big_value = ValueAddr.from_strings(prefix=big_addr.prefix
+                , hash_signature=big_addr.hash_signature).get()
+            assert big_value == list(range(10_000))
+
+
+def test_migration_finds_layouts_by_key_structure(tmpdir):
+    # A 2-character prefix, equal to the shard name of the hash,
+    # must not be taken for a shard
+    signatures = ["int_abcdef", "str_0123ef"]
+    for prefix in ["ef", "int"]:
+        os.makedirs(os.path.join(tmpdir, "value_store", prefix))
+        for signature in signatures:
+            open(os.path.join(tmpdir, "value_store"
+                , prefix, signature + ".pkl"), "w").close()
+    open(os.path.join(tmpdir, "value_store", "ef", "README"), "w").close()
+
+    assert migrate_fanout_depth(tmpdir, 1) == 4
+    for prefix in ["ef", "int"]:
+        for signature in signatures:
+            assert os.path.exists(os.path.join(tmpdir, "value_store"
+                , prefix, signature[-2:], signature + ".pkl"))
+    assert os.path.exists(os.path.join(tmpdir, "value_store", "ef", "README"))
+    assert migrate_fanout_depth(tmpdir, 2) == 4
+    assert migrate_fanout_depth(tmpdir, 0) == 4
+    assert len(all_files(tmpdir, "value_store")) == 5
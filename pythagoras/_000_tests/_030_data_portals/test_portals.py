@@ -99,4 +99,27 @@ def test_get_portal_basic(tmpdir):
                         with portal1:
                             assert portal1 == DataPortal.get_best_portal_to_use()
                 assert portal2 == DataPortal.get_best_portal_to_use()
-            assert portal1 == DataPortal.get_best_portal_to_use()
\ No newline at end of file
+            assert portal1 == DataPortal.get_best_portal_to_use()
+
+def test_values_are_readdressed_between_hashing_schemes(tmpdir):
+    with _PortalTester():
+        portal1 = DataPortal(tmpdir + "/p1", value_hashing="joblib")
+        portal2 = DataPortal(tmpdir + "/p2", value_hashing="stream")
+
+        with portal1:
+            addr1 = ValueAddr([1, 2, 3])
+        addr2 = ValueAddr(addr1, portal=portal2)
+        assert addr2 != addr1
+        assert addr2 == ValueAddr([1, 2, 3], portal=portal2)
+        assert addr2.get() == [1, 2, 3]
+        assert len(portal2.value_store) == 1
+
+        with portal1:
+            with portal2:
+                # The joblib address can't be used to store the value
+                # in a portal with stream hashing
+                addr = ValueAddr.from_strings(prefix=addr1.prefix
+                    , hash_signature=addr1.hash_signature
+                    , portal=portal2, assert_readiness=False)
+                assert not addr.ready
+        assert len(portal2.value_store) == 1
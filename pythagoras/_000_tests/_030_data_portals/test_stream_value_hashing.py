@@ -0,0 +1,138 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pythagoras import DataPortal, ValueAddr, NotAllowedError
+from pythagoras import _PortalTester
+from pythagoras._030_data_portals.values_cache import values_cache
+
+
+def test_stream_hashing_round_trip(tmpdir):
+    with _PortalTester(DataPortal
+            , root_dict=tmpdir, value_hashing="stream") as t:
+        values = [1, "hello", {"b": 2, "a": 1}, {3, 1, 2}
+            , np.arange(1000), pd.DataFrame({"x": [1, 2, 3]})]
+        for value in values:
+            addr = ValueAddr(value)
+            new_addr = ValueAddr.from_strings(
+                prefix=addr.prefix, hash_signature=addr.hash_signature
+                , portal=t.portal)
+            restored = new_addr.get()
+            if isinstance(value, np.ndarray):
+                assert np.array_equal(restored, value)
+            elif isinstance(value, pd.DataFrame):
+                assert restored.equals(value)
+            else:
+                assert restored == value
+        assert len(t.portal.value_store) == len(values)
+
+
+def test_stream_hashing_is_deterministic(tmpdir):
+    with _PortalTester(DataPortal
+            , root_dict=tmpdir, value_hashing="stream") as t:
+        x = [1, 2, 3]
+        assert ValueAddr([x, x]) == ValueAddr([list(x), list(x)])
+        assert ValueAddr({"x", "y", "z"}) == ValueAddr({"z", "y", "x"})
+        assert ValueAddr(frozenset({"x", "y"})) == ValueAddr(
+            frozenset({"y", "x"}))
+        assert ValueAddr(1) != ValueAddr(1.0)
+        assert len(t.portal.value_store) == 4
+
+
+def test_stream_hashing_keeps_shared_references(tmpdir):
+    with _PortalTester(DataPortal
+            , root_dict=tmpdir, value_hashing="stream") as t:
+        x = np.zeros(10**5)
+        addr = ValueAddr([x]*10)
+        values_cache.clear()
+        restored = ValueAddr.from_strings(prefix=addr.prefix
+            , hash_signature=addr.hash_signature, portal=t.portal).get()
+        assert restored[0] is restored[-1]
+        stored_sizes = [os.path.getsize(os.path.join(d, f))
+            for d, _, files in os.walk(os.path.join(tmpdir, "value_store"))
+            for f in files]
+        assert max(stored_sizes) < 2 * x.nbytes
+
+
+def test_stream_hashing_preserves_dict_order(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir
+            , value_hashing="stream", compression_threshold=0) as t:
+        value = {"b": 1, "a": 2, "c": {"z": 0, "y": 1}}
+        addr = ValueAddr(value)
+        # The order of keys is a part of the value
+        assert addr != ValueAddr({"a": 2, "c": {"y": 1, "z": 0}, "b": 1})
+        assert addr == ValueAddr({"b": 1, "a": 2, "c": {"z": 0, "y": 1}})
+        values_cache.clear()
+        restored = ValueAddr.from_strings(prefix=addr.prefix
+            , hash_signature=addr.hash_signature, portal=t.portal).get()
+        assert list(restored) == ["b", "a", "c"]
+        assert list(restored["c"]) == ["z", "y"]
+
+
+def test_value_hashing_is_persistent(tmpdir):
+    with _PortalTester(DataPortal
+            , root_dict=tmpdir, value_hashing="stream") as t:
+        ValueAddr(10)
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        assert t.portal.value_hashing == "stream"
+    with pytest.raises(NotAllowedError):
+        with _PortalTester(DataPortal
+                , root_dict=tmpdir, value_hashing="joblib") as t:
+            pass
+
+
+def test_value_hashing_legacy_portal(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        ValueAddr(10)
+    # A portal, created before value_hashing became a persistent setting
+    shutil.rmtree(os.path.join(tmpdir, "portal_config"))
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        assert t.portal.value_hashing == "joblib"
+
+
+def test_parallel_hashing_threshold_is_persistent(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir
+            , value_hashing="typed", parallel_hashing_threshold=2**20) as t:
+        assert t.portal.get_params()["parallel_hashing_threshold"] == 2**20
+        ValueAddr(np.arange(10))
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        assert t.portal.value_hashing == "typed"
+        assert t.portal.parallel_hashing_threshold == 2**20
+    with pytest.raises(NotAllowedError):
+        with _PortalTester(DataPortal, root_dict=tmpdir
+                , parallel_hashing_threshold=0) as t:
+            pass
+
+
+
+@pytest.mark.parametrize("value_hashing", ["joblib", "stream"])
+def test_parallel_hashing_threshold_needs_typed_hashing(
+        tmpdir, value_hashing):
+    with pytest.raises(NotAllowedError):
+        with _PortalTester(DataPortal, root_dict=tmpdir
+                , value_hashing=value_hashing
+                , parallel_hashing_threshold=2**20) as t:
+            pass
+    with _PortalTester(DataPortal, root_dict=tmpdir
+            , value_hashing=value_hashing
+            , parallel_hashing_threshold=0) as t:
+        assert t.portal.parallel_hashing_threshold == 0
+
+
+@pytest.mark.parametrize("value_hashing", ["joblib", "typed", "stream"])
+def test_hash_type_is_persistent(tmpdir, value_hashing):
+    with _PortalTester(DataPortal, root_dict=tmpdir
+            , value_hashing=value_hashing, hash_type="blake2b_v1") as t:
+        addr = ValueAddr("hello")
+        assert addr.get() == "hello"
+        blake_signature = addr.hash_signature
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        assert t.portal.hash_type == "blake2b_v1"
+        assert ValueAddr("hello").hash_signature == blake_signature
+    with pytest.raises(NotAllowedError):
+        with _PortalTester(DataPortal
+                , root_dict=tmpdir, hash_type="sha256") as t:
+            pass
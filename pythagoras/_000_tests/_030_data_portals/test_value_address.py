@@ -1,3 +1,4 @@
+import os
 import time
 from copy import copy
 import pytest
@@ -126,4 +127,16 @@ def test_value_address_get_with_two_portals(tmpdir):
 
             assert addr1_hihi.get() == "hihi"
             assert len(portal1.value_store) == 2
-            assert len(portal2.value_store) == 3
\ No newline at end of file
+            assert len(portal2.value_store) == 3
+
+def test_consistency_checks_rehash_stored_values(tmpdir):
+    with _PortalTester(DataPortal, tmpdir, p_consistency_checks=1) as t:
+        addr = ValueAddr("ten")
+        ValueAddr("ten")
+        # Corrupt the stored value
+        pickle_dict = t.portal.value_store._wrapped_dict.pickle_dict
+        file_name = pickle_dict._build_full_path(addr)
+        os.remove(file_name)
+        pickle_dict._save_to_file(file_name, "eleven")
+        with pytest.raises(AssertionError):
+            ValueAddr("ten")
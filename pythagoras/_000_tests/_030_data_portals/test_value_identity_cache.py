@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from pythagoras import DataPortal, ValueAddr, treat_as_immutable
+from pythagoras import _PortalTester
+
+
+def test_opted_in_objects_are_hashed_once(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        cache = t.portal.value_addr_cache
+        df = treat_as_immutable(pd.DataFrame({"x": range(100)}))
+        addr_1 = ValueAddr(df)
+        addr_2 = ValueAddr(df)
+        assert addr_1 == addr_2
+        assert cache.hits == 1
+        assert addr_2.get() is df
+        assert addr_1 == ValueAddr(df.copy())
+
+
+def test_mutable_objects_are_not_cached(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        cache = t.portal.value_addr_cache
+        df = pd.DataFrame({"x": range(100)})
+        addr_1 = ValueAddr(df)
+        df["x"] = 0
+        addr_2 = ValueAddr(df)
+        assert addr_1 != addr_2
+        assert cache.hits == 0
+        assert len(cache) == 0
+
+
+def test_read_only_arrays_are_not_cached(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        cache = t.portal.value_addr_cache
+        a = np.arange(1000)
+        a.flags.writeable = False
+        addr_1 = ValueAddr(a)
+        a.flags.writeable = True
+        a[0] = 1
+        a.flags.writeable = False
+        assert ValueAddr(a) != addr_1
+        assert cache.hits == 0
+        assert len(cache) == 0
+
+
+def test_opted_in_arrays_are_cached(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        cache = t.portal.value_addr_cache
+        a = treat_as_immutable(np.arange(1000))
+        assert ValueAddr(a) == ValueAddr(a)
+        assert cache.hits == 1
+        assert ValueAddr(a[10:]) == ValueAddr(np.arange(10, 1000))
+        del a
+        assert len(cache) == 0
@@ -0,0 +1,41 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from pythagoras import DataPortal, ValueAddr
+from pythagoras import _PortalTester
+from pythagoras._030_data_portals.values_cache import values_cache
+
+
+def test_values_cache_is_shared_by_addresses(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        value = ("x", tuple(range(100)))
+        addr = ValueAddr(value)
+        new_addr_1 = ValueAddr.from_strings(prefix=addr.prefix
+            , hash_signature=addr.hash_signature, portal=t.portal)
+        hits, misses = values_cache.hits, values_cache.misses
+        value_1 = new_addr_1.get()
+        assert value_1 == value
+        assert values_cache.misses == misses + 1
+
+        new_addr_2 = pickle.loads(pickle.dumps(addr))
+        value_2 = new_addr_2.get()
+        assert value_2 is value_1
+        assert values_cache.hits == hits + 1
+
+
+def test_mutable_values_are_not_shared(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        for value in [[1, 2, 3], pd.DataFrame({"x": range(100)})
+                , np.arange(100)]:
+            addr = ValueAddr(value)
+            values = []
+            for i in range(2):
+                new_addr = ValueAddr.from_strings(prefix=addr.prefix
+                    , hash_signature=addr.hash_signature, portal=t.portal)
+                values.append(new_addr.get())
+            if isinstance(values[0], np.ndarray) and (
+                    not values[0].flags.writeable):
+                continue # read-only arrays can be shared
+            assert values[0] is not values[1]
@@ -0,0 +1,54 @@
+from pythagoras import OrdinaryFn, _PortalTester, OrdinaryCodePortal
+
+
+def counter_function(n:int) -> int:
+    return n*10
+
+def test_function_is_compiled_once(tmpdir):
+    with _PortalTester(OrdinaryCodePortal, root_dict=tmpdir) as t:
+        f = OrdinaryFn(counter_function)
+        assert f(n=1) == 10
+        compiled_fn = f._compiled_fn
+        assert callable(compiled_fn)
+        for i in range(10):
+            assert f(n=i) == i*10
+            assert f._compiled_fn is compiled_fn
+        assert compiled_fn.__code__.co_filename == f._fn_file_name
+
+
+def global_writer() -> int:
+    global some_global_name
+    some_global_name = 1
+    return some_global_name
+
+def test_compiled_function_namespace(tmpdir):
+    with _PortalTester(OrdinaryCodePortal, root_dict=tmpdir) as t:
+        f = OrdinaryFn(global_writer)
+        assert f() == 1
+        assert "some_global_name" not in globals()
+
+
+def global_incrementer() -> int:
+    global some_counter
+    try:
+        some_counter += 1
+    except NameError:
+        some_counter = 1
+    return some_counter
+
+def test_global_writes_do_not_leak_between_calls(tmpdir):
+    with _PortalTester(OrdinaryCodePortal, root_dict=tmpdir) as t:
+        f = OrdinaryFn(global_incrementer)
+        for i in range(5):
+            assert f() == 1
+        assert "some_counter" not in globals()
+
+
+def test_compiled_function_is_shared_unless_it_writes_globals(tmpdir):
+    with _PortalTester(OrdinaryCodePortal, root_dict=tmpdir) as t:
+        f = OrdinaryFn(counter_function)
+        assert f._get_compiled_fn() is f._get_compiled_fn()
+        assert not f._compiled_fn_writes_globals
+        g = OrdinaryFn(global_incrementer)
+        assert g._get_compiled_fn() is not g._get_compiled_fn()
+        assert g._compiled_fn_writes_globals
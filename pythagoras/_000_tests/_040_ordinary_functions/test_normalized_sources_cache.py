@@ -0,0 +1,56 @@
+from pythagoras import OrdinaryFn, _PortalTester, OrdinaryCodePortal
+from pythagoras._040_ordinary_functions import code_normalizer_implementation
+from pythagoras._040_ordinary_functions.code_normalizer_implementation import (
+    __get_normalized_function_source__, _persistent_cache_key)
+
+
+def function_to_normalize(a:int, b:int) -> int:
+    """Docstring"""
+    # comment
+    return a   +   b
+
+def test_normalized_sources_cache(tmpdir):
+    with _PortalTester(OrdinaryCodePortal, root_dict=tmpdir) as t:
+        cache = t.portal.normalized_sources
+        code_normalizer_implementation._normalized_sources_cache.clear()
+        f = OrdinaryFn(function_to_normalize)
+        assert len(cache) == 1
+        assert cache[list(cache.keys())[0]] == f.fn_source_code
+
+        g = OrdinaryFn(function_to_normalize)
+        assert g.fn_source_code == f.fn_source_code
+        assert len(cache) == 1
+
+
+def test_persistent_cache_is_used(tmpdir):
+    with _PortalTester(OrdinaryCodePortal, root_dict=tmpdir) as t:
+        cache = t.portal.normalized_sources
+        source = "def some_fn(x):\n    return x\n"
+        key = _persistent_cache_key(source, True)
+        cache[key] = "def some_fn(x):\n    return x  # from cache\n"
+        code_normalizer_implementation._normalized_sources_cache.clear()
+
+        result = __get_normalized_function_source__(
+            source, drop_pth_decorators=True, persistent_cache=cache)
+        assert result.endswith("# from cache\n")
+
+        # the in-process cache does not need the persistent one anymore
+        result = __get_normalized_function_source__(
+            source, drop_pth_decorators=True)
+        assert result.endswith("# from cache\n")
+        code_normalizer_implementation._normalized_sources_cache.clear()
+
+
+def test_normalized_source_is_a_cached_fixed_point(tmpdir, monkeypatch):
+    with _PortalTester(OrdinaryCodePortal, root_dict=tmpdir) as t:
+        code_normalizer_implementation._normalized_sources_cache.clear()
+        f = OrdinaryFn(function_to_normalize)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("The source should not be normalized again")
+        monkeypatch.setattr(
+            code_normalizer_implementation, "_normalize_source_code", fail)
+        for drop_pth_decorators in [False, True]:
+            assert f.fn_source_code == __get_normalized_function_source__(
+                f.fn_source_code, drop_pth_decorators=drop_pth_decorators)
+        code_normalizer_implementation._normalized_sources_cache.clear()
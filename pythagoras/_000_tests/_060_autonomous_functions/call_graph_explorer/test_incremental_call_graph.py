@@ -0,0 +1,52 @@
+import random
+
+from pythagoras._060_autonomous_functions.call_graph_explorer import (
+    explore_call_graph_deep)
+from pythagoras._060_autonomous_functions.incremental_call_graph import (
+    IncrementalCallGraph)
+
+
+def make_source(name, calls):
+    body = " + ".join(f"{c}(n=n-1)" for c in calls) if calls else "n"
+    return f"def {name}(n):\n    return {body}\n"
+
+# two connected loops, a diamond and a chain hanging off them
+GRAPH = dict(
+    a=["b"], b=["c"], c=["a", "d"]
+    , d=["e"], e=["d", "f"]
+    , f=["g", "h"], g=["i"], h=["i"], i=[]
+    , j=["k"], k=["l"], l=["a"]
+    , lonely=[])
+
+SOURCES = {name: make_source(name, calls) for name, calls in GRAPH.items()}
+
+
+def test_incremental_graph_matches_full_exploration():
+    expected = explore_call_graph_deep(list(SOURCES.values()))
+    for seed in range(10):
+        names = list(SOURCES)
+        random.Random(seed).shuffle(names)
+        graph = IncrementalCallGraph()
+        for i, name in enumerate(names):
+            graph.add_function(SOURCES[name])
+            # query in between, to exercise closure invalidation
+            partial = explore_call_graph_deep(
+                [SOURCES[n] for n in names[:i+1]])
+            for added in names[:i+1]:
+                assert graph.dependencies(added) == partial[added]
+        for name in SOURCES:
+            assert graph.dependencies(name) == expected[name]
+        assert len(graph) == len(SOURCES)
+
+
+def test_analysis_cache_is_shared():
+    cache = dict()
+    graph_1 = IncrementalCallGraph(cache)
+    graph_1.add_function(SOURCES["a"])
+    assert len(cache) == 1
+    graph_2 = IncrementalCallGraph(cache)
+    graph_2.add_function(SOURCES["a"])
+    assert len(cache) == 1
+    assert graph_2.dependencies("a") == {"a"}
+    graph_2.add_function(SOURCES["a"]) # adding twice is a no-op
+    assert graph_2.direct_dependencies("a") == {"a"}
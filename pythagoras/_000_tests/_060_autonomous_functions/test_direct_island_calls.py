@@ -0,0 +1,39 @@
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+import pytest
+from pythagoras._060_autonomous_functions import *
+from pythagoras._060_autonomous_functions.autonomous_core_classes import (
+    _DirectIslandCall)
+
+
+def is_even(n: int) -> bool:
+    if n == 0:
+        return True
+    return is_odd(n=n-1)
+
+def is_odd(n: int) -> bool:
+    if n == 0:
+        return False
+    return is_even(n=n-1)
+
+def calls_with_positional_args(n: int) -> bool:
+    return is_even(n)
+
+
+def test_direct_island_calls(tmpdir):
+    with _PortalTester(AutonomousCodePortal, root_dict=tmpdir) as t:
+        global is_even, is_odd, calls_with_positional_args
+        is_even = autonomous()(is_even)
+        is_odd = autonomous()(is_odd)
+        calls_with_positional_args = autonomous()(calls_with_positional_args)
+
+        assert is_even(n=10)
+        assert is_odd(n=7)
+
+        names = is_even._available_names()
+        assert isinstance(names["is_odd"], _DirectIslandCall)
+        assert isinstance(names["is_even"], _DirectIslandCall)
+        assert names["is_odd"].fn_name == "is_odd"
+        assert names["is_odd"](n=3)
+
+        with pytest.raises(AssertionError):
+            calls_with_positional_args(n=2)
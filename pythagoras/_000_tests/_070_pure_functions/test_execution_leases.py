@@ -0,0 +1,92 @@
+import time
+
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._070_pure_functions.pure_core_classes import (
+    PureCodePortal, PureFnExecutionResultAddr)
+from pythagoras._070_pure_functions.execution_leases import ExecutionLease
+from pythagoras._070_pure_functions.pure_decorator import pure
+
+
+def triple(n:int) -> int:
+    return 3*n
+
+
+def test_lease_basics(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        leases = t.portal.execution_leases
+        lease = ExecutionLease(leases, ["some_fn", "abcdef"])
+        assert lease.owner is None
+        assert lease.acquire()
+        assert lease.held_by_me
+        assert not lease.held_by_others
+        assert lease.acquire() # re-entrant
+        lease.release()
+        assert lease.held_by_me
+        lease.release()
+        assert lease.owner is None
+        assert len(leases) == 0
+
+
+def test_lease_held_by_others(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global triple
+        triple = pure()(triple)
+        addr = PureFnExecutionResultAddr(a_fn=triple, arguments=dict(n=2))
+        assert addr.needs_execution
+
+        t.portal.execution_leases[addr] = dict(
+            owner="some_other_process", duration=2, acquired_at=time.time())
+        assert addr.execution_lease.held_by_others
+        assert not addr.needs_execution
+        assert not addr.execution_lease.acquire()
+
+        # The call waits till the other process stops renewing its lease
+        start_time = time.time()
+        assert triple(n=2) == 6
+        assert time.time() - start_time > 1
+        assert not addr.needs_execution
+        assert len(addr.execution_attempts) == 1
+
+
+def test_lease_takeover_is_exclusive(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        leases = t.portal.execution_leases
+        key = ["some_fn", "abcdef"]
+        leases[key] = dict(
+            owner="some_dead_process", duration=0.1, acquired_at=time.time())
+        time.sleep(0.5)
+
+        # Another worker is taking over the expired lease right now
+        leases[key + ["lock"]] = dict(
+            owner="some_other_process", locked_at=time.time())
+        lease = ExecutionLease(leases, key)
+        assert not lease.acquire()
+        del leases[key + ["lock"]]
+
+        assert lease.acquire()
+        assert lease.held_by_me
+        lease.release()
+        assert len(leases) == 0
+
+
+def test_expired_lease_is_taken_over(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global triple
+        triple = pure()(triple)
+        addr = PureFnExecutionResultAddr(a_fn=triple, arguments=dict(n=3))
+
+        t.portal.execution_leases[addr] = dict(
+            owner="some_dead_process", duration=0.1, acquired_at=time.time())
+        time.sleep(0.5)
+        assert addr.execution_lease.owner is None
+        assert addr.needs_execution
+
+        lease = addr.execution_lease
+        assert lease.acquire()
+        assert lease.held_by_me
+        lease.release()
+        assert addr.execution_lease.owner is None
@@ -0,0 +1,96 @@
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._070_pure_functions.pure_core_classes import (
+    PureCodePortal, PureFnExecutionResultAddr)
+from pythagoras._070_pure_functions.execution_queue import (
+    PENDING, CLAIMED, FAILED)
+from pythagoras._070_pure_functions.pure_decorator import pure
+from pythagoras._090_swarming_portals.swarming_portals import SwarmingPortal
+
+
+def double(n:int) -> int:
+    return 2*n
+
+def test_execution_queue_states(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global double
+        double = pure()(double)
+        queue = t.portal.execution_queue
+
+        addr = PureFnExecutionResultAddr(a_fn=double, arguments=dict(n=5))
+        assert queue.state_of(addr) is None
+        assert queue.claim() is None
+
+        addr.request_execution()
+        assert queue.state_of(addr) == PENDING
+        assert queue.count(PENDING) == 1
+
+        key = queue.claim()
+        assert key.str_chain == addr.str_chain
+        assert queue.state_of(addr) == CLAIMED
+        assert queue.claim() is None
+
+        queue.release(addr)
+        assert queue.state_of(addr) == PENDING
+        assert queue.count(CLAIMED) == 0
+
+        double(n=5)
+        assert queue.state_of(addr) is None
+        assert queue.count(PENDING) == 0
+        assert queue.count(CLAIMED) == 0
+        assert queue.claim() is None
+
+        addr.request_execution()
+        assert queue.state_of(addr) is None
+
+
+def test_execution_queue_many_requests(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global double
+        double = pure()(double)
+        queue = t.portal.execution_queue
+
+        addrs = double.swarm_list([dict(n=i) for i in range(20)])
+        assert queue.count(PENDING) == 20
+
+        claimed = set()
+        for i in range(20):
+            key = queue.claim()
+            assert key is not None
+            claimed.add(key.str_chain)
+        assert queue.claim() is None
+        assert claimed == {a.str_chain for a in addrs}
+        assert queue.count(CLAIMED) == 20
+
+        assert queue.requeue_stale_claims(max_age=0) == 20
+        assert queue.count(PENDING) == 20
+
+        queue.mark_failed(addrs[0])
+        assert queue.state_of(addrs[0]) == FAILED
+        assert queue.count(PENDING) == 19
+
+
+def test_legacy_requests_are_imported(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global double
+        double = pure()(double)
+        addrs = [PureFnExecutionResultAddr(a_fn=double, arguments=dict(n=i))
+            for i in range(3)]
+        for addr in addrs:
+            # Requests, made before the execution queue was introduced
+            t.portal.execution_requests[addr] = True
+        t.portal.execution_queue._queue_dict.clear()
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        # Requests are imported before workers are launched
+        assert t.portal.execution_queue.count(PENDING) == 0
+
+    with _PortalTester(SwarmingPortal, tmpdir
+            , n_background_workers=0) as t:
+        queue = t.portal.execution_queue
+        assert queue.count(PENDING) == 3
+        assert {a.str_chain for a in queue.addresses(PENDING)} == {
+            a.str_chain for a in addrs}
+        assert queue.import_legacy_requests(t.portal.execution_requests) == 0
@@ -0,0 +1,27 @@
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._030_data_portals.value_addresses import ValueAddr
+from pythagoras._070_pure_functions.kw_args import SortedKwArgs
+from pythagoras._070_pure_functions.pure_core_classes import (
+    PureCodePortal, PureFnCallSignature)
+from pythagoras._070_pure_functions.pure_decorator import pure
+
+
+def test_fn_value_addr_is_cached(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+
+        @pure()
+        def inc(n):
+            return n+1
+
+        assert inc(n=1) == 2
+        fn_addr = inc.fn_value_addr
+        assert fn_addr == ValueAddr(inc)
+        assert fn_addr.get().fn_source_code == inc.fn_source_code
+
+        island = t.portal.known_functions[inc.island_name]
+        assert island["inc"].fn_value_addr is fn_addr
+
+        for i in range(3):
+            signature = PureFnCallSignature(inc, SortedKwArgs(n=i))
+            assert signature.fn_addr is fn_addr
@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._030_data_portals.value_addresses import ValueAddr
+from pythagoras._070_pure_functions.integrity_scrubber import (
+    IntegrityScrubber)
+from pythagoras._070_pure_functions.pure_core_classes import PureCodePortal
+from pythagoras._070_pure_functions.pure_decorator import pure
+
+
+def double(x):
+    return 2*x
+
+
+def noisy(x):
+    import random
+    return x + random.random()
+
+
+def scrub_everything(scrubber, n_steps=50):
+    for _ in range(n_steps):
+        assert scrubber.scrub_step()
+
+
+def test_scrubber_on_consistent_portal(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global double
+        double = pure()(double)
+        for i in range(5):
+            assert double(x=i) == 2*i
+
+        scrubber = IntegrityScrubber(t.portal, p_reexecution=1)
+        scrub_everything(scrubber)
+        assert scrubber.n_values_checked > 0
+        assert scrubber.n_results_checked > 0
+        assert scrubber.n_reexecutions == scrubber.n_results_checked
+        assert scrubber.n_discrepancies == 0
+        assert len(t.portal.integrity_discrepancies) == 0
+
+
+def test_scrubber_on_empty_portal(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        scrubber = IntegrityScrubber(t.portal)
+        assert not scrubber.scrub_step()
+
+
+def test_scrubber_finds_corrupted_values(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        addr = ValueAddr("ten")
+        # Corrupt the stored value
+        pickle_dict = t.portal.value_store._wrapped_dict.pickle_dict
+        file_name = pickle_dict._build_full_path(addr)
+        os.remove(file_name)
+        pickle_dict._save_to_file(file_name, "eleven")
+
+        scrubber = IntegrityScrubber(t.portal)
+        assert not scrubber.check_value(addr)
+        assert scrubber.check_value(ValueAddr("twelve"))
+        discrepancies = t.portal.integrity_discrepancies
+        assert len(discrepancies) == 1
+        record = discrepancies[["value_hash_mismatch", *addr.str_chain]]
+        assert record["kind"] == "value_hash_mismatch"
+        assert record["address"] == list(addr.str_chain)
+
+
+def test_scrubber_ignores_memory_layouts(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir, value_hashing="typed") as t:
+        x = np.arange(20).reshape(4, 5)[:, 0]
+        addr = ValueAddr(x)
+        scrubber = IntegrityScrubber(t.portal)
+        # The stored copy of x is contiguous, so its hash is different,
+        # it's verified by its checksum instead
+        assert scrubber.check_value(addr)
+        assert scrubber.n_values_unverified == 0
+        assert len(t.portal.integrity_discrepancies) == 0
+
+
+def test_scrubber_finds_corrupted_arrays(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir, value_hashing="typed") as t:
+        x = np.arange(20).reshape(4, 5)[:, 0]
+        addr = ValueAddr(x)
+        # Corrupt the stored value
+        pickle_dict = t.portal.value_store._wrapped_dict.pickle_dict
+        file_name = pickle_dict._build_full_path(addr)
+        os.remove(file_name)
+        pickle_dict._save_to_file(file_name, x + 1)
+
+        scrubber = IntegrityScrubber(t.portal)
+        assert not scrubber.check_value(addr)
+        assert ["value_hash_mismatch", *addr.str_chain] in (
+            t.portal.integrity_discrepancies)
+
+
+def test_scrubber_finds_unreadable_values(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        addr = ValueAddr("ten")
+        pickle_dict = t.portal.value_store._wrapped_dict.pickle_dict
+        with open(pickle_dict._build_full_path(addr), "wb") as f:
+            f.write(b"not a pickle")
+
+        scrubber = IntegrityScrubber(t.portal)
+        assert not scrubber.check_value(addr)
+        assert ["unreadable_value", *addr.str_chain] in (
+            t.portal.integrity_discrepancies)
+
+
+def test_scrubber_finds_missing_results(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global double
+        double = pure()(double)
+        double(x=21)
+        address = double.get_address(x=21)
+        # The result stays in the existence index
+        result_addr = ValueAddr(42)
+        pickle_dict = t.portal.value_store._wrapped_dict.pickle_dict
+        os.remove(pickle_dict._build_full_path(result_addr))
+        assert result_addr in t.portal.value_store
+
+        scrubber = IntegrityScrubber(t.portal)
+        assert not scrubber.check_result(address)
+        assert ["result_missing", *address.str_chain] in (
+            t.portal.integrity_discrepancies)
+
+
+def test_scrubber_walks_start_at_random_keys(tmpdir):
+    # Walks start at random shards, so the values are fanned out
+    with _PortalTester(PureCodePortal, tmpdir, fanout_depth=1) as t:
+        for i in range(20):
+            ValueAddr(i)
+        first_keys = set()
+        for _ in range(10):
+            scrubber = IntegrityScrubber(t.portal)
+            keys = [scrubber._next_key("values", t.portal.value_store)
+                for _ in range(20)]
+            assert len(set(keys)) == 20 # a walk visits every key once
+            first_keys.add(keys[0])
+        assert len(first_keys) > 1
+
+
+def test_scrubber_reexecutes_functions(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global noisy
+        noisy = pure()(noisy)
+        noisy(x=1)
+        address = noisy.get_address(x=1)
+
+        scrubber = IntegrityScrubber(t.portal, p_reexecution=0)
+        assert scrubber.check_result(address)
+        assert scrubber.n_reexecutions == 0
+        assert len(t.portal.integrity_discrepancies) == 0
+
+        assert not scrubber.check_result(address, reexecute=True)
+        assert scrubber.n_reexecutions == 1
+        discrepancies = t.portal.integrity_discrepancies
+        assert ["result_mismatch", *address.str_chain] in discrepancies
+        # the stored result is not affected
+        assert len(address.execution_attempts) == 1
+        assert noisy(x=1) == address.get()
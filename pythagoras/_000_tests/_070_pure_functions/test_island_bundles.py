@@ -0,0 +1,39 @@
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._070_pure_functions import pure_core_classes
+from pythagoras._070_pure_functions.pure_core_classes import PureCodePortal
+import pythagoras as pth
+
+
+def test_island_bundle_restore(tmpdir, monkeypatch):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+
+        @pth.autonomous(island_name="Rhodes")
+        def helper(x):
+            return x*x
+
+        @pth.pure(island_name="Rhodes")
+        def sum_of_squares(a, b):
+            return helper(x=a) + helper(x=b)
+
+        assert sum_of_squares(a=1, b=2) == 5
+        assert len(t.portal.island_bundles) == 1
+        address = sum_of_squares.get_address(a=2, b=3)
+        augmented_source = sum_of_squares.augmented_fn_source_code
+
+    def fail(*args, **kwargs):
+        assert False, "island should be restored from the bundle"
+    monkeypatch.setattr(
+        pure_core_classes, "process_augmented_func_src", fail)
+
+    with _PortalTester(PureCodePortal, tmpdir) as t_new:
+        address._invalidate_cache()
+        address._portal = t_new.portal
+        fn = address.function
+        island = t_new.portal.known_functions["Rhodes"]
+        assert set(island) == {"helper", "sum_of_squares"}
+        assert island["helper"]._fn_fully_registered
+        assert island["sum_of_squares"]._fn_fully_registered
+        assert fn.dependencies == ["helper", "sum_of_squares"]
+        assert fn.augmented_fn_source_code == augmented_source
+        assert address.execute() == 13
@@ -0,0 +1,47 @@
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._070_pure_functions.pure_core_classes import PureCodePortal
+from pythagoras._070_pure_functions.pure_decorator import pure
+from pythagoras._070_pure_functions.result_memo import PureFnResultMemo
+
+
+def make_list(n, x):
+    return [x]*n
+
+
+def test_memo_keys():
+    assert PureFnResultMemo.key_for("i", "f", dict(a=1)) is not None
+    assert PureFnResultMemo.key_for("i", "f", dict(a=[1])) is None
+    assert (PureFnResultMemo.key_for("i", "f", dict(a=1))
+        != PureFnResultMemo.key_for("i", "f", dict(a=1.0)))
+    assert (PureFnResultMemo.key_for("i", "f", dict(a=True))
+        != PureFnResultMemo.key_for("i", "f", dict(a=1)))
+    assert (PureFnResultMemo.key_for("i", "f", dict(a=0.0))
+        != PureFnResultMemo.key_for("i", "f", dict(a=-0.0)))
+    assert (PureFnResultMemo.key_for("i", "f", dict(a=(1, "b")))
+        == PureFnResultMemo.key_for("i", "f", dict(a=(1, "b"))))
+
+
+def test_memo_hits(tmpdir):
+
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+        global make_list
+        make_list = pure()(make_list)
+        memo = t.portal.results_memo
+
+        assert make_list(n=3, x="a") == ["a", "a", "a"]
+        assert len(memo) == 1
+        hits = memo.hits
+
+        result = make_list(n=3, x="a")
+        assert result == ["a", "a", "a"]
+        assert memo.hits == hits + 1
+        assert len(make_list.get_address(n=3, x="a").execution_attempts) == 1
+
+        result.append("b") # callers get their own copies
+        assert make_list(n=3, x="a") == ["a", "a", "a"]
+
+        assert make_list(n=2, x=[1]) == [[1], [1]]
+        assert len(memo) == 1
+
+        t.portal._forget_known_functions()
+        assert len(memo) == 0
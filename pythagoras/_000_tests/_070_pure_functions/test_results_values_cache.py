@@ -0,0 +1,23 @@
+import pickle
+
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._030_data_portals.values_cache import values_cache
+from pythagoras._070_pure_functions.pure_core_classes import PureCodePortal
+from pythagoras._070_pure_functions.pure_decorator import pure
+
+
+def test_execution_results_are_cached_in_process(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+
+        @pure()
+        def make_list(n: int) -> list:
+            return list(range(n))
+
+        addr = make_list.get_address(n=10)
+        assert addr.execute() == list(range(10))
+        new_addr = pickle.loads(pickle.dumps(addr))
+        assert new_addr.get() == list(range(10))
+        hits = values_cache.hits
+        another_addr = pickle.loads(pickle.dumps(addr))
+        assert another_addr.get() is new_addr.get()
+        assert values_cache.hits == hits + 1
@@ -18,4 +18,18 @@ def test_run_grid(tmpdir):
 
         addrs = my_sum.run_grid(grid)
         results = [a.get() for a in addrs]
-        assert sum(results) == 3354
\ No newline at end of file
+        assert sum(results) == 3354
+
+def test_run_grid_addresses(tmpdir):
+    with _PortalTester(PureCodePortal, tmpdir) as t:
+
+        @pure()
+        def my_sum(x: float, y:float) -> float:
+            return x + y
+
+        grid = dict(x=[1, 2, 5], y=[10, 100, 1000])
+        addrs = my_sum.run_grid(grid)
+        assert len(addrs) == 9
+        for addr in addrs:
+            assert addr == my_sum.get_address(**addr.kwargs)
+            assert addr.get() == my_sum.execute(**addr.kwargs)
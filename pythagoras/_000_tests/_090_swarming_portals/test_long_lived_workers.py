@@ -0,0 +1,59 @@
+import time
+from copy import deepcopy
+from pythagoras._010_basic_portals.portal_tester import _PortalTester
+from pythagoras._090_swarming_portals.swarming_portals import (
+    SwarmingPortal, _process_many_random_execution_requests)
+import pythagoras as pth
+
+
+def test_many_requests_in_one_worker(tmpdir):
+
+    with _PortalTester(SwarmingPortal, tmpdir
+            , n_background_workers=0
+            , max_tasks_per_worker=3) as t:
+
+        @pth.pure()
+        def f(n):
+            return 5*n
+
+        addresses = [f.swarm(n=i) for i in range(3)]
+
+        init_params = deepcopy(t.portal.__get_portable_params__())
+        init_params["runtime_id"] = None
+
+    _process_many_random_execution_requests(**init_params)
+
+    with _PortalTester(SwarmingPortal, tmpdir
+            , n_background_workers=0) as t_new:
+        for i, address in enumerate(addresses):
+            address._invalidate_cache()
+            address._portal = t_new.portal
+            assert address.ready
+            assert address.get() == 5*i
+
+
+def test_worker_needs_recycling(tmpdir):
+
+    with _PortalTester(SwarmingPortal, tmpdir
+            , n_background_workers=0
+            , max_tasks_per_worker=10
+            , max_worker_lifetime=60) as t:
+        portal = t.portal
+        assert not portal.worker_needs_recycling(0, time.time())
+        assert not portal.worker_needs_recycling(9, time.time())
+        assert portal.worker_needs_recycling(10, time.time())
+        assert portal.worker_needs_recycling(0, time.time() - 61)
+
+    with _PortalTester(SwarmingPortal, tmpdir
+            , n_background_workers=0
+            , max_tasks_per_worker=None
+            , max_worker_lifetime=None
+            , max_worker_rss_mb=0.001) as t:
+        assert t.portal.worker_needs_recycling(0, time.time())
+
+    with _PortalTester(SwarmingPortal, tmpdir
+            , n_background_workers=0
+            , max_tasks_per_worker=None
+            , max_worker_lifetime=None
+            , max_worker_rss_mb=None) as t:
+        assert not t.portal.worker_needs_recycling(10**6, 0)
@@ -2,7 +2,7 @@ from copy import deepcopy
 from pythagoras import BasicPortal
 from pythagoras._010_basic_portals.portal_tester import _PortalTester
 from pythagoras._090_swarming_portals.swarming_portals import (
-    SwarmingPortal, _process_random_execution_request)
+    SwarmingPortal, _process_many_random_execution_requests)
 from pythagoras._070_pure_functions.pure_decorator import pure
 import pythagoras as pth
 
@@ -18,8 +18,9 @@ def test_random_request_execution(tmpdir):
 
         init_params = deepcopy(t.portal.__get_portable_params__())
         init_params["runtime_id"] = None
+        init_params["max_tasks_per_worker"] = 1
 
-    _process_random_execution_request(**init_params)
+    _process_many_random_execution_requests(**init_params)
 
     address._invalidate_cache()
 
@@ -3,7 +3,7 @@ from pythagoras import BasicPortal
 import time
 from pythagoras._010_basic_portals.portal_tester import _PortalTester
 from pythagoras._090_swarming_portals.swarming_portals import (
-    SwarmingPortal, _process_random_execution_request)
+    SwarmingPortal)
 from pythagoras._070_pure_functions.pure_decorator import pure
 import pythagoras as pth
 
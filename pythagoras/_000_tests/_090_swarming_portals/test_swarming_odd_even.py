@@ -2,7 +2,7 @@ from copy import deepcopy
 from pythagoras import BasicPortal
 from pythagoras._010_basic_portals.portal_tester import _PortalTester
 from pythagoras._090_swarming_portals.swarming_portals import (
-    SwarmingPortal, _process_random_execution_request)
+    SwarmingPortal)
 from pythagoras._070_pure_functions.pure_decorator import pure
 import pythagoras as pth
 
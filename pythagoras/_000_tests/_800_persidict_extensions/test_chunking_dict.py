@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+from persidict import FileDirDict
+
+from pythagoras import DataPortal, ValueAddr
+from pythagoras import _PortalTester
+from pythagoras._800_persidict_extensions import chunking_dict
+from pythagoras._800_persidict_extensions.chunking_dict import (
+    ChunkingDict, ChunkManifest, split_into_chunks, get_chunk_signature)
+from pythagoras._800_persidict_extensions.compressing_dict import (
+    CompressingDict)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(chunking_dict, "CHUNK_MIN_SIZE", 2**10)
+    monkeypatch.setattr(chunking_dict, "CHUNK_AVG_SIZE", 2**12)
+    monkeypatch.setattr(chunking_dict, "CHUNK_MAX_SIZE", 2**14)
+
+
+def test_chunks_survive_insertions(small_chunks):
+    data = np.random.default_rng(42).integers(
+        0, 256, 2**20, dtype=np.uint8).tobytes()
+    changed = data[:2**19] + b"inserted" + data[2**19:]
+    chunks = split_into_chunks(memoryview(data))
+    assert b"".join(chunks) == data
+    assert all(2**10 <= len(c) <= 2**14 for c in chunks[:-1])
+    signatures = {get_chunk_signature(c) for c in chunks}
+    changed_signatures = {get_chunk_signature(c)
+        for c in split_into_chunks(memoryview(changed))}
+    assert len(signatures - changed_signatures) <= 2
+
+
+def test_similar_values_share_chunks(tmpdir, small_chunks):
+    inner = FileDirDict(tmpdir.join("values"), immutable_items=True)
+    chunks = FileDirDict(tmpdir.join("chunks"), immutable_items=True)
+    d = ChunkingDict(inner, chunks, chunking_threshold=2**12)
+    df = pd.DataFrame({"x": np.arange(100_000), "y": np.arange(100_000) * 2.})
+    d["small"] = "hello"
+    d["df"] = df
+    n_chunks = len(chunks)
+    d["df_changed"] = df.drop(index=[500, 501])
+    assert isinstance(inner["df"], ChunkManifest)
+    assert inner["small"] == "hello"
+    assert d["df"].equals(df)
+    assert d["df_changed"].equals(df.drop(index=[500, 501]))
+    assert len(chunks) < 1.2 * n_chunks
+    assert d.reused_chunks_count > 0
+
+
+def test_copy_item(tmpdir, small_chunks):
+    source = ChunkingDict(FileDirDict(tmpdir.join("v1"), immutable_items=True)
+        , FileDirDict(tmpdir.join("c1"), immutable_items=True), 0)
+    target = ChunkingDict(FileDirDict(tmpdir.join("v2"), immutable_items=True)
+        , FileDirDict(tmpdir.join("c2"), immutable_items=True), 2**30)
+    value = list(range(50_000))
+    source["a"] = value
+    target["b"] = value
+    assert target.copy_item("a", source)
+    assert target["a"] == value
+    assert len(target.chunks) == len(source.chunks)
+    assert not source.copy_item("b", target)
+
+
+def test_portal_chunking(tmpdir, small_chunks):
+    value = pd.DataFrame({"x": np.arange(50_000)}).astype(object)
+    with _PortalTester():
+        source = DataPortal(tmpdir.join("p1"), chunking_threshold=2**12)
+        target = DataPortal(tmpdir.join("p2"), chunking_threshold=2**12)
+        assert source.get_params()["chunking_threshold"] == 2**12
+        with source:
+            addr = ValueAddr(value)
+            n_chunks = len(source._chunking_store.chunks)
+            assert n_chunks > 1
+            with target:
+                new_addr = ValueAddr.from_strings(prefix=addr.prefix
+                    , hash_signature=addr.hash_signature
+                    , portal=target, assert_readiness=False)
+                assert new_addr.ready
+                assert len(target._chunking_store.chunks) == n_chunks
+                assert new_addr.get().equals(value)
+
+
+class PickleCounter:
+    n_pickles = 0
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __reduce__(self):
+        PickleCounter.n_pickles += 1
+        return (PickleCounter, (self.payload,))
+
+
+def test_value_is_pickled_once_before_compression(tmpdir):
+    inner = FileDirDict(tmpdir.join("values"), immutable_items=True)
+    chunks = FileDirDict(tmpdir.join("chunks"), immutable_items=True)
+    d = ChunkingDict(CompressingDict(inner, compression_threshold=2**10)
+        , chunks, chunking_threshold=2**20)
+    PickleCounter.n_pickles = 0
+    d["x"] = PickleCounter(b"x" * 2**12)
+    assert PickleCounter.n_pickles == 1
+    assert d["x"].payload == b"x" * 2**12
@@ -0,0 +1,58 @@
+import numpy as np
+from persidict import FileDirDict
+
+from pythagoras import DataPortal, ValueAddr
+from pythagoras import _PortalTester
+from pythagoras._800_persidict_extensions.compressing_dict import (
+    CompressingDict, CompressedPickle)
+from pythagoras._800_persidict_extensions.serializing_dict import (
+    SerializingDict)
+
+
+def test_large_values_are_compressed(tmpdir):
+    inner = FileDirDict(tmpdir, immutable_items=True)
+    d = CompressingDict(inner, compression_threshold=1000)
+    d["small"] = "hello"
+    d["large"] = "hello " * 10_000
+    assert inner["small"] == "hello"
+    assert isinstance(inner["large"], CompressedPickle)
+    assert d["small"] == "hello"
+    assert d["large"] == "hello " * 10_000
+    assert d.compression_ratio > 10
+    assert len(d) == 2
+    assert set(d.keys()) == {("small",), ("large",)}
+
+
+def test_compressed_values_are_readable_with_any_threshold(tmpdir):
+    d = CompressingDict(FileDirDict(tmpdir, immutable_items=True), 0)
+    d["a"] = [1, 2, 3]
+    d_no_compression = CompressingDict(
+        FileDirDict(tmpdir, immutable_items=True), 2**30)
+    assert d_no_compression["a"] == [1, 2, 3]
+    assert CompressingDict(FileDirDict(tmpdir, immutable_items=True)
+        ).get_subdict("x").compression_threshold == 2**16
+
+
+def test_natively_saved_values_are_not_compressed(tmpdir):
+    inner = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    d = CompressingDict(inner, compression_threshold=0)
+    d["a"] = np.zeros(100_000)
+    assert len(inner.pickle_dict) == 0
+    assert np.array_equal(d["a"], np.zeros(100_000))
+    assert d.compression_ratio is None
+
+
+def test_portal_compression(tmpdir):
+    with _PortalTester(DataPortal
+            , root_dict=tmpdir, compression_threshold=1000) as t:
+        value = list(range(10_000))
+        addr = ValueAddr(value)
+        assert t.portal.get_params()["compression_threshold"] == 1000
+        assert t.portal.value_store.compression_ratio > 1
+        description = t.portal.describe()
+        assert "Compression ratio, values" in set(description["parameter"])
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        assert t.portal.compression_threshold is None
+        assert ValueAddr.from_strings(prefix=addr.prefix
+            , hash_signature=addr.hash_signature, portal=t.portal
+            ).get() == value
@@ -0,0 +1,77 @@
+import os
+
+from persidict import FileDirDict, SafeStrTuple
+from pythagoras._800_persidict_extensions.existence_index import (
+    ExistenceIndex)
+from pythagoras._800_persidict_extensions.first_entry_dict import (
+    FirstEntryDict)
+
+
+def test_existence_index_in_memory():
+    index = ExistenceIndex(max_recent=10)
+    for i in range(100):
+        index.add(("value", f"key_{i}"))
+    assert len(index) == 100
+    for i in range(100):
+        assert ("value", f"key_{i}") in index
+    assert ("value", "key_100") not in index
+    assert ("other", "key_1") not in index
+
+
+def test_existence_index_journals(tmpdir):
+    journal_dir = os.path.join(tmpdir, "index")
+    index = ExistenceIndex(journal_dir)
+    index.add("persisted", persist=True)
+    index.add("not_persisted")
+
+    loaded = ExistenceIndex(journal_dir)
+    assert "persisted" in loaded
+    assert "not_persisted" not in loaded
+
+    # A damaged last entry is ignored
+    journal_name = index._journal.name
+    with open(journal_name, "ab") as f:
+        f.write(b"\1\2\3")
+    loaded = ExistenceIndex(journal_dir)
+    assert "persisted" in loaded
+    assert len(loaded) == 1
+
+
+def test_existence_index_compaction(tmpdir):
+    journal_dir = os.path.join(tmpdir, "index")
+    for i in range(4):
+        index = ExistenceIndex(journal_dir, max_journals=3)
+        index.add(f"key_{i}", persist=True)
+    # Each index has its own journal, there are too many of them
+    index = ExistenceIndex(journal_dir, max_journals=3)
+    assert len(os.listdir(journal_dir)) == 1
+    for i in range(4):
+        assert f"key_{i}" in index
+    index.add("key_5", persist=True)
+    index.compact()
+    assert "key_5" in ExistenceIndex(journal_dir)
+
+
+def test_first_entry_dict_with_index(tmpdir):
+    d = FileDirDict(os.path.join(tmpdir, "values"), immutable_items=True)
+    journal_dir = os.path.join(tmpdir, "index")
+    fed = FirstEntryDict(d, existence_index=ExistenceIndex(journal_dir))
+    fed["a"] = 1
+    assert "a" in fed.existence_index
+    assert fed["a"] == 1
+
+    d["b"] = 2
+    assert "b" not in fed.existence_index
+    assert "b" in fed
+    assert "b" in fed.existence_index
+    assert "c" not in fed
+
+    # Keys, known to be present, are checked before a write is skipped
+    os.remove(d._build_full_path(SafeStrTuple("a")))
+    fed["a"] = 1
+    assert "a" in d
+    assert fed["a"] == 1
+
+    other = FirstEntryDict(d, existence_index=ExistenceIndex(journal_dir))
+    assert "a" in other.existence_index
+    assert "b" not in other.existence_index
@@ -1,5 +1,16 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
 from persidict import FileDirDict
-from pythagoras._800_persidict_extensions.first_entry_dict import FirstEntryDict
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent, publish_file_if_absent)
+from pythagoras._800_persidict_extensions.first_entry_dict import (
+    FirstEntryDict, compare_addresses, compare_by_contents
+    , get_content_checksum)
 
 import pytest
 
@@ -64,4 +75,106 @@ def test_firs_entry_dict_wrong_init_params(tmpdir):
 
     with pytest.raises(AssertionError):
         fed = FirstEntryDict(
-            FileDirDict(tmpdir, immutable_items=False))
\ No newline at end of file
+            FileDirDict(tmpdir, immutable_items=False))
+
+def test_first_entry_dict_concurrent_writers(tmpdir):
+    d = FileDirDict(tmpdir, immutable_items=True)
+    feds = [FirstEntryDict(d, p_consistency_checks=1) for _ in range(8)]
+    value = list(range(10_000))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in executor.map(
+                lambda fed: fed.__setitem__("key", value), feds):
+            pass
+    assert d["key"] == value
+    assert len(d) == 1
+    assert sum(fed._total_checks_count for fed in feds) == 7
+
+
+def test_create_if_absent(tmpdir):
+    d = FileDirDict(tmpdir, immutable_items=True)
+    assert create_if_absent(d, "a", 1)
+    assert not create_if_absent(d, "a", 2)
+    assert d["a"] == 1
+    assert not [f for f in os.listdir(tmpdir) if f.startswith(".tmp_")]
+
+
+def test_publishing_waits_for_reservations(tmpdir, monkeypatch):
+    def no_hard_links(*args):
+        raise OSError("Hard links are not supported")
+    monkeypatch.setattr(os, "link", no_hard_links)
+    file_name = str(tmpdir.join("value.pkl"))
+    tmp_name = str(tmpdir.join(".tmp_value"))
+    with open(tmp_name, "w") as f:
+        f.write("mine")
+    # Another writer has reserved the name, but not published its file yet
+    open(file_name + ".reserved", "w").close()
+    def publish_other_file():
+        time.sleep(0.2)
+        with open(file_name, "w") as f:
+            f.write("other")
+        os.remove(file_name + ".reserved")
+    other_writer = threading.Thread(target=publish_other_file)
+    other_writer.start()
+    assert not publish_file_if_absent(tmp_name, file_name)
+    assert os.path.exists(file_name)
+    other_writer.join()
+    with open(file_name) as f:
+        assert f.read() == "other"
+    assert not os.path.exists(tmp_name)
+
+def test_first_entry_dict_comparators(tmpdir):
+    calls = []
+    def comparator(key, stored_value, new_value):
+        calls.append(key)
+        return True
+    fed = FirstEntryDict(FileDirDict(tmpdir.join("a"), immutable_items=True)
+        , p_consistency_checks=1, comparator=comparator)
+    fed["a"] = 1
+    fed["a"] = 2 # the comparator says the values are the same
+    assert fed["a"] == 1
+    assert len(calls) == 1
+
+    df = pd.DataFrame({"x": range(1000), "y": [str(i) for i in range(1000)]})
+    fed = FirstEntryDict(FileDirDict(tmpdir.join("b"), immutable_items=True)
+        , p_consistency_checks=1)
+    fed["df"] = df
+    fed["df"] = df.copy()
+    with pytest.raises(AssertionError):
+        fed["df"] = df.iloc[::-1]
+    assert fed._total_checks_count == 2
+
+    assert compare_addresses("k", "abc", "abc")
+    assert not compare_addresses("k", "abc", "abd")
+    assert compare_addresses("k", df, df.copy())
+
+
+def test_consistency_checks_ignore_memory_layouts(tmpdir):
+    fed = FirstEntryDict(FileDirDict(tmpdir, immutable_items=True)
+        , p_consistency_checks=1)
+    x = np.arange(20).reshape(4, 5)[:, 0]
+    assert not x.flags.c_contiguous
+    fed["x"] = x
+    fed["x"] = x # the stored (reloaded) copy is contiguous
+    fed["x"] = np.ascontiguousarray(x)
+    with pytest.raises(AssertionError):
+        fed["x"] = x + 1
+    assert compare_by_contents("k", x, np.ascontiguousarray(x))
+    assert not compare_by_contents("k", x, x.astype(float))
+
+
+def test_content_checksums_ignore_memory_layouts(tmpdir):
+    d = FileDirDict(str(tmpdir.join("values")), immutable_items=True)
+    checksums = FileDirDict(str(tmpdir.join("checksums"))
+        , immutable_items=True, file_type="json")
+    fed = FirstEntryDict(d, content_checksums=checksums
+        , needs_checksum=lambda value: isinstance(value, np.ndarray))
+    x = np.arange(20).reshape(4, 5)[:, 0]
+    fed["x"] = x
+    fed["y"] = "not an array"
+    assert "x" in checksums and "y" not in checksums
+    assert checksums["x"] == get_content_checksum(fed["x"])
+    assert checksums["x"] == get_content_checksum(x)
+    assert checksums["x"] != get_content_checksum(x + 1)
+    df = pd.DataFrame(dict(a=[1, 2, 3], b=["x", "y", "z"]))
+    assert get_content_checksum(df) == get_content_checksum(df.copy())
+    assert get_content_checksum(df) != get_content_checksum(df[::-1])
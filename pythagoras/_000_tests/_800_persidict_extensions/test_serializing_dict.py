@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+from persidict import FileDirDict
+
+from pythagoras import DataPortal, ValueAddr, _PortalTester
+from pythagoras._800_persidict_extensions.serializing_dict import (
+    SerializingDict)
+from pythagoras._800_persidict_extensions.value_serializers import (
+    ValueSerializer, VALUE_SERIALIZERS, STORAGE_FORMATS,
+    register_value_serializer)
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_hash_signature)
+
+
+def test_numpy_arrays_are_memory_mapped(tmpdir):
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    a = np.arange(1000, dtype=np.float32).reshape(10, 100)
+    d["a"] = a
+    loaded = d["a"]
+    assert type(loaded) is np.ndarray
+    assert isinstance(loaded.base, np.memmap)
+    assert not loaded.flags.writeable
+    assert np.array_equal(loaded, a)
+    assert loaded.dtype == a.dtype
+    assert "a" in d
+    assert len(d) == 1
+    assert len(d.pickle_dict) == 0
+    with pytest.raises(KeyError):
+        d["a"] = a
+
+
+def test_dataframe_columns_are_memory_mapped(tmpdir):
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    df = pd.DataFrame({
+        "x": np.arange(100, dtype=np.int64)
+        , "s": [str(i) for i in range(100)]
+        , "y": np.linspace(0, 1, 100)}
+        , index=pd.RangeIndex(100, 200))
+    d["df"] = df
+    loaded = d["df"]
+    pd.testing.assert_frame_equal(loaded, df)
+    assert list(loaded.columns) == ["x", "s", "y"]
+    # loaded frames keep their structure, hence their addresses
+    assert get_hash_signature(loaded) == get_hash_signature(df)
+
+
+def test_other_values_are_pickled(tmpdir):
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    d["l"] = [1, 2, 3]
+    d["e"] = np.array([], dtype=np.float64)
+    d["o"] = np.array(["a", None], dtype=object)
+    assert d["l"] == [1, 2, 3]
+    assert len(d["e"]) == 0
+    assert list(d["o"]) == ["a", None]
+    assert len(d.pickle_dict) == 3
+    assert sorted(k[0] for k in d.keys()) == ["e", "l", "o"]
+
+
+def test_torch_tensors(tmpdir):
+    torch = pytest.importorskip("torch")
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    t = torch.arange(100, dtype=torch.float32)
+    d["t"] = t
+    assert torch.equal(d["t"], t)
+    assert len(d.pickle_dict) == 0
+
+
+def test_torch_slices_are_saved_without_their_base(tmpdir):
+    torch = pytest.importorskip("torch")
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    base = torch.arange(10**6, dtype=torch.float32)
+    d["t"] = base[:10]
+    assert torch.equal(d["t"], base[:10])
+    file_sizes = [f.size() for f in tmpdir.visit() if f.check(file=True)]
+    assert max(file_sizes) < base.numel() * base.element_size() / 10
+
+
+def test_pickle_storage_format(tmpdir):
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True)
+        , storage_format="pickle")
+    d["a"] = np.arange(10)
+    assert len(d.pickle_dict) == 1
+    d_mmap = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    d_mmap["b"] = np.arange(10)
+    assert len(d.pickle_dict) == 1
+    assert np.array_equal(d["b"], np.arange(10))
+    assert len(d) == 2
+
+
+def test_portal_storage_formats(tmpdir):
+    with _PortalTester(DataPortal, root_dict=tmpdir) as t:
+        assert t.portal.storage_format == "pickle"
+        ValueAddr(np.arange(10))
+        assert len(t.portal._value_store_layers.pickle_dict) == 1
+    with _PortalTester(DataPortal, root_dict=tmpdir
+            , storage_format="mmap") as t:
+        addr = ValueAddr(np.arange(20))
+        assert len(t.portal._value_store_layers.pickle_dict) == 1
+        assert np.array_equal(t.portal.value_store[addr], np.arange(20))
+
+
+def test_columnar_storage_format(tmpdir):
+    pytest.importorskip("pyarrow")
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True)
+        , storage_format="columnar")
+    df = pd.DataFrame({"x": np.arange(100), "s": [str(i) for i in range(100)]})
+    d["df"] = df
+    assert len(d.pickle_dict) == 0
+    pd.testing.assert_frame_equal(d["df"], df)
+
+
+class UpperCaseTextSerializer(ValueSerializer):
+    file_type = "uctxt"
+
+    def can_save(self, value) -> bool:
+        return isinstance(value, str) and value.isupper()
+
+    def save(self, value, file_name: str) -> None:
+        with open(file_name, "w") as f:
+            f.write(value)
+
+    def load(self, file_name: str):
+        with open(file_name) as f:
+            return f.read()
+
+
+def test_serializer_registered_later(tmpdir):
+    d = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    writer = SerializingDict(FileDirDict(tmpdir, immutable_items=True))
+    serializer = UpperCaseTextSerializer()
+    register_value_serializer(serializer, storage_formats=["mmap"])
+    try:
+        writer["a"] = "HELLO"
+        assert len(writer.pickle_dict) == 0
+        assert d["a"] == "HELLO"
+        assert "a" in d
+        assert len(d) == 1
+    finally:
+        VALUE_SERIALIZERS.remove(serializer)
+        STORAGE_FORMATS["mmap"].remove(serializer.file_type)
@@ -0,0 +1,32 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_hash_signature, new_hasher, register_hash_algorithm, HASH_ALGORITHMS)
+
+
+def test_default_hash_algorithm():
+    assert get_hash_signature([1, 2]) == get_hash_signature(
+        [1, 2], hash_type_name="sha256")
+    assert new_hasher().name == "sha256"
+
+
+@pytest.mark.parametrize("engine", ["joblib", "typed"])
+def test_registered_hash_algorithms(engine):
+    value = np.arange(100)
+    signatures = set()
+    for name in HASH_ALGORITHMS:
+        signature = get_hash_signature(value, engine, hash_type_name=name)
+        assert signature == get_hash_signature(
+            value.copy(), engine, hash_type_name=name)
+        signatures.add(signature)
+    assert len(signatures) == len(HASH_ALGORITHMS)
+
+
+def test_hash_algorithms_can_not_be_redefined():
+    with pytest.raises(AssertionError):
+        register_hash_algorithm("sha256", hashlib.sha256)
+    with pytest.raises(AssertionError):
+        new_hasher("no_such_algorithm")
@@ -0,0 +1,25 @@
+import numpy as np
+
+from pythagoras._820_strings_signatures_converters import hash_signatures
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_hash_signature)
+
+
+def test_parallel_hashing(monkeypatch):
+    monkeypatch.setattr(hash_signatures, "PARALLEL_HASHING_CHUNK_SIZE", 1000)
+    a = np.arange(10_000, dtype=np.float64)
+    sequential = get_hash_signature(a, "typed")
+    parallel = get_hash_signature(a, "typed", parallel_threshold=50_000)
+    assert parallel != sequential
+    assert parallel == get_hash_signature(
+        a.copy(), "typed", parallel_threshold=50_000)
+    assert parallel == get_hash_signature(
+        a, "typed", parallel_threshold=80_000)
+    assert sequential == get_hash_signature(
+        a, "typed", parallel_threshold=80_001)
+    b = a.copy()
+    b[-1] = 0
+    assert parallel != get_hash_signature(
+        b, "typed", parallel_threshold=50_000)
+    assert (get_hash_signature(b"x" * 10_000, "typed", parallel_threshold=1)
+        != get_hash_signature(b"x" * 10_000, "typed"))
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_hash_signature)
+
+
+def typed_hash(x):
+    return get_hash_signature(x, engine="typed")
+
+
+def test_typed_hash_numpy():
+    a = np.arange(100, dtype=np.float64).reshape(10, 10)
+    assert typed_hash(a) == typed_hash(a.copy())
+    assert typed_hash(a) != typed_hash(a.astype(np.float32))
+    assert typed_hash(a) != typed_hash(a.reshape(100))
+    assert typed_hash(a) != typed_hash(np.asfortranarray(a))
+    assert typed_hash(a[:, ::2]) == typed_hash(a[:, ::2])
+    b = a.copy()
+    b[5, 5] = -1
+    assert typed_hash(a) != typed_hash(b)
+
+
+def test_typed_hash_pandas():
+    df = pd.DataFrame({"a": range(10), "b": [str(i) for i in range(10)]})
+    assert typed_hash(df) == typed_hash(df.copy())
+    assert typed_hash(df) != typed_hash(df.rename(columns={"a": "c"}))
+    assert typed_hash(df) != typed_hash(df.iloc[::-1])
+    assert typed_hash(df["a"]) == typed_hash(df["a"].copy())
+    assert typed_hash(df["a"]) != typed_hash(df["a"].rename("z"))
+    assert typed_hash(df) != typed_hash(df["a"])
+
+
+def test_typed_hash_bytes_and_others():
+    assert typed_hash(b"abc") == typed_hash(b"abc")
+    assert typed_hash(b"abc") != typed_hash(bytearray(b"abc"))
+    assert typed_hash(b"abc") != typed_hash("abc")
+    assert typed_hash([1, 2]) == typed_hash([1, 2])
+    assert typed_hash([1, 2]) != typed_hash((1, 2))
+    assert typed_hash(1) != get_hash_signature(1)
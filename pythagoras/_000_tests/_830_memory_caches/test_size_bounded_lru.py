@@ -0,0 +1,39 @@
+import numpy as np
+
+from pythagoras._830_memory_caches.size_bounded_lru import (
+    SizeBoundedLRU, estimate_size)
+
+
+def test_lru_max_items():
+    cache = SizeBoundedLRU(max_items=3)
+    for i in range(3):
+        cache.put(i, str(i))
+    assert cache.get(0) == "0" # 0 becomes the most recently used
+    cache.put(3, "3")
+    assert len(cache) == 3
+    assert 1 not in cache
+    assert cache.get(1) is None
+    assert cache.get(0) == "0"
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_lru_max_bytes():
+    cache = SizeBoundedLRU(max_bytes=250)
+    for i in range(5):
+        cache.put(i, i, size=100)
+    assert len(cache) == 2
+    assert cache.total_bytes == 200
+    cache.put("huge", 0, size=1000)
+    assert "huge" not in cache
+    cache.discard(4)
+    assert cache.total_bytes == 100
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.total_bytes == 0
+
+
+def test_estimate_size():
+    assert estimate_size(np.zeros(1000)) >= 8000
+    assert estimate_size(b"x"*1000) >= 1000
+    assert estimate_size([b"x"*1000, b"y"*1000]) >= 2000
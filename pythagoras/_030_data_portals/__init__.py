@@ -29,3 +29,6 @@ from .value_addresses import ValueAddr
 
 from .data_portals import DataPortal
 
+from .identity_cache import treat_as_immutable
+from .fanout_migration import migrate_fanout_depth
+
@@ -2,14 +2,57 @@ from __future__ import annotations
 
 import os
 
-from typing import Optional
+from typing import Any, Optional
 
 import pandas as pd
 from persidict import FileDirDict, PersiDict
 
 from pythagoras._010_basic_portals.foundation import BasicPortal, _persistent, _runtime
+from pythagoras._010_basic_portals.exceptions import NotAllowedError
 from pythagoras._020_logging_portals.logging_portals import LoggingPortal
-from pythagoras._800_persidict_extensions.first_entry_dict import FirstEntryDict
+from pythagoras._030_data_portals.identity_cache import (
+    ValueAddrIdentityCache)
+from pythagoras._030_data_portals.values_cache import values_cache
+from pythagoras._030_data_portals.portal_config import (
+    is_empty_dict, reconcile_portal_setting)
+from pythagoras._800_persidict_extensions.chunking_dict import ChunkingDict
+from pythagoras._800_persidict_extensions.compressing_dict import (
+    CompressingDict)
+from pythagoras._800_persidict_extensions.existence_index import (
+    ExistenceIndex)
+from pythagoras._800_persidict_extensions.first_entry_dict import (
+    FirstEntryDict, compare_by_hashes, compare_by_contents)
+from pythagoras._800_persidict_extensions.serializing_dict import (
+    SerializingDict)
+from pythagoras._800_persidict_extensions.sharded_dict import (
+    ShardedDict, shard_key)
+from pythagoras._800_persidict_extensions.value_serializers import (
+    STORAGE_FORMATS)
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    HASH_ALGORITHMS)
+
+
+VALUE_HASHING_SCHEMES = ("joblib", "stream", "typed")
+
+_LAYOUT_SENSITIVE_PACKAGES = {"numpy", "pandas", "torch"}
+
+
+def compare_with_address(key: Any, stored_value: Any, new_value: Any) -> bool:
+    """Check a stored value against its address, by re-hashing the value.
+
+    Keys of a value store are addresses, derived from the values' hashes,
+    so a stored value is consistent if its hash matches its key
+    (the new value's hash matches the key by construction).
+    Hashes can depend on memory layouts (e.g. of arrays, loaded back
+    from files), so if the hash doesn't match, the stored value
+    is compared with the new one by contents.
+    For keys that are not ValueAddr-s, the values' hashes are compared.
+    """
+    is_address_of = getattr(key, "_is_address_of", None)
+    if is_address_of is None:
+        return compare_by_hashes(key, stored_value, new_value)
+    return (is_address_of(stored_value)
+        or compare_by_contents(key, stored_value, new_value))
 
 
 class DataPortal(LoggingPortal):
@@ -27,14 +70,84 @@ class DataPortal(LoggingPortal):
     'with' statement to support portal-aware code blocks. If some code is
     supposed to explicitly read anything from a portal, it should be wrapped
     in a 'with' statement that marks the portal as the current.
+
+    value_hashing defines how values get their addresses:
+    "joblib" (the default) hashes a value in memory, and then stores it;
+    "typed" does the same, but hashes data buffers of arrays, tensors
+    and data frames directly, without pickling them;
+    "stream" pickles a value only once, hashing the pickled bytes while
+    they are being written to the value store (with "stream", the order
+    of dict keys is a part of a value's address). Different schemes produce
+    different addresses, so the scheme is a persistent setting,
+    saved in the portal_config the first time the portal is created.
+
+    parallel_hashing_threshold (in bytes) enables parallel tree hashing
+    of large data buffers for the "typed" scheme (it can't be set
+    with other schemes): buffers of this size or larger are split
+    into chunks, hashed on a thread pool.
+    It affects value addresses as well, so it's a persistent setting too;
+    0 (the default) disables parallel hashing.
+
+    hash_type is the name of a hash algorithm from HASH_ALGORITHMS
+    ("sha256" by default, faster ones, e.g. "blake2b_v1", are available).
+    It's a persistent setting as well: all values in a portal must be
+    hashed with the same algorithm.
+
+    storage_format defines how a file-based portal saves values,
+    see STORAGE_FORMATS: "pickle" (the default) pickles all values,
+    "mmap" saves arrays and DataFrames in memory-mappable files,
+    "columnar" saves DataFrames as Parquet. It doesn't affect addresses,
+    values saved in any format can always be read back. Note that
+    memory-mapped values are loaded read-only, while a value returned
+    by a (just executed) function is whatever the function returned.
+
+    compression_threshold (in bytes) enables lz4 compression of pickled
+    values: pickles of this size or larger are compressed,
+    smaller ones are stored as is. None (the default) disables
+    compression. Like storage_format, it only affects how new values
+    are written: compressed values are always decompressed transparently.
+
+    chunking_threshold (in bytes) enables chunked storage of pickled
+    values: pickles of this size or larger are split into
+    content-defined chunks, saved once (by their hashes) in the
+    value_chunks subdict; the value store then keeps a list of chunks
+    of the value. Similar values (e.g. DataFrames that differ
+    by a few rows) share most of their chunks, which are neither
+    stored nor copied between portals twice. None (the default)
+    disables chunking; chunked values are always readable.
+
+    fanout_depth is the number of levels of nested subdirectories,
+    named by characters of the hashes, that hash-named files (values,
+    chunks, checksums, execution results) are spread over: with millions
+    of values of one type, huge folders make file operations slow.
+    0 (the default) keeps all files of a type in one folder.
+    It's a persistent setting, existing portals can be converted
+    with migrate_fanout_depth().
     """
 
     value_store: FirstEntryDict|None
+    value_checksums: PersiDict|None
+    portal_config: PersiDict|None
+    value_addr_cache: ValueAddrIdentityCache|None
     _p_consistency_checks: float|None
+    _value_hashing: str|None
+    _parallel_hashing_threshold: int|None
+    _hash_type: str|None
+    _storage_format: str|None
+    _compression_threshold: int|None
+    _chunking_threshold: int|None
+    _fanout_depth: int|None
 
     def __init__(self
             , root_dict:PersiDict|str|None = None
             , p_consistency_checks: float | None = None
+            , value_hashing: str | None = None
+            , parallel_hashing_threshold: int | None = None
+            , hash_type: str | None = None
+            , storage_format: str | None = None
+            , compression_threshold: int | None = None
+            , chunking_threshold: int | None = None
+            , fanout_depth: int | None = None
             ):
         super().__init__(root_dict = root_dict)
         del root_dict
@@ -49,13 +162,112 @@ class DataPortal(LoggingPortal):
         value_store_params.update(
             digest_len=0, immutable_items=True, file_type = "pkl")
         value_store = type(self.root_dict)(**value_store_params)
-        value_store = FirstEntryDict(value_store, p_consistency_checks)
+
+        portal_config_prototype = self.root_dict.get_subdict("portal_config")
+        portal_config_params = portal_config_prototype.get_params()
+        portal_config_params.update(
+            digest_len=0, immutable_items=True, file_type = "json")
+        portal_config = type(self.root_dict)(**portal_config_params)
+        self.portal_config = portal_config
+
+        if fanout_depth is not None:
+            fanout_depth = int(fanout_depth)
+            assert fanout_depth >= 0
+        self._fanout_depth = reconcile_portal_setting(
+            portal_config, "fanout_depth"
+            , requested=fanout_depth
+            , default=0
+            , legacy=0
+            , has_legacy_data=not is_empty_dict(value_store))
+
+        if storage_format is None:
+            storage_format = "pickle"
+        assert storage_format in STORAGE_FORMATS
+        self._storage_format = storage_format
+        if isinstance(value_store, FileDirDict):
+            value_store = SerializingDict(value_store, storage_format)
+        if compression_threshold is not None:
+            compression_threshold = int(compression_threshold)
+            assert compression_threshold >= 0
+            value_store = CompressingDict(value_store, compression_threshold)
+        self._compression_threshold = compression_threshold
+        if chunking_threshold is not None:
+            chunking_threshold = int(chunking_threshold)
+            assert chunking_threshold >= 0
+            chunks_prototype = self.root_dict.get_subdict("value_chunks")
+            chunks_params = chunks_prototype.get_params()
+            chunks_params.update(
+                digest_len=0, immutable_items=True, file_type = "pkl")
+            value_chunks = type(self.root_dict)(**chunks_params)
+            value_chunks = self._build_sharded_dict(value_chunks)
+            if compression_threshold is not None:
+                value_chunks = CompressingDict(
+                    value_chunks, compression_threshold)
+            value_store = ChunkingDict(
+                value_store, value_chunks, chunking_threshold)
+        self._chunking_threshold = chunking_threshold
+        value_store = self._build_sharded_dict(value_store)
+
+        checksums_prototype = self.root_dict.get_subdict("value_checksums")
+        checksums_params = checksums_prototype.get_params()
+        checksums_params.update(
+            digest_len=0, immutable_items=True, file_type = "json")
+        value_checksums = type(self.root_dict)(**checksums_params)
+        self.value_checksums = self._build_sharded_dict(value_checksums)
+
+        value_store = FirstEntryDict(value_store, p_consistency_checks
+            , comparator=compare_with_address
+            , existence_index=self._build_existence_index("value_store")
+            , content_checksums=self.value_checksums
+            , needs_checksum=self._value_needs_checksum)
         self.value_store = value_store
 
+        assert value_hashing is None or value_hashing in VALUE_HASHING_SCHEMES
+        self._value_hashing = reconcile_portal_setting(
+            portal_config, "value_hashing"
+            , requested=value_hashing
+            , default="joblib"
+            , legacy="joblib"
+            , has_legacy_data=not is_empty_dict(value_store))
+
+        if parallel_hashing_threshold is not None:
+            parallel_hashing_threshold = int(parallel_hashing_threshold)
+            assert parallel_hashing_threshold >= 0
+            if (parallel_hashing_threshold > 0
+                    and self._value_hashing != "typed"):
+                raise NotAllowedError(
+                    "parallel_hashing_threshold only works with"
+                    + " value_hashing='typed', the portal uses"
+                    + f" value_hashing={self._value_hashing!r}.")
+        self._parallel_hashing_threshold = reconcile_portal_setting(
+            portal_config, "parallel_hashing_threshold"
+            , requested=parallel_hashing_threshold
+            , default=0
+            , legacy=0
+            , has_legacy_data=not is_empty_dict(value_store))
+
+        assert hash_type is None or hash_type in HASH_ALGORITHMS, (
+            f"Unknown hash algorithm {hash_type}")
+        self._hash_type = reconcile_portal_setting(
+            portal_config, "hash_type"
+            , requested=hash_type
+            , default="sha256"
+            , legacy="sha256"
+            , has_legacy_data=not is_empty_dict(value_store))
+
+        self.value_addr_cache = ValueAddrIdentityCache()
+
     def get_params(self) -> dict:
         """Get the portal's configuration parameters"""
         params = super().get_params()
         params["p_consistency_checks"] = self.p_consistency_checks
+        params["value_hashing"] = self.value_hashing
+        params["parallel_hashing_threshold"] = self.parallel_hashing_threshold
+        params["hash_type"] = self.hash_type
+        params["storage_format"] = self.storage_format
+        params["compression_threshold"] = self.compression_threshold
+        params["chunking_threshold"] = self.chunking_threshold
+        params["fanout_depth"] = self.fanout_depth
         return params
 
     def describe(self) -> pd.DataFrame:
@@ -68,6 +280,17 @@ class DataPortal(LoggingPortal):
         all_params.append(_runtime(
             "Probability of checks"
             , self._p_consistency_checks))
+        if self.compression_threshold is not None:
+            all_params.append(_runtime(
+                "Compression threshold, bytes"
+                , self.compression_threshold))
+            all_params.append(_runtime(
+                "Compression ratio, values"
+                , self.value_store.compression_ratio))
+        if self.chunking_threshold is not None:
+            all_params.append(_persistent(
+                "Value chunks, total"
+                , len(self._chunking_store.chunks)))
 
         result = pd.concat(all_params)
         result.reset_index(drop=True, inplace=True)
@@ -78,6 +301,126 @@ class DataPortal(LoggingPortal):
     def p_consistency_checks(self) -> float|None:
         return self._p_consistency_checks
 
+    @property
+    def value_hashing(self) -> str|None:
+        return self._value_hashing
+
+    @property
+    def parallel_hashing_threshold(self) -> int|None:
+        return self._parallel_hashing_threshold
+
+    @property
+    def hash_type(self) -> str|None:
+        return self._hash_type
+
+    def _hashes_values_like(self, other: DataPortal) -> bool:
+        """Check if values get the same addresses in both portals.
+
+        A value can only be copied between portals under its address
+        if both of them hash values the same way.
+        """
+        return (self.value_hashing == other.value_hashing
+            and self.hash_type == other.hash_type
+            and self.parallel_hashing_threshold
+                == other.parallel_hashing_threshold)
+
+    @property
+    def storage_format(self) -> str|None:
+        return self._storage_format
+
+    @property
+    def compression_threshold(self) -> int|None:
+        return self._compression_threshold
+
+    @property
+    def chunking_threshold(self) -> int|None:
+        return self._chunking_threshold
+
+    def _build_existence_index(self, name: str) -> ExistenceIndex:
+        """Create an index of keys, present in one of the portal's stores.
+
+        For file-based portals, the index is persisted (as journals)
+        in the "<name>_index" folder of the portal's base directory.
+        """
+        journal_dir = None
+        if isinstance(self.root_dict, FileDirDict):
+            journal_dir = os.path.join(
+                self.root_dict.base_dir, name + "_index")
+        return ExistenceIndex(journal_dir)
+
+    @property
+    def fanout_depth(self) -> int|None:
+        return self._fanout_depth
+
+    def _stored_key(self, key) -> Any:
+        """Get the key, a value is saved under in the value store's layers.
+
+        It differs from the value's address if keys are fanned out.
+        """
+        if not self._fanout_depth:
+            return key
+        return shard_key(key, self._fanout_depth)
+
+    def _value_needs_checksum(self, value: Any) -> bool:
+        """Check if a value's address can depend on its memory layout.
+
+        "joblib" and "typed" hashes of arrays, tensors and DataFrames
+        include their layouts (e.g. strides), which are not preserved
+        when a value is saved and loaded back, so such values can't be
+        verified by re-hashing them. Their layout-independent checksums
+        are saved in value_checksums. Pickles, hashed by "stream",
+        don't depend on layouts.
+        """
+        if self.value_hashing == "stream":
+            return False
+        package = type(value).__module__.split(".")[0]
+        return package in _LAYOUT_SENSITIVE_PACKAGES
+
+    def _build_sharded_dict(self, a_dict: PersiDict) -> PersiDict:
+        """Wrap a store of hash-named items in a ShardedDict, if needed."""
+        if not self._fanout_depth:
+            return a_dict
+        return ShardedDict(a_dict, self._fanout_depth)
+
+    @property
+    def _value_store_layers(self) -> PersiDict:
+        """Get the value store without FirstEntryDict and ShardedDict."""
+        store = self.value_store._wrapped_dict
+        if isinstance(store, ShardedDict):
+            store = store._wrapped_dict
+        return store
+
+    @property
+    def _chunking_store(self) -> ChunkingDict|None:
+        """Get the value store's ChunkingDict, if chunking is enabled."""
+        store = self._value_store_layers
+        if isinstance(store, ChunkingDict):
+            return store
+        return None
+
+    def _value_streaming_store(self, value) -> FileDirDict | None:
+        """Get the dictionary a value can be pickled directly into.
+
+        Returns None if the value store is not file-based,
+        or if the value is saved in a format other than pickle.
+        The size of a pickle is not known before it's streamed, so
+        with compression enabled, streamed values are lz4-compressed
+        regardless of the compression_threshold. They bypass
+        the chunk store, so values are not streamed if chunking is enabled.
+        """
+        if self.chunking_threshold is not None:
+            return None
+        store = self._value_store_layers
+        if isinstance(store, CompressingDict):
+            store = store._wrapped_dict
+        if isinstance(store, SerializingDict):
+            if store.serializer_for(value) is not None:
+                return None
+            store = store.pickle_dict
+        if isinstance(store, FileDirDict) and store.file_type == "pkl":
+            return store
+        return None
+
     @classmethod
     def get_best_portal_to_use(cls, suggested_portal: Optional[DataPortal] = None
                                ) -> DataPortal:
@@ -100,5 +443,16 @@ class DataPortal(LoggingPortal):
     def _clear(self) -> None:
         """Clear the portal's state"""
         self.value_store = None
+        self.value_checksums = None
+        self.portal_config = None
+        self.value_addr_cache = None
+        values_cache.clear()
         self._p_consistency_checks = 1
+        self._value_hashing = None
+        self._parallel_hashing_threshold = None
+        self._hash_type = None
+        self._storage_format = None
+        self._compression_threshold = None
+        self._fanout_depth = None
+        self._chunking_threshold = None
         super()._clear()
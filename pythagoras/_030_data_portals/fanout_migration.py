@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+
+from persidict import FileDirDict
+
+from pythagoras._800_persidict_extensions.sharded_dict import (
+    get_shard_names, is_shard_name, is_sharded_key)
+
+
+# Number of key components before the hash signature, for each store:
+# values and execution results have type prefixes, chunks don't
+SHARDED_STORES = dict(value_store=1, value_chunks=0
+    , value_checksums=1, execution_results=1)
+
+
+def _get_current_depth(dirs: list[str], signature: str
+        , n_key_dirs: int) -> int | None:
+    """Find out which fan-out layout a file is stored in.
+
+    The depth is the number of directories beyond the key's own ones,
+    they must be the shard names of the signature. Returns None
+    if the file fits no layout (e.g. it wasn't written by a portal).
+    """
+    depth = len(dirs) - n_key_dirs
+    if depth < 0:
+        return None
+    if depth and not is_sharded_key([*dirs, signature], depth):
+        return None
+    return depth
+
+
+def _remove_empty_dirs(store_dir: str) -> None:
+    for dir_name, subdirs, files in os.walk(store_dir, topdown=False):
+        if dir_name != store_dir and not os.listdir(dir_name):
+            os.rmdir(dir_name)
+
+
+def migrate_fanout_depth(base_dir: str, fanout_depth: int) -> int:
+    """Move files of a file-based portal into a new fan-out layout.
+
+    Hash-named files of value_store, value_chunks, value_checksums
+    and execution_results are moved into nested subdirectories,
+    defined by fanout_depth (see DataPortal), and the new depth
+    is saved in the portal_config. No process may use the portal
+    while it's being migrated. The current depth of each file is found
+    from its path, so an interrupted migration can be finished
+    by running it again. Files that fit no fan-out layout
+    (e.g. not written by a portal) are left in place.
+
+    Returns the number of files moved.
+    """
+    fanout_depth = int(fanout_depth)
+    assert fanout_depth >= 0
+    base_dir = os.path.abspath(base_dir)
+    config_params = FileDirDict(base_dir=base_dir).get_subdict(
+        "portal_config").get_params()
+    config_params.update(
+        digest_len=0, immutable_items=False, file_type="json")
+    portal_config = FileDirDict(**config_params)
+
+    n_moved = 0
+    for store_name, n_key_dirs in SHARDED_STORES.items():
+        store_dir = os.path.join(base_dir, store_name)
+        if not os.path.isdir(store_dir):
+            continue
+        for dir_name, _, files in os.walk(store_dir):
+            dirs = os.path.relpath(dir_name, store_dir).split(os.sep)
+            dirs = [d for d in dirs if d != "."]
+            for file_name in files:
+                if file_name.startswith("."):
+                    continue # temporary files
+                signature = os.path.splitext(file_name)[0]
+                depth = _get_current_depth(dirs, signature, n_key_dirs)
+                if depth is None or depth == fanout_depth:
+                    continue
+                new_shards = get_shard_names(signature, fanout_depth)
+                if not all(is_shard_name(name) for name in new_shards):
+                    continue # not a hash-named file
+                key_dirs = dirs[:len(dirs) - depth]
+                new_dir = os.path.join(store_dir, *key_dirs, *new_shards)
+                os.makedirs(new_dir, exist_ok=True)
+                source = os.path.join(dir_name, file_name)
+                target = os.path.join(new_dir, file_name)
+                if os.path.exists(target):
+                    os.remove(source) # items are immutable
+                else:
+                    os.replace(source, target)
+                n_moved += 1
+        _remove_empty_dirs(store_dir)
+
+    portal_config["fanout_depth"] = fanout_depth
+    return n_moved
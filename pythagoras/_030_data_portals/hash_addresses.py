@@ -49,8 +49,8 @@ class HashAddr(SafeStrTuple, PortalAwareClass, ABC):
 
 
     @staticmethod
-    def _build_hash_signature(x: Any) -> str:
-        """Create a URL-safe hashdigest for an object."""
+    def _build_descriptor(x: Any) -> str:
+        """Create a short human-readable summary of an object's structure."""
 
         if (hasattr(x, "shape") and hasattr(x.shape, "__iter__")
                 and callable(x.shape.__iter__) and not callable(x.shape)):
@@ -64,7 +64,18 @@ class HashAddr(SafeStrTuple, PortalAwareClass, ABC):
             descriptor = ""
 
         descriptor = replace_unsafe_chars(descriptor, replace_with="_")
-        raw_hash_signature = get_hash_signature(x)
+        return descriptor
+
+
+    @staticmethod
+    def _build_hash_signature(x: Any, engine: str = "joblib"
+            , parallel_threshold: int | None = None
+            , hash_type: str | None = None) -> str:
+        """Create a URL-safe hashdigest for an object."""
+
+        descriptor = HashAddr._build_descriptor(x)
+        raw_hash_signature = get_hash_signature(
+            x, engine, parallel_threshold, hash_type)
         hash_signature = descriptor + raw_hash_signature
 
         return hash_signature
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import threading
+import weakref
+from typing import Any
+
+_opted_in_objects: dict[int, weakref.ref] = dict()
+_opted_in_lock = threading.Lock()
+
+
+def _forget_opted_in(object_id: int, ref: weakref.ref) -> None:
+    with _opted_in_lock:
+        if _opted_in_objects.get(object_id) is ref:
+            del _opted_in_objects[object_id]
+
+
+def treat_as_immutable(obj: Any) -> Any:
+    """Promise that an object will never be modified.
+
+    Pythagoras can then remember the object's address (by the object's
+    identity) and skip re-hashing it every time it's passed to a pure
+    function. It's useful for large DataFrames or arrays that are
+    passed into thousands of calls. Modifying the object afterwards
+    leads to wrong addresses, so use with care.
+
+    Only objects that support weak references can be opted in.
+    Returns the object itself.
+    """
+    object_id = id(obj)
+    ref = weakref.ref(obj, lambda r, i=object_id: _forget_opted_in(i, r))
+    with _opted_in_lock:
+        _opted_in_objects[object_id] = ref
+    return obj
+
+
+def is_known_immutable(obj: Any) -> bool:
+    """Check if an object's identity can be used in place of its value.
+
+    These are only objects, explicitly opted in via treat_as_immutable().
+    Read-only Numpy arrays don't qualify: anyone can make them
+    writeable again (by setting flags.writeable) and modify them.
+    """
+    ref = _opted_in_objects.get(id(obj))
+    return ref is not None and ref() is obj
+
+
+class ValueAddrIdentityCache:
+    """A cache of addresses of known immutable objects, keyed by identity.
+
+    Entries are kept only while the objects are alive (via weak
+    references), so a reused id() never returns a stale address.
+    The cache is thread-safe; it counts hits and misses.
+    """
+
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self._entries: dict[int, tuple[weakref.ref, Any]] = dict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _forget(self, object_id: int, ref: weakref.ref) -> None:
+        with self._lock:
+            entry = self._entries.get(object_id)
+            if entry is not None and entry[0] is ref:
+                del self._entries[object_id]
+
+    def get(self, obj: Any) -> Any:
+        """Return the cached address of an object, or None."""
+        if not is_known_immutable(obj):
+            return None
+        with self._lock:
+            entry = self._entries.get(id(obj))
+            if entry is not None and entry[0]() is obj:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, obj: Any, addr: Any) -> None:
+        """Remember the address of an object, if it's known immutable."""
+        if not is_known_immutable(obj):
+            return
+        object_id = id(obj)
+        try:
+            ref = weakref.ref(obj, lambda r, i=object_id: self._forget(i, r))
+        except TypeError:
+            return
+        with self._lock:
+            self._entries[object_id] = (ref, addr)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
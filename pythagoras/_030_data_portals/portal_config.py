@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any
+
+from persidict import PersiDict
+
+from pythagoras._010_basic_portals.exceptions import NotAllowedError
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent)
+
+
+def is_empty_dict(a_dict: PersiDict) -> bool:
+    """Check if a persistent dictionary is empty, without counting its keys."""
+    for _ in a_dict.keys():
+        return False
+    return True
+
+
+def reconcile_portal_setting(
+        portal_config: PersiDict
+        , name: str
+        , requested: Any
+        , default: Any
+        , legacy: Any
+        , has_legacy_data: bool
+        ) -> Any:
+    """Get the value of a persistent portal setting.
+
+    Some portal settings (e.g. how values are hashed) determine
+    the addresses of all objects in the portal, so they can not change
+    during the portal's lifetime, and all processes that use the portal
+    must agree on them. Such settings are saved in the portal_config
+    dictionary the first time the portal is created.
+
+    If a setting is already saved, the requested value (if any) must
+    match it. If the setting is not saved yet, but the portal already
+    contains data (created before the setting existed), the setting
+    is assumed to have its legacy value. Otherwise, the requested value
+    (or the default one, if no value was requested) is saved and used.
+    A NotAllowedError is raised if the requested value is incompatible
+    with the portal.
+    """
+    if name not in portal_config:
+        if has_legacy_data:
+            value = legacy
+        else:
+            value = default if requested is None else requested
+        create_if_absent(portal_config, name, value)
+
+    stored_value = portal_config[name]
+    if requested is not None and requested != stored_value:
+        raise NotAllowedError(
+            f"Portal setting {name} is already set to {stored_value!r},"
+            + f" it can't be changed to {requested!r}.")
+    return stored_value
@@ -7,6 +7,16 @@ from pythagoras import BasicPortal
 from pythagoras._030_data_portals.hash_addresses import HashAddr
 from pythagoras._030_data_portals.data_portals import (
     DataPortal)
+from pythagoras._030_data_portals.values_cache import (
+    get_cached_value, cache_value)
+from pythagoras._030_data_portals.value_streaming import (
+    get_stream_hash_signature, stream_value_to_file)
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    publish_file_if_absent)
+from pythagoras._800_persidict_extensions.file_dir_dict_adapter import (
+    get_file_name)
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    max_signature_length)
 
 T = TypeVar("T")
 
@@ -37,29 +47,99 @@ class ValueAddr(HashAddr):
         with portal:
             if hasattr(data, "get_ValueAddr"):
                 data_value_addr = data.get_ValueAddr()
-                prefix = data_value_addr.prefix
-                hash_signature = data_value_addr.hash_signature
-                super().__init__(prefix, hash_signature, portal=portal)
-                if portal != data_value_addr.portal and (
-                        not self in portal.value_store):
+                if not portal._hashes_values_like(data_value_addr.portal):
+                    # The value gets a new address, hashed the portal's way
                     data = data_value_addr.get()
-                    portal.value_store[self] = data
-                self._ready = True
-                return
+                else:
+                    prefix = data_value_addr.prefix
+                    hash_signature = data_value_addr.hash_signature
+                    super().__init__(prefix, hash_signature, portal=portal)
+                    if portal != data_value_addr.portal and (
+                            not self in portal.value_store):
+                        data = data_value_addr.get()
+                        portal.value_store[self] = data
+                    self._ready = True
+                    return
 
         assert not isinstance(data, HashAddr), (
                 "get_ValueAddr is the only way to "
                 + "convert HashAddr into ValueAddr")
 
-        prefix = self._build_prefix(data)
-        hash_signature = self._build_hash_signature(data)
-        super().__init__(prefix, hash_signature, portal=portal)
+        cached_addr = portal.value_addr_cache.get(data)
+        if cached_addr is not None:
+            super().__init__(cached_addr.prefix, cached_addr.hash_signature
+                , portal=portal)
+            self._value = data
+            self._ready = True
+            return
 
-        with portal:
-            portal.value_store[self] = data
+        prefix = self._build_prefix(data)
+        if portal.value_hashing == "stream":
+            self._init_streamed(prefix, data, portal)
+        else:
+            hash_signature = self._build_hash_signature(
+                data, portal.value_hashing
+                , portal.parallel_hashing_threshold, portal.hash_type)
+            super().__init__(prefix, hash_signature, portal=portal)
+            with portal:
+                portal.value_store[self] = data
+        portal.value_addr_cache.put(data, self)
         self._value = data
         self._ready = True
 
+    def _init_streamed(self, prefix: str, data: Any, portal: DataPortal):
+        """Hash and store a value, pickling it only once.
+
+        If the value store is a local file-based dictionary (and the value
+        is stored as a pickle), the value is pickled directly
+        into a temporary file in the store,
+        the hash is computed over the same bytes on the fly.
+        The file is then atomically moved to its final location
+        (or discarded, if the value is already in the store).
+        The value store is then notified as if the value was assigned
+        to it: its existence index is updated, and consistency
+        checks are done as usual.
+        """
+        descriptor = self._build_descriptor(data)
+        with portal:
+            store = portal._value_streaming_store(data)
+            if store is None:
+                raw_hash_signature = get_stream_hash_signature(
+                    data, portal.hash_type)
+                hash_signature = (descriptor
+                    + raw_hash_signature[:max_signature_length])
+                super().__init__(prefix, hash_signature, portal=portal)
+                portal.value_store[self] = data
+                return
+            tmp_name, raw_hash_signature = stream_value_to_file(
+                data, store.base_dir, portal.hash_type
+                , compress=portal.compression_threshold is not None)
+            hash_signature = (descriptor
+                + raw_hash_signature[:max_signature_length])
+            super().__init__(prefix, hash_signature, portal=portal)
+            file_name = get_file_name(store
+                , portal._stored_key(self), create_subdirs=True)
+            is_created = publish_file_if_absent(tmp_name, file_name)
+            portal.value_store._note_stored(self, data, is_created)
+
+    def _is_address_of(self, data: Any) -> bool:
+        """Check if the address matches a value, by re-hashing the value.
+
+        The value is hashed the way the address's portal hashes values.
+        """
+        portal = self.portal
+        if self._build_prefix(data) != self.prefix:
+            return False
+        if portal.value_hashing == "stream":
+            hash_signature = (self._build_descriptor(data)
+                + get_stream_hash_signature(
+                    data, portal.hash_type)[:max_signature_length])
+        else:
+            hash_signature = self._build_hash_signature(
+                data, portal.value_hashing
+                , portal.parallel_hashing_threshold, portal.hash_type)
+        return hash_signature == self.hash_signature
+
     def _invalidate_cache(self):
         if hasattr(self, "_value"):
             del self._value
@@ -86,16 +166,39 @@ class ValueAddr(HashAddr):
 
     @property
     def _ready_in_noncurrent_portals(self) -> bool:
+        """Check other portals for the value, copy it if it's found there.
+
+        Portals that hash values differently are skipped: their
+        addresses can't be used to store values in the address's portal.
+        """
         for portal in DataPortal.get_noncurrent_portals():
+            if not self.portal._hashes_values_like(portal):
+                continue
             with portal:
                 if self in portal.value_store:
-                    data = portal.value_store[self]
-                    with self.portal:
-                        self.portal.value_store[self] = data
+                    if not self._copy_chunked_from(portal):
+                        data = portal.value_store[self]
+                        with self.portal:
+                            self.portal.value_store[self] = data
                     self._ready = True
                     return True
         return False
 
+    def _copy_chunked_from(self, portal: DataPortal) -> bool:
+        """Copy a chunked value from another portal, chunk by chunk.
+
+        Only chunks that are missing in the address's portal
+        are transferred. Returns False if the value can't be copied
+        this way (chunking is disabled in one of the portals,
+        or the value is not chunked).
+        """
+        source = portal._chunking_store
+        target = self.portal._chunking_store
+        if source is None or target is None:
+            return False
+        return target.copy_item(self.portal._stored_key(self)
+            , source, portal._stored_key(self))
+
     @property
     def ready(self) -> bool:
         """Check if address points to a value that is ready to be retrieved."""
@@ -117,8 +220,14 @@ class ValueAddr(HashAddr):
         if hasattr(self, "_value"):
             return self._value
 
+        is_cached, result = get_cached_value(self)
+        if is_cached:
+            self._value = result
+            return result
+
         with self.portal:
             result = self.portal.value_store[self]
+            cache_value(self, result)
             self._value = result
             return result
 
@@ -126,11 +235,19 @@ class ValueAddr(HashAddr):
     def get_from_noncurrent_portals(self, timeout:Optional[int] = None) -> Any:
         """Retrieve value, referenced by the address, from noncurrent portals"""
         for portal in DataPortal.get_noncurrent_portals():
+            if not self.portal._hashes_values_like(portal):
+                continue
             try:
                 with portal:
-                    result = portal.value_store[self]
+                    is_copied = self._copy_chunked_from(portal)
+                    if not is_copied:
+                        result = portal.value_store[self]
                 with self.portal:
-                    self.portal.value_store[self] = result
+                    if is_copied:
+                        result = self.portal.value_store[self]
+                    else:
+                        self.portal.value_store[self] = result
+                cache_value(self, result)
                 self._value = result
                 return result
             except:
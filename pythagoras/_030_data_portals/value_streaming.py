@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import os
+import pickle
+import tempfile
+from typing import Any
+
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    publish_file_if_absent)
+from pythagoras._820_strings_signatures_converters.base_16_32_convertors import (
+    convert_base16_to_base32)
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    new_hasher)
+
+try:
+    import lz4.frame as _compression
+except:
+    import gzip as _compression
+
+
+STREAM_PICKLE_PROTOCOL = 5
+
+
+def _sort_key(x: Any) -> tuple[str, bytes]:
+    """A fallback sort key for values of mutually incomparable types."""
+    return (type(x).__qualname__
+        , pickle.dumps(x, protocol=STREAM_PICKLE_PROTOCOL))
+
+
+def _sorted(items: list) -> list:
+    try:
+        return sorted(items)
+    except:
+        return sorted(items, key=_sort_key)
+
+
+class _UnorderedSetFound(Exception):
+    """Raised to abort pickling at a set, not iterated in sorted order."""
+
+
+_SET_TYPES = (set, frozenset)
+
+
+def _check_set_order(obj: Any) -> None:
+    """Abort pickling if a set would be saved in an unsorted order.
+
+    Used as the persistent_id() hook of the C pickler, which is called
+    for every object; it always returns None (the object is pickled
+    as usual), so the pickled bytes are not affected.
+    """
+    if type(obj) in _SET_TYPES:
+        items = list(obj)
+        if items != _sorted(items):
+            raise _UnorderedSetFound()
+
+
+class _FastPickler(pickle.Pickler):
+    """The C pickler, that refuses to save sets in an unsorted order.
+
+    The order of set elements depends on their hashes (which can be
+    randomized per process) and on the history of the set, so such
+    pickles would not be deterministic (see _SortingPickler).
+    """
+
+    def __init__(self, file):
+        super().__init__(file, protocol=STREAM_PICKLE_PROTOCOL)
+        self.persistent_id = _check_set_order
+
+
+class _SortingPickler(pickle._Pickler):
+    """A (slower) pickler, that saves elements of sets in sorted order."""
+
+    dispatch = pickle._Pickler.dispatch.copy()
+
+    def __init__(self, file):
+        super().__init__(file, protocol=STREAM_PICKLE_PROTOCOL)
+
+    def save_set(self, obj):
+        pickle._Pickler.save_set(self, _sorted(list(obj)))
+
+    dispatch[set] = save_set
+
+    def save_frozenset(self, obj):
+        pickle._Pickler.save_frozenset(self, _sorted(list(obj)))
+
+    dispatch[frozenset] = save_frozenset
+
+
+class _HashingWriter:
+    """A file-like object that hashes all the bytes it writes."""
+
+    def __init__(self, hasher, file):
+        self._hasher = hasher
+        self._file = file
+        self.n_bytes = 0
+
+    def write(self, data) -> int:
+        self._hasher.update(data)
+        self._file.write(data)
+        n_bytes = memoryview(data).nbytes
+        self.n_bytes += n_bytes
+        return n_bytes
+
+
+class _NullFile:
+    """A file-like object that discards everything written to it."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, data) -> None:
+        pass
+
+
+def _pickle_and_hash(value: Any, open_file
+        , hash_type_name: str | None = None) -> str:
+    """Pickle a value into a file, return the base32 hash of the pickle.
+
+    The value is pickled by the C pickler. Only if it contains a set,
+    whose elements are not iterated in sorted order, pickling is
+    restarted with _SortingPickler (and the file is overwritten).
+    Either way, equal values produce the same bytes, as long as
+    they have the same structure of shared references
+    (which is preserved by the memo). Keys of dicts are saved
+    in their original order, which is a part of the value.
+    """
+    for pickler_type in (_FastPickler, _SortingPickler):
+        hasher = new_hasher(hash_type_name)
+        try:
+            with open_file() as file:
+                pickler_type(_HashingWriter(hasher, file)).dump(value)
+            break
+        except _UnorderedSetFound:
+            continue
+    return convert_base16_to_base32(hasher.hexdigest())
+
+
+def get_stream_hash_signature(value: Any
+        , hash_type_name: str | None = None) -> str:
+    """Hash a value the same way stream_value_to_file() does,
+    without saving it anywhere."""
+    return _pickle_and_hash(value, _NullFile, hash_type_name)
+
+
+def stream_value_to_file(value: Any, dir_name: str
+        , hash_type_name: str | None = None
+        , compress: bool = True) -> tuple[str, str]:
+    """Pickle, hash and save a value in one pass.
+
+    The value is pickled (deterministically) as a stream; every chunk
+    of the stream is fed to the hasher and written (lz4-compressed,
+    if compress is True) to a new temporary file in dir_name.
+    The value is never pickled into an in-memory buffer,
+    and the stored pickle is the same one that was hashed.
+    The file can be read by joblib.load().
+
+    Returns the name of the temporary file and the base32 hash
+    of the pickled value. The caller is responsible for moving
+    the file to its final location (or deleting it).
+    """
+    fd, tmp_name = tempfile.mkstemp(
+        dir=dir_name, prefix=".tmp_", suffix=".tmp")
+    os.close(fd)
+    open_file = lambda: (_compression.open(tmp_name, mode="wb")
+        if compress else open(tmp_name, mode="wb"))
+    try:
+        hash_signature = _pickle_and_hash(value, open_file, hash_type_name)
+    except:
+        os.remove(tmp_name)
+        raise
+    return tmp_name, hash_signature
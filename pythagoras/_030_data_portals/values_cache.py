@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Hashable
+
+from pythagoras._030_data_portals.identity_cache import is_known_immutable
+from pythagoras._830_memory_caches.size_bounded_lru import SizeBoundedLRU
+
+
+VALUES_CACHE_MAX_ITEMS = 100_000
+VALUES_CACHE_MAX_BYTES = 2**30 # 1 GB
+
+values_cache = SizeBoundedLRU(
+    max_items=VALUES_CACHE_MAX_ITEMS, max_bytes=VALUES_CACHE_MAX_BYTES)
+"""A process-wide cache of values, loaded from portals.
+
+Values in portals are immutable and their addresses are derived from
+their content, so a value, once loaded, can be shared by all address
+objects in the process that point to it, regardless of the portal.
+Keys are built by values_cache_key(). Callers receive the cached
+objects themselves, so only values that can't be modified
+are cached, see is_safe_to_share().
+"""
+
+_IMMUTABLE_TYPES = {type(None), bool, int, float, complex, str, bytes, range}
+
+_MISSING = object()
+
+
+def values_cache_key(addr: Any) -> Hashable:
+    """Build a key for an address: its type name and its strings."""
+    return (type(addr).__name__, *addr.str_chain)
+
+
+def get_cached_value(addr: Any) -> tuple[bool, Any]:
+    """Return (True, value) if the value is cached, (False, None) otherwise."""
+    value = values_cache.get(values_cache_key(addr), _MISSING)
+    if value is _MISSING:
+        return False, None
+    return True, value
+
+
+def is_safe_to_share(value: Any) -> bool:
+    """Check if a value can be handed out to many callers.
+
+    These are values of immutable built-in types (and tuples
+    and frozensets of them), read-only Numpy arrays, and objects,
+    explicitly opted in via treat_as_immutable().
+    """
+    if type(value) in _IMMUTABLE_TYPES:
+        return True
+    if type(value) in (tuple, frozenset):
+        return all(is_safe_to_share(v) for v in value)
+    if "numpy" in sys.modules:
+        np = sys.modules["numpy"]
+        if (isinstance(value, np.ndarray) and not value.flags.writeable
+                and not value.dtype.hasobject):
+            return True
+    return is_known_immutable(value)
+
+
+def cache_value(addr: Any, value: Any) -> None:
+    """Cache a value, unless it's mutable (see is_safe_to_share())."""
+    if is_safe_to_share(value):
+        values_cache.put(values_cache_key(addr), value)
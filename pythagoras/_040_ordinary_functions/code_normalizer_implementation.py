@@ -11,22 +11,64 @@ can not be passed as an argument to get_normalized_function_source.
 
 External libraries `ast`, and `autopep8` are used for
 parsing and formatting. Internal utilities from `pythagoras` are also utilized.
+
+Normalization is slow (autopep8 alone takes tens of milliseconds
+per function), so its results are cached in memory, keyed by the raw
+source code. Optionally, they can also be cached in a persistent
+dictionary (e.g. a portal's normalized_sources), so that new processes
+do not need to normalize the same functions again.
 """
 from __future__ import annotations
 import ast
 import inspect
+import sys
 from typing import Callable
 import autopep8
+from persidict import PersiDict
 
 from pythagoras._040_ordinary_functions.function_name import get_function_name_from_source
 from pythagoras._040_ordinary_functions.long_infoname import get_long_infoname
 from pythagoras._040_ordinary_functions.assert_ordinarity import assert_ordinarity
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_hash_signature)
+from pythagoras._830_memory_caches.size_bounded_lru import SizeBoundedLRU
 import pythagoras as pth
 
 
+_normalized_sources_cache = SizeBoundedLRU(max_items=10_000, max_bytes=2**26)
+
+
+def _persistent_cache_key(code:str, drop_pth_decorators:bool) -> tuple:
+    """Build a key for a persistent cache of normalized sources.
+
+    Normalized sources depend on Python (ast.unparse) and autopep8
+    versions, so both versions are included in the key.
+    """
+    python_version = f"py_{sys.version_info.major}_{sys.version_info.minor}"
+    autopep8_version = "autopep8_" + autopep8.__version__.replace(".", "_")
+    decorators = "no_pth_decorators" if drop_pth_decorators else "as_is"
+    return (python_version, autopep8_version, decorators
+        , get_hash_signature(code))
+
+
+def _cache_in_memory(cache_key:tuple, normalized_source:str) -> None:
+    """Put a normalized source into the in-memory cache.
+
+    Normalization is idempotent, so the normalized source is also
+    cached as the result of normalizing itself: callers often
+    re-normalize (or analyze) already normalized sources.
+    """
+    _, drop_pth_decorators = cache_key
+    _normalized_sources_cache.put(cache_key, normalized_source)
+    for drop in {False, drop_pth_decorators}:
+        _normalized_sources_cache.put((normalized_source, drop)
+            , normalized_source)
+
+
 def __get_normalized_function_source__(
         a_func:Callable|str
         , drop_pth_decorators:bool = False
+        , persistent_cache:PersiDict|None = None
         ) -> str:
     """Return function's source code in a 'canonical' form.
 
@@ -35,6 +77,9 @@ def __get_normalized_function_source__(
     If drop_pth_decorators == True, remove Pythagoras decorators.
 
     Only regular functions are supported; methods and lambdas are not supported.
+
+    Results are cached in memory; if persistent_cache is provided,
+    they are also looked up in / saved to it.
     """
 
     a_func_name, code = None, ""
@@ -48,6 +93,40 @@ def __get_normalized_function_source__(
     else:
         assert callable(a_func) or isinstance(a_func, str)
 
+    cache_key = (code, drop_pth_decorators)
+    result = _normalized_sources_cache.get(cache_key)
+    if result is not None:
+        return result
+
+    persistent_key = None
+    if persistent_cache is not None:
+        persistent_key = _persistent_cache_key(code, drop_pth_decorators)
+        try:
+            result = persistent_cache[persistent_key]
+        except:
+            result = None
+        if isinstance(result, str):
+            _cache_in_memory(cache_key, result)
+            return result
+
+    result = _normalize_source_code(code, a_func_name, drop_pth_decorators)
+
+    _cache_in_memory(cache_key, result)
+    if persistent_cache is not None:
+        try:
+            persistent_cache[persistent_key] = result
+        except:
+            pass # some other process has just saved the same result
+    return result
+
+
+def _normalize_source_code(
+        code:str
+        , a_func_name:str|None
+        , drop_pth_decorators:bool
+        ) -> str:
+    """Do the actual normalization work for __get_normalized_function_source__."""
+
     code_lines = code.splitlines()
 
     code_no_empty_lines = []
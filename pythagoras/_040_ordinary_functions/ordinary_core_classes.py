@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import dis
+import marshal
 import sys
+import types
 from typing import Callable, Any
 
 from persidict import FileDirDict, PersiDict
@@ -16,13 +19,52 @@ from pythagoras._040_ordinary_functions.code_normalizer_implementation import (
 import pythagoras as pth
 
 
+def _writes_global_names(code: types.CodeType) -> bool:
+    """Check if compiled code (or code nested in it) assigns global names."""
+    for instruction in dis.get_instructions(code):
+        if instruction.opname in ("STORE_GLOBAL", "DELETE_GLOBAL"):
+            return True
+    return any(_writes_global_names(const) for const in code.co_consts
+        if isinstance(const, types.CodeType))
+
+
 class OrdinaryCodePortal(DataPortal):
+
+    normalized_sources: PersiDict | None
+
     def __init__(self
             , root_dict: PersiDict | str | None = None
             , p_consistency_checks: float | None = None
+            , value_hashing: str | None = None
+            , parallel_hashing_threshold: int | None = None
+            , hash_type: str | None = None
+            , storage_format: str | None = None
+            , compression_threshold: int | None = None
+            , chunking_threshold: int | None = None
+            , fanout_depth: int | None = None
             ):
         super().__init__(root_dict = root_dict
-            , p_consistency_checks=p_consistency_checks)
+            , p_consistency_checks=p_consistency_checks
+            , value_hashing=value_hashing
+            , parallel_hashing_threshold=parallel_hashing_threshold
+            , hash_type=hash_type
+            , storage_format=storage_format
+            , compression_threshold=compression_threshold
+            , chunking_threshold=chunking_threshold
+            , fanout_depth=fanout_depth)
+
+        sources_dict_prototype = self.root_dict.get_subdict(
+            "normalized_sources")
+        sources_dict_params = sources_dict_prototype.get_params()
+        sources_dict_params.update(immutable_items=True
+            , file_type="txt", base_class_for_values=str)
+        normalized_sources = type(self.root_dict)(**sources_dict_params)
+        self.normalized_sources = normalized_sources
+
+    def _clear(self) -> None:
+        """Clear the portal's state"""
+        self.normalized_sources = None
+        super()._clear()
 
     @classmethod
     def get_best_portal_to_use(cls, suggested_portal: OrdinaryCodePortal | None = None
@@ -65,9 +107,10 @@ class OrdinaryFn(PortalAwareClass):
     _fn_bytecode:Any
     _fn_hash_id:str
     _fn_file_name:str
-    _kwargs_var_name:str
-    _result_var_name:str
     _tmp_fn_name:str
+    _compiled_fn:Callable|None = None
+    _compiled_fn_names:dict|None = None
+    _compiled_fn_writes_globals:bool = False
 
     def __init__(self
             , a_func: Callable | str | OrdinaryFn
@@ -80,7 +123,9 @@ class OrdinaryFn(PortalAwareClass):
         else:
             assert callable(a_func) or isinstance(a_func, str)
             self.fn_source_code = __get_normalized_function_source__(
-                a_func, drop_pth_decorators=True)
+                a_func, drop_pth_decorators=True
+                , persistent_cache=getattr(
+                    self.portal, "normalized_sources", None))
             self.fn_name = get_function_name_from_source(self.fn_source_code)
 
     @property
@@ -94,8 +139,6 @@ class OrdinaryFn(PortalAwareClass):
             self._fn_bytecode = other._fn_bytecode
             self._fn_hash_id = other._fn_hash_id
             self._fn_file_name = other._fn_file_name
-            self._kwargs_var_name = other._kwargs_var_name
-            self._result_var_name = other._result_var_name
             self._tmp_fn_name = other._tmp_fn_name
             self._fn_fully_registered = True
 
@@ -113,18 +156,73 @@ class OrdinaryFn(PortalAwareClass):
         self._fn_hash_id = fn_hash_id
         fn_file_name = self.fn_name+ "_"+fn_hash_id+".py"
         self._fn_file_name = fn_file_name
-        self._kwargs_var_name = "kwargs_"+self.fn_name+fn_hash_id
-        self._result_var_name = "result"+self.fn_name+fn_hash_id
         self._tmp_fn_name = "tmp_func_"+self.fn_name+fn_hash_id
         source_to_exec = source_to_exec.replace(
             " " + self.fn_name + "(", " " + self._tmp_fn_name + "(", 1)
-        source_to_exec += f"\n\n{self._result_var_name} = "
-        source_to_exec += f"{self._tmp_fn_name}(**{self._kwargs_var_name})"
         self._fn_bytecode = self._compile(
             source_to_exec, fn_file_name, "exec")
         if type(self) == OrdinaryFn:
             self._fn_fully_registered = True
 
+    def _get_bundle_state(self) -> dict:
+        """Get the state of a fully registered function for an island bundle.
+
+        Unlike __getstate__(), the bundle state includes the results
+        of the registration process (e.g. compiled code), so that
+        the function can be brought back to life without repeating it.
+        """
+        self._complete_fn_registration()
+        return dict(class_name = self.__class__.__name__
+            , fn_name = self.fn_name
+            , fn_source_code = self.fn_source_code
+            , fn_bytecode = marshal.dumps(self._fn_bytecode)
+            , fn_hash_id = self._fn_hash_id
+            , fn_file_name = self._fn_file_name
+            , tmp_fn_name = self._tmp_fn_name)
+
+    def _set_bundle_state(self, state: dict) -> None:
+        """Restore a fully registered function from its bundle state."""
+        assert state["class_name"] == self.__class__.__name__
+        self.fn_name = state["fn_name"]
+        self.fn_source_code = state["fn_source_code"]
+        self._fn_bytecode = marshal.loads(state["fn_bytecode"])
+        self._fn_hash_id = state["fn_hash_id"]
+        self._fn_file_name = state["fn_file_name"]
+        self._tmp_fn_name = state["tmp_fn_name"]
+        self._compiled_fn = None
+        self._compiled_fn_names = None
+        self._fn_fully_registered = True
+
+    def _get_compiled_fn(self) -> Callable:
+        """Get a regular Python function object, built from the source code.
+
+        The compiled definition is executed only once per OrdinaryFn object,
+        in a namespace with all the names available inside the function;
+        the resulting function object is cached and returned as is.
+        Only if the code assigns global names (which is detected
+        once, when the function is compiled), every call gets a copy
+        of the cached function with its own fresh copy of the namespace,
+        so that such assignments can't leak between calls.
+        """
+        if self._compiled_fn is None:
+            self._complete_fn_registration()
+            names_dict = self._available_names()
+            exec(self._fn_bytecode, names_dict, names_dict)
+            self._compiled_fn = names_dict[self._tmp_fn_name]
+            self._compiled_fn_names = names_dict
+            self._compiled_fn_writes_globals = _writes_global_names(
+                self._fn_bytecode)
+        compiled_fn = self._compiled_fn
+        if not self._compiled_fn_writes_globals:
+            return compiled_fn
+        fresh_fn = types.FunctionType(compiled_fn.__code__
+            , dict(self._compiled_fn_names)
+            , compiled_fn.__name__
+            , compiled_fn.__defaults__
+            , compiled_fn.__closure__)
+        fresh_fn.__kwdefaults__ = compiled_fn.__kwdefaults__
+        return fresh_fn
+
     def __call__(self,* args, **kwargs) -> Any:
         assert len(args) == 0, (f"Function {self.fn_name} can't"
             + " be called with positional arguments,"
@@ -175,11 +273,7 @@ class OrdinaryFn(PortalAwareClass):
     def execute(self,**kwargs):
         try:
             self._complete_fn_registration()
-            names_dict = self._available_names()
-            names_dict[self._kwargs_var_name] = kwargs
-            exec(self._fn_bytecode, names_dict, names_dict)
-            result = names_dict[self._result_var_name]
-            return result
+            return self._get_compiled_fn()(**kwargs)
         except:
             exc_type, exc_value, trace_back = sys.exc_info()
             exception_id = self._exception_id(exc_value)
@@ -13,9 +13,23 @@ class SafeCodePortal(OrdinaryCodePortal):
     def __init__(self
                  , root_dict: PersiDict | str | None = None
                  , p_consistency_checks: float | None = None
+                 , value_hashing: str | None = None
+                 , parallel_hashing_threshold: int | None = None
+                 , hash_type: str | None = None
+                 , storage_format: str | None = None
+                 , compression_threshold: int | None = None
+                 , chunking_threshold: int | None = None
+                 , fanout_depth: int | None = None
                  ):
         super().__init__(root_dict=root_dict
-            , p_consistency_checks=p_consistency_checks)
+            , p_consistency_checks=p_consistency_checks
+            , value_hashing=value_hashing
+            , parallel_hashing_threshold=parallel_hashing_threshold
+            , hash_type=hash_type
+            , storage_format=storage_format
+            , compression_threshold=compression_threshold
+            , chunking_threshold=chunking_threshold
+            , fanout_depth=fanout_depth)
 
 
     @classmethod
@@ -17,8 +17,8 @@ from pythagoras._030_data_portals.data_portals import DataPortal
 from pythagoras._040_ordinary_functions.ordinary_core_classes import (
     OrdinaryFn)
 
-from pythagoras._060_autonomous_functions.call_graph_explorer import (
-    explore_call_graph_deep)
+from pythagoras._060_autonomous_functions.incremental_call_graph import (
+    IncrementalCallGraph)
 
 from pythagoras._060_autonomous_functions.names_usage_analyzer import (
     analyze_names_in_function)
@@ -36,19 +36,37 @@ class AutonomousCodePortal(SafeCodePortal):
     
     default_island_name: str | None
     known_functions: dict[str, dict[str, AutonomousFn]] | None
-    
+    call_graphs: dict[str, IncrementalCallGraph] | None
+    _call_graph_analysis_cache: dict | None
+
     def __init__(self
             , root_dict: PersiDict | str | None = None
             , p_consistency_checks: float | None = None
             , default_island_name: str = "Samos"
+            , value_hashing: str | None = None
+            , parallel_hashing_threshold: int | None = None
+            , hash_type: str | None = None
+            , storage_format: str | None = None
+            , compression_threshold: int | None = None
+            , chunking_threshold: int | None = None
+            , fanout_depth: int | None = None
             ):
         super().__init__(root_dict=root_dict
-            , p_consistency_checks=p_consistency_checks)
+            , p_consistency_checks=p_consistency_checks
+            , value_hashing=value_hashing
+            , parallel_hashing_threshold=parallel_hashing_threshold
+            , hash_type=hash_type
+            , storage_format=storage_format
+            , compression_threshold=compression_threshold
+            , chunking_threshold=chunking_threshold
+            , fanout_depth=fanout_depth)
         assert isinstance(default_island_name, str)
         assert len(default_island_name) >= 1
         self.default_island_name = default_island_name
         self.known_functions = dict()
         self.known_functions[default_island_name] = dict()
+        self.call_graphs = dict()
+        self._call_graph_analysis_cache = dict()
 
     def get_params(self) -> dict:
         """Get the portal's configuration parameters"""
@@ -83,10 +101,35 @@ class AutonomousCodePortal(SafeCodePortal):
         return result
 
 
+    def _forget_known_functions(self) -> None:
+        """Forget all functions registered in the portal's islands.
+
+        Long-lived worker processes call this method between
+        execution requests, so that functions from one request can not
+        clash with (possibly different) versions of same-named functions
+        from other requests.
+        """
+        self.known_functions = dict()
+        self.known_functions[self.default_island_name] = dict()
+        self.call_graphs = dict()
+
+    def _get_call_graph(self, island_name: str) -> IncrementalCallGraph:
+        """Get the call graph of an island, create it if needed.
+
+        Call graphs of all islands share the same cache of
+        source code analysis results.
+        """
+        if island_name not in self.call_graphs:
+            self.call_graphs[island_name] = IncrementalCallGraph(
+                self._call_graph_analysis_cache)
+        return self.call_graphs[island_name]
+
     def _clear(self) -> None:
         """Clear the portal's state"""
         self.default_island_name = None
         self.known_functions = dict()
+        self.call_graphs = None
+        self._call_graph_analysis_cache = None
         super()._clear()
 
     @classmethod
@@ -109,6 +152,33 @@ class AutonomousCodePortal(SafeCodePortal):
         return BasicPortal._entered_portals(expected_class=cls)
 
 
+class _DirectIslandCall:
+    """A lightweight callable, bound to a function from the same island.
+
+    Autonomous functions see functions of their island through these
+    wrappers. Every call goes straight to the target, returned by
+    AutonomousFn._direct_call_target, without re-entering the portal
+    and re-checking the function's registration. The target is resolved
+    on each call, so a function that assigns global names gets
+    a fresh namespace every time, just like when it's called directly
+    (see OrdinaryFn._get_compiled_fn). Attribute access is forwarded
+    to the wrapped function object.
+    """
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn: AutonomousFn):
+        self._fn = fn
+
+    def __call__(self, *args, **kwargs) -> Any:
+        assert len(args) == 0, (f"Function {self._fn.fn_name} can't"
+            + " be called with positional arguments,"
+            + " only keyword arguments are allowed.")
+        return self._fn._direct_call_target()(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._fn, name)
+
+
 class AutonomousFn(SafeFn, PortalAwareClass):
     island_name:str
     strictly_autonomous:bool
@@ -271,9 +341,10 @@ class AutonomousFn(SafeFn, PortalAwareClass):
             + f" objects {import_required}"
             + f" without importing them inside the function body")
 
-        all_functions_in_island = [f.fn_source_code for f in island.values()]
-        deep_dependencies = explore_call_graph_deep(all_functions_in_island)
-        dependencies = deep_dependencies[fn_name]
+        call_graph = portal._get_call_graph(self.island_name)
+        for f in island.values():
+            call_graph.add_function(f.fn_source_code)
+        dependencies = call_graph.dependencies(fn_name)
         assert isinstance(dependencies, set)
         assert len(dependencies) >= 1
         dependencies = sorted(dependencies)
@@ -285,13 +356,36 @@ class AutonomousFn(SafeFn, PortalAwareClass):
             island[fn_name]._fn_fully_registered = True
 
 
+    def _get_bundle_state(self) -> dict:
+        state = super()._get_bundle_state()
+        state.update(island_name = self.island_name
+            , strictly_autonomous = self.strictly_autonomous
+            , autonomous_fn_dependencies = self.dependencies)
+        return state
+
+    def _set_bundle_state(self, state: dict) -> None:
+        super()._set_bundle_state(state)
+        self.island_name = state["island_name"]
+        self.strictly_autonomous = state["strictly_autonomous"]
+        self._autonomous_fn_dependencies = list(
+            state["autonomous_fn_dependencies"])
+
     def _available_names(self):
         all_names = super()._available_names()
         island = self.portal.known_functions[self.island_name]
         for name in self.dependencies:
-            all_names[name] = island[name]
+            all_names[name] = _DirectIslandCall(island[name])
         return all_names
 
+    def _direct_call_target(self) -> Callable:
+        """Get a callable to use for calls from other functions of the island.
+
+        Such calls are made while the caller is already executing inside
+        the portal, with its registration completed, so for a plain
+        autonomous function the compiled function object is called directly.
+        """
+        return self._get_compiled_fn()
+
     def _exception_prefixes(self) -> list[list[str]]:
         return [[f"{self.fn_name}_{self.island_name}_AUTON"]
             ] + LoggingPortal._exception_prefixes()
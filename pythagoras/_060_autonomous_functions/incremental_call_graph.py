@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import Dict, Set, FrozenSet
+
+from pythagoras._060_autonomous_functions.call_graph_explorer import (
+    get_referenced_names)
+
+
+class IncrementalCallGraph:
+    """Dependencies between functions of one island, maintained incrementally.
+
+    explore_call_graph_deep() re-analyzes the source code of every
+    function each time it's called. IncrementalCallGraph analyzes each
+    function only once, when it's added to the graph; the analysis results
+    (names referenced from within the function) are cached by source code,
+    the cache can be shared between several graphs.
+
+    Deep dependencies (transitive closures) are computed lazily,
+    using Tarjan's algorithm for strongly connected components:
+    all functions in a cycle share the same closure. Closures are cached;
+    adding a function only invalidates closures of the functions
+    that can reach it.
+    """
+
+    _analysis_cache: Dict[str, tuple[str, FrozenSet[str]]]
+    _sources: Dict[str, str]
+    _direct: Dict[str, Set[str]]
+    _referenced_by: Dict[str, Set[str]]
+    _closures: Dict[str, FrozenSet[str]]
+
+    def __init__(self
+            , analysis_cache: Dict[str, tuple[str, FrozenSet[str]]]
+                | None = None):
+        if analysis_cache is None:
+            analysis_cache = dict()
+        self._analysis_cache = analysis_cache
+        self._sources = dict()
+        self._direct = dict()
+        self._referenced_by = dict()
+        self._closures = dict()
+
+    def __contains__(self, fn_name: str) -> bool:
+        return fn_name in self._direct
+
+    def __len__(self) -> int:
+        return len(self._direct)
+
+    def _analyze(self, source: str) -> tuple[str, FrozenSet[str]]:
+        if source not in self._analysis_cache:
+            (fn_name, names), = get_referenced_names(source).items()
+            self._analysis_cache[source] = (fn_name, frozenset(names))
+        return self._analysis_cache[source]
+
+    def add_function(self, source: str) -> str:
+        """Add a function to the graph, return the function's name."""
+        fn_name, referenced_names = self._analyze(source)
+        if fn_name in self._sources:
+            assert self._sources[fn_name] == source, (
+                f"Function {fn_name} is already in the call graph"
+                + " with different source code.")
+            return fn_name
+
+        self._sources[fn_name] = source
+        self._direct[fn_name] = {n for n in referenced_names
+            if n in self._direct} | {fn_name}
+        for name in referenced_names:
+            self._referenced_by.setdefault(name, set()).add(fn_name)
+        for caller in self._referenced_by.get(fn_name, set()):
+            self._direct[caller].add(fn_name)
+
+        # Only functions that can reach the new one get new closures
+        to_invalidate = [fn_name]
+        invalidated = set()
+        while to_invalidate:
+            name = to_invalidate.pop()
+            if name in invalidated:
+                continue
+            invalidated.add(name)
+            self._closures.pop(name, None)
+            for caller in self._referenced_by.get(name, set()):
+                if caller in self._direct and caller not in invalidated:
+                    to_invalidate.append(caller)
+
+        return fn_name
+
+    def direct_dependencies(self, fn_name: str) -> Set[str]:
+        """Names of functions directly referenced by fn_name (incl. itself)."""
+        return set(self._direct[fn_name])
+
+    def dependencies(self, fn_name: str) -> Set[str]:
+        """Names of all functions, directly or indirectly referenced
+        by fn_name (including fn_name itself)."""
+        assert fn_name in self._direct
+        if fn_name not in self._closures:
+            self._compute_closures(fn_name)
+        return set(self._closures[fn_name])
+
+    def _compute_closures(self, start: str) -> None:
+        """Compute missing closures for all functions reachable from start.
+
+        An iterative version of Tarjan's algorithm. Components are
+        completed in reverse topological order, so when a component is
+        completed, closures of all components it refers to are known.
+        Functions with already known closures are not traversed.
+        """
+        index: Dict[str, int] = {start: 0}
+        lowlink: Dict[str, int] = {start: 0}
+        stack = [start]
+        on_stack = {start}
+        work = [(start, iter(sorted(self._direct[start])))]
+        counter = 1
+
+        while work:
+            node, children = work[-1]
+            descended = False
+            for child in children:
+                if child in self._closures:
+                    continue
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(self._direct[child]))))
+                    descended = True
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+            if lowlink[node] == index[node]:
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == node:
+                        break
+                closure = set(component)
+                for member in component:
+                    for child in self._direct[member]:
+                        if child not in component:
+                            closure |= self._closures[child]
+                closure = frozenset(closure)
+                for member in component:
+                    self._closures[member] = closure
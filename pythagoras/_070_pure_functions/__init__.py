@@ -42,4 +42,6 @@ from .pure_core_classes import (
     , PureFnExecutionResultAddr
     , PureFnExecutionFrame)
 
-from .pure_decorator import pure
\ No newline at end of file
+from .pure_decorator import pure
+
+from .integrity_scrubber import IntegrityScrubber
\ No newline at end of file
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable
+
+from persidict import PersiDict, SafeStrTuple
+
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent)
+from pythagoras._820_strings_signatures_converters.random_signatures import (
+    get_random_signature)
+
+
+LEASE_DURATION = 60 # seconds
+HEARTBEAT_PERIOD = LEASE_DURATION / 4
+LOCK_TIMEOUT = 10 # seconds
+
+
+_owner_id: str | None = None
+_owner_pid: int | None = None
+
+def get_lease_owner_id() -> str:
+    """Get an identifier of the current process, used to mark its leases.
+
+    The identifier is regenerated in forked child processes,
+    so a child never mistakes its parent's leases for its own.
+    """
+    global _owner_id, _owner_pid
+    if _owner_pid != os.getpid():
+        _owner_id = "pid" + str(os.getpid()) + "_" + get_random_signature()
+        _owner_pid = os.getpid()
+    return _owner_id
+
+
+class ExecutionLease:
+    """An exclusive, expiring right to execute a function call.
+
+    Before executing a pure function, a worker takes a lease on the
+    address of the execution result. The lease is a small record
+    in a persistent dictionary; it is created atomically, so only one
+    worker can hold a lease on a given address at any moment.
+
+    While the function is running, a background heartbeat thread
+    renews the lease every HEARTBEAT_PERIOD seconds. Other workers skip
+    leased addresses. If the worker holding a lease dies,
+    the heartbeats stop, and after LEASE_DURATION seconds the lease
+    expires and can be taken over by another worker.
+
+    Leases are re-entrant: a process can acquire the same lease
+    several times, it's released after the matching number of releases.
+
+    Replacing an existing lease record (taking over an expired lease,
+    renewing or releasing a lease) is done while holding a short-lived
+    lock, which is also created atomically. Hence, a worker that takes
+    over an expired lease can not delete a lease that another worker
+    has just taken over, and a late heartbeat can not overwrite a lease
+    of the new owner. A lock, left behind by a crashed process,
+    is removed after LOCK_TIMEOUT seconds.
+    """
+
+    _leases_dict: PersiDict
+    _key: SafeStrTuple
+    _lock_key: SafeStrTuple
+
+    def __init__(self
+            , leases_dict: PersiDict
+            , addr: SafeStrTuple
+            , duration: float = LEASE_DURATION):
+        assert isinstance(leases_dict, PersiDict)
+        assert duration > 0
+        self._leases_dict = leases_dict
+        self._key = SafeStrTuple(addr)
+        self._lock_key = SafeStrTuple(*self._key.str_chain, "lock")
+        self.duration = duration
+
+    def _new_record(self) -> dict:
+        return dict(owner=get_lease_owner_id()
+            , duration=self.duration
+            , acquired_at=time.time())
+
+    def _read_record(self) -> dict | None:
+        try:
+            return self._leases_dict[self._key]
+        except:
+            return None
+
+    def _lock(self) -> bool:
+        """Try to get exclusive right to modify the lease record."""
+        lock_key = self._lock_key
+        lock_record = dict(owner=get_lease_owner_id(), locked_at=time.time())
+        if create_if_absent(self._leases_dict, lock_key, lock_record):
+            return True
+        try:
+            lock_age = time.time() - self._leases_dict.timestamp(lock_key)
+        except:
+            return False
+        if lock_age > LOCK_TIMEOUT:
+            # The process that held the lock has died
+            self._leases_dict.delete_if_exists(lock_key)
+        return False
+
+    def _unlock(self) -> None:
+        self._leases_dict.delete_if_exists(self._lock_key)
+
+    def _is_mine(self, record: dict | None) -> bool:
+        return record is not None and record["owner"] == get_lease_owner_id()
+
+    def _is_expired(self, record: dict) -> bool:
+        try:
+            last_renewal = self._leases_dict.timestamp(self._key)
+        except:
+            return True
+        return time.time() - last_renewal > record["duration"]
+
+    @property
+    def owner(self) -> str | None:
+        """Identifier of the process that holds the lease, if any."""
+        record = self._read_record()
+        if record is None or self._is_expired(record):
+            return None
+        return record["owner"]
+
+    @property
+    def held_by_me(self) -> bool:
+        return self.owner == get_lease_owner_id()
+
+    @property
+    def held_by_others(self) -> bool:
+        owner = self.owner
+        return owner is not None and owner != get_lease_owner_id()
+
+    def acquire(self) -> bool:
+        """Try to take the lease. Returns True on success."""
+        if _heartbeat.add_reference(self):
+            return True
+        record = self._read_record()
+        if record is None:
+            is_created = create_if_absent(
+                self._leases_dict, self._key, self._new_record())
+        elif self._is_expired(record) and self._lock():
+            # The previous holder stopped sending heartbeats
+            try:
+                record = self._read_record()
+                is_created = record is None or self._is_expired(record)
+                if is_created:
+                    self._leases_dict[self._key] = self._new_record()
+            finally:
+                self._unlock()
+        else:
+            is_created = False
+        if not is_created:
+            return False
+        _heartbeat.register(self)
+        return True
+
+    def acquire_or_wait(self, is_done: Callable[[], bool]) -> bool:
+        """Take the lease, waiting while it's held by others.
+
+        Returns True once the lease is acquired, or False as soon as
+        is_done() returns True (e.g. the holder has stored the result).
+        """
+        backoff_period = 1.0
+        while True:
+            if self.acquire():
+                return True
+            if is_done():
+                return False
+            time.sleep(backoff_period)
+            backoff_period = min(2 * backoff_period, HEARTBEAT_PERIOD)
+
+    def renew(self) -> bool:
+        """Extend the lease.
+
+        Returns False if the lease was lost, or if it can't be renewed
+        right now (the next heartbeat will try again).
+        """
+        if not self._is_mine(self._read_record()) or not self._lock():
+            return False
+        try:
+            record = self._read_record()
+            if not self._is_mine(record):
+                return False
+            self._leases_dict[self._key] = record
+            return True
+        finally:
+            self._unlock()
+
+    def release(self) -> None:
+        """Give the lease back, so others can take it immediately."""
+        if not _heartbeat.unregister(self):
+            return
+        if not self._is_mine(self._read_record()):
+            return
+        for _ in range(int(LOCK_TIMEOUT / 0.1)):
+            if self._lock():
+                break
+            time.sleep(0.1)
+        else:
+            return # the lease will expire on its own
+        try:
+            if self._is_mine(self._read_record()):
+                self._leases_dict.delete_if_exists(self._key)
+        finally:
+            self._unlock()
+
+    def __enter__(self):
+        self.acquired = self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, trace_back):
+        if self.acquired:
+            self.release()
+
+
+class _LeaseHeartbeat:
+    """Keeps all leases held by the current process alive.
+
+    A single daemon thread per process periodically renews every lease
+    the process holds. The thread is started when the first lease
+    is acquired, and it exits when no leases are left.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases: dict[tuple, list] = dict()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    @staticmethod
+    def _lease_id(lease: ExecutionLease) -> tuple:
+        return (id(lease._leases_dict), lease._key.str_chain)
+
+    def _reset_after_fork(self) -> None:
+        if self._pid != os.getpid():
+            self._leases = dict()
+            self._thread = None
+            self._pid = os.getpid()
+
+    def add_reference(self, lease: ExecutionLease) -> bool:
+        """Re-acquire a lease that is already held by this process."""
+        with self._lock:
+            self._reset_after_fork()
+            entry = self._leases.get(self._lease_id(lease))
+            if entry is None:
+                return False
+            entry[1] += 1
+            return True
+
+    def register(self, lease: ExecutionLease) -> None:
+        with self._lock:
+            self._reset_after_fork()
+            self._leases[self._lease_id(lease)] = [lease, 1]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="pth_lease_heartbeat", daemon=True)
+                self._thread.start()
+
+    def unregister(self, lease: ExecutionLease) -> bool:
+        """Drop one reference to a lease.
+
+        Returns True if it was the last reference,
+        and the lease should be deleted from the persistent storage.
+        """
+        with self._lock:
+            self._reset_after_fork()
+            lease_id = self._lease_id(lease)
+            entry = self._leases.get(lease_id)
+            if entry is None:
+                return False
+            entry[1] -= 1
+            if entry[1] > 0:
+                return False
+            del self._leases[lease_id]
+            return True
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(HEARTBEAT_PERIOD)
+            with self._lock:
+                if self._pid != os.getpid() or not self._leases:
+                    self._thread = None
+                    return
+                leases = [entry[0] for entry in self._leases.values()]
+            for lease in leases:
+                try:
+                    lease.renew()
+                except:
+                    pass # the next heartbeat will try again
+
+
+_heartbeat = _LeaseHeartbeat()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import random
+import time
+from typing import Iterable
+
+from persidict import PersiDict, SafeStrTuple
+
+from pythagoras._070_pure_functions.execution_leases import (
+    ExecutionLease, LEASE_DURATION)
+from pythagoras._820_strings_signatures_converters.base_16_32_convertors import (
+    base32_alphabet)
+
+
+PENDING = "pending"
+CLAIMED = "claimed"
+FAILED = "failed"
+
+ALL_STATES = (PENDING, CLAIMED, FAILED)
+
+STALE_CLAIM_TIMEOUT = 2*LEASE_DURATION # seconds
+STALE_CLAIMS_SWEEP_INTERVAL = 60 # seconds
+SHARDS_SCAN_INTERVAL = 2 # seconds
+MAX_SHARDS_PER_SCAN = 16
+
+LEGACY_REQUESTS_IMPORTED = "legacy_requests_imported"
+
+N_SHARD_CHARS = 2
+ALL_SHARDS = [a + b for a in base32_alphabet for b in base32_alphabet]
+
+
+class ExecutionQueue:
+    """A persistent queue of execution requests, indexed by request state.
+
+    Every queued request is tracked in one of three states:
+    pending (waiting for a worker), claimed (a worker took it),
+    or failed (gave up on it). Requests, whose results are available,
+    are removed from the queue. Each state is a separate persistent
+    dictionary, so a worker can find a pending request
+    without looking at any other request.
+
+    Within each state, requests are spread across 1024 shards
+    based on the last characters of their hash signatures.
+    A queue object remembers which shards have pending requests:
+    to claim a request, a worker visits these shards in random order
+    and takes the first pending request it finds. Shards are
+    re-discovered at most once every SHARDS_SCAN_INTERVAL seconds,
+    by a scan that starts at a random shard and stops after
+    MAX_SHARDS_PER_SCAN non-empty shards are found: an idle worker
+    doesn't keep listing all the shards, and busy workers
+    don't all compete for the same few shards.
+
+    A request is claimed by deleting it from the pending state.
+    Deletion succeeds for only one of several competing workers,
+    so the same request can not be claimed twice. The claimed entry
+    is written before the pending one is deleted, so a request
+    is always visible in at least one of the two states.
+    """
+
+    _queue_dict: PersiDict
+    _leases_dict: PersiDict | None
+    _states: dict[str, PersiDict]
+    _pending_shards: set[str]
+    _last_shards_scan: float
+    _last_stale_claims_sweep: float
+
+    def __init__(self
+            , queue_dict: PersiDict
+            , leases_dict: PersiDict | None = None):
+        assert isinstance(queue_dict, PersiDict)
+        assert leases_dict is None or isinstance(leases_dict, PersiDict)
+        self._queue_dict = queue_dict
+        self._leases_dict = leases_dict
+        self._states = {state: queue_dict.get_subdict(state)
+            for state in ALL_STATES}
+        self._pending_shards = set()
+        self._last_shards_scan = 0
+        self._last_stale_claims_sweep = 0
+
+    @staticmethod
+    def _shard(addr: SafeStrTuple) -> str:
+        return addr.str_chain[-1][-N_SHARD_CHARS:]
+
+    def _key(self, addr: SafeStrTuple) -> SafeStrTuple:
+        addr = SafeStrTuple(addr)
+        return SafeStrTuple(self._shard(addr), *addr.str_chain)
+
+    def _move(self, addr: SafeStrTuple, new_state:str|None) -> None:
+        """Put a request into a new state (None removes it from the queue).
+
+        The new entry is written before the old ones are deleted.
+        """
+        key = self._key(addr)
+        if new_state is not None:
+            self._states[new_state][key] = time.time()
+        for state in ALL_STATES:
+            if state != new_state:
+                self._states[state].delete_if_exists(key)
+        if new_state == PENDING:
+            self._pending_shards.add(key.str_chain[0])
+
+    def state_of(self, addr: SafeStrTuple) -> str|None:
+        """Return the current state of a request, or None if not queued."""
+        key = self._key(addr)
+        for state in ALL_STATES:
+            if key in self._states[state]:
+                return state
+        return None
+
+    def add(self, addr: SafeStrTuple) -> None:
+        """Put a request into the pending state, unless it's already queued.
+
+        A worker can claim the request between the check and the write,
+        so the state is checked again after the write: if the request
+        has been claimed, the new pending entry is withdrawn.
+        """
+        if self.state_of(addr) is not None:
+            return
+        key = self._key(addr)
+        self._states[PENDING][key] = time.time()
+        if key in self._states[CLAIMED]:
+            self._states[PENDING].delete_if_exists(key)
+            return
+        self._pending_shards.add(key.str_chain[0])
+
+    def release(self, addr: SafeStrTuple) -> None:
+        """Return a claimed request back to the pending state."""
+        self._move(addr, PENDING)
+
+    def mark_done(self, addr: SafeStrTuple) -> None:
+        """Remove a request, whose result is available, from the queue."""
+        self._move(addr, None)
+
+    def mark_failed(self, addr: SafeStrTuple) -> None:
+        """Record that a request should not be executed anymore."""
+        self._move(addr, FAILED)
+
+    def import_legacy_requests(self, execution_requests: PersiDict) -> int:
+        """Enqueue requests, that were made before the queue existed.
+
+        Older versions only kept requests in execution_requests.
+        They are imported once per queue, the import is remembered
+        in the queue's dictionary. It should be done before
+        any workers start claiming requests.
+        Returns the number of requests added.
+        """
+        if LEGACY_REQUESTS_IMPORTED in self._queue_dict:
+            return 0
+        n_added = 0
+        for key in execution_requests.keys():
+            if self.state_of(key) is None:
+                self._move(key, PENDING)
+                n_added += 1
+        self._queue_dict[LEGACY_REQUESTS_IMPORTED] = time.time()
+        return n_added
+
+    def _scan_pending_shards(self) -> None:
+        """Find shards with pending requests, starting at a random shard."""
+        self._last_shards_scan = time.time()
+        pending = self._states[PENDING]
+        start = random.randrange(len(ALL_SHARDS))
+        for shard in ALL_SHARDS[start:] + ALL_SHARDS[:start]:
+            if next(iter(pending.get_subdict([shard]).keys()), None) is None:
+                continue
+            self._pending_shards.add(shard)
+            if len(self._pending_shards) >= MAX_SHARDS_PER_SCAN:
+                break
+
+    def claim(self) -> SafeStrTuple|None:
+        """Claim a random pending request.
+
+        Returns the address (prefix and hash signature) of the claimed
+        request, or None if there are no pending requests.
+        """
+        if (not self._pending_shards and time.time()
+                - self._last_shards_scan > SHARDS_SCAN_INTERVAL):
+            self._scan_pending_shards()
+        pending = self._states[PENDING]
+        shards = list(self._pending_shards)
+        random.shuffle(shards)
+        for shard in shards:
+            for key in pending.get_subdict([shard]):
+                full_key = SafeStrTuple(shard, *SafeStrTuple(key).str_chain)
+                self._states[CLAIMED][full_key] = time.time()
+                try:
+                    del pending[full_key]
+                except:
+                    continue # some other worker claimed it first
+                return SafeStrTuple(*full_key.str_chain[1:])
+            self._pending_shards.discard(shard)
+        return None
+
+    def requeue_stale_claims(self
+            , max_age: float = STALE_CLAIM_TIMEOUT
+            , min_interval: float = 0
+            ) -> int:
+        """Return old claimed requests back to the pending state.
+
+        Claimed requests become stale if the worker that claimed them
+        died without finishing the work. Requests with a live
+        execution lease are still being executed, they are never
+        considered stale. Returns the number
+        of requests that were put back to the pending state.
+        Nothing is done if the previous sweep by this queue object
+        happened less than min_interval seconds ago.
+        """
+        current_time = time.time()
+        if current_time - self._last_stale_claims_sweep < min_interval:
+            return 0
+        self._last_stale_claims_sweep = current_time
+        claimed = self._states[CLAIMED]
+        stale_addrs = [SafeStrTuple(*SafeStrTuple(k).str_chain[1:])
+            for k in claimed if current_time - claimed.timestamp(k) > max_age]
+        if self._leases_dict is not None:
+            stale_addrs = [a for a in stale_addrs
+                if ExecutionLease(self._leases_dict, a).owner is None]
+        for addr in stale_addrs:
+            self.release(addr)
+        return len(stale_addrs)
+
+    def count(self, state: str) -> int:
+        """Return the number of requests in a given state."""
+        assert state in ALL_STATES
+        return len(self._states[state])
+
+    def addresses(self, state: str) -> Iterable[SafeStrTuple]:
+        """Iterate over addresses of all requests in a given state."""
+        assert state in ALL_STATES
+        for key in self._states[state]:
+            yield SafeStrTuple(*SafeStrTuple(key).str_chain[1:])
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import itertools
+import os
+import time
+from typing import Any, Iterator
+
+from persidict import PersiDict
+
+from pythagoras._030_data_portals.value_addresses import ValueAddr
+from pythagoras._070_pure_functions.pure_core_classes import (
+    PureCodePortal, PureFn, PureFnExecutionResultAddr)
+from pythagoras._800_persidict_extensions.first_entry_dict import (
+    get_content_checksum)
+from pythagoras._820_strings_signatures_converters.node_signatures import (
+    get_node_signature)
+
+
+def _list_subdirs(dir_name: str) -> list[str]:
+    """List subdirectories of a directory, skipping hidden ones."""
+    return sorted(name for name in os.listdir(dir_name)
+        if not name.startswith(".")
+        and os.path.isdir(os.path.join(dir_name, name)))
+
+
+def _keys_in_dir(base_dir: str, dir_name: str) -> Iterator[tuple[str, str]]:
+    """List keys of hash-named files under a directory of a file-based store.
+
+    The first component of dir_name is the prefix of the keys,
+    nested subdirectories (shards) are not a part of them.
+    """
+    prefix = dir_name.split(os.sep)[0]
+    for _, _, files in os.walk(os.path.join(base_dir, dir_name)):
+        for file_name in files:
+            if file_name.startswith(".") or file_name.endswith(".reserved"):
+                continue # temporary files and reservations
+            yield (prefix, os.path.splitext(file_name)[0])
+
+
+class IntegrityScrubber:
+    """Verifies values and execution results, stored in a portal.
+
+    The scrubber walks the portal's value_store and execution_results,
+    checking one item per step (the two stores take turns):
+    a stored value is re-hashed and compared with its address;
+    an execution result must point to a stored value, and with
+    probability p_reexecution the function call is executed again
+    (bypassing memoization) to check that it still produces
+    the same result. Discrepancies are recorded in the portal's
+    integrity_discrepancies, keyed by their kind and address.
+    A re-hash mismatch of an array, tensor or DataFrame can be caused
+    by its memory layout (rather than by a damaged file), such values
+    are verified by their checksums in the portal's value_checksums;
+    values stored without checksums (e.g. by older versions)
+    are counted as unverified (see n_values_unverified).
+
+    Each walk over a store starts at a random position, so that
+    short-lived scrubbers (e.g. in recycled worker processes)
+    don't keep checking the same first items.
+    For file-based stores, it's a random subdirectory (a prefix,
+    or a top-level shard of a prefix), so starting a walk
+    doesn't require listing the whole store.
+
+    Unlike inline consistency checks (p_consistency_checks), which slow
+    down function calls, the scrubber is meant to run on idle
+    background workers, see SwarmingPortal.scrubbing_budget.
+    """
+
+    portal: PureCodePortal
+    p_reexecution: float
+    n_values_checked: int
+    n_values_unverified: int
+    n_results_checked: int
+    n_reexecutions: int
+    n_discrepancies: int
+
+    def __init__(self, portal: PureCodePortal, p_reexecution: float = 0.1):
+        assert isinstance(portal, PureCodePortal)
+        assert 0 <= p_reexecution <= 1
+        self.portal = portal
+        self.p_reexecution = p_reexecution
+        self._walkers: dict[str, Iterator | None] = dict()
+        self._n_steps = 0
+        self.n_values_checked = 0
+        self.n_values_unverified = 0
+        self.n_results_checked = 0
+        self.n_reexecutions = 0
+        self.n_discrepancies = 0
+
+    def _start_walk(self, a_dict: PersiDict) -> Iterator:
+        """Iterate over keys of a dictionary, starting at a random position.
+
+        Keys of a file-based store are walked one subdirectory at a time,
+        starting at a random one; subdirectories before the starting one
+        are visited at the end of the walk. Other dictionaries
+        are walked in their own order.
+        """
+        base_dir = getattr(a_dict, "base_dir", None)
+        if base_dir is None or not os.path.isdir(base_dir):
+            return iter(a_dict.keys())
+        dir_names = []
+        for prefix in _list_subdirs(base_dir):
+            if self.portal.fanout_depth:
+                dir_names += [os.path.join(prefix, shard) for shard
+                    in _list_subdirs(os.path.join(base_dir, prefix))]
+            else:
+                dir_names.append(prefix)
+        start = 0
+        if dir_names:
+            start = int(self.portal.entropy_infuser.uniform(
+                0, len(dir_names)))
+        dir_names = dir_names[start:] + dir_names[:start]
+        return itertools.chain.from_iterable(
+            _keys_in_dir(base_dir, d) for d in dir_names)
+
+    def _next_key(self, name: str, a_dict: PersiDict) -> Any:
+        """Get the next key of a dictionary, restarting the walk at the end.
+
+        Returns None if the dictionary is empty.
+        """
+        for _ in range(2):
+            walker = self._walkers.get(name)
+            if walker is None:
+                walker = self._start_walk(a_dict)
+                self._walkers[name] = walker
+            try:
+                return next(walker)
+            except StopIteration:
+                self._walkers[name] = None
+        return None
+
+    def _record_discrepancy(self, kind: str
+            , address: Any, details: str) -> None:
+        self.n_discrepancies += 1
+        record = dict(kind=kind
+            , address=list(address.str_chain)
+            , details=details
+            , timestamp=time.time()
+            , node=get_node_signature())
+        self.portal.integrity_discrepancies[
+            [kind, *address.str_chain]] = record
+
+    def check_value(self, addr: ValueAddr) -> bool:
+        """Re-hash a stored value, return False if it doesn't match its address."""
+        with self.portal as portal:
+            self.n_values_checked += 1
+            try:
+                value = portal.value_store[addr]
+            except Exception as e:
+                self._record_discrepancy("unreadable_value", addr
+                    , f"{type(e).__name__}: {e}")
+                return False
+            if addr._is_address_of(value):
+                return True
+            if portal._value_needs_checksum(value):
+                checksum = portal.value_checksums.get(addr)
+                if checksum is None:
+                    self.n_values_unverified += 1
+                    return True
+                if checksum == get_content_checksum(value):
+                    return True
+            self._record_discrepancy("value_hash_mismatch", addr
+                , "The stored value doesn't match its address")
+            return False
+
+    def check_result(self, address: PureFnExecutionResultAddr
+            , reexecute: bool = False) -> bool:
+        """Check a stored execution result, return False if it's inconsistent.
+
+        If reexecute is True, the function is executed again
+        (without memoization), the address of the new result
+        must be the same as the stored one.
+        """
+        with self.portal as portal:
+            self.n_results_checked += 1
+            result_addr = portal.execution_results[address]
+            if not portal.value_store.is_stored(result_addr):
+                self._record_discrepancy("result_missing", address
+                    , f"The result {result_addr.str_chain} is not stored")
+                return False
+            if not reexecute:
+                return True
+            self.n_reexecutions += 1
+            function = address.function
+            kwargs = address.kwargs
+            try:
+                # The memoizing layer of PureFn.execute() is skipped
+                new_result = super(PureFn, function).execute(**kwargs)
+            except Exception as e:
+                self._record_discrepancy("reexecution_failed", address
+                    , f"{type(e).__name__}: {e}")
+                return False
+            new_result_addr = ValueAddr(new_result)
+            if new_result_addr == result_addr:
+                return True
+            self._record_discrepancy("result_mismatch", address
+                , f"The stored result is {result_addr.str_chain}, "
+                + f"a new execution returned {new_result_addr.str_chain}")
+            return False
+
+    def scrub_step(self) -> bool:
+        """Check the next item; return False if there's nothing to check."""
+        with self.portal as portal:
+            for _ in range(2):
+                self._n_steps += 1
+                if self._n_steps % 2:
+                    key = self._next_key("values", portal.value_store)
+                    if key is not None:
+                        addr = ValueAddr.from_strings(
+                            prefix=key[0], hash_signature=key[1]
+                            , portal=portal, assert_readiness=False)
+                        self.check_value(addr)
+                        return True
+                else:
+                    key = self._next_key(
+                        "results", portal.execution_results)
+                    if key is not None:
+                        address = PureFnExecutionResultAddr.from_strings(
+                            prefix=key[0], hash_signature=key[1]
+                            , portal=portal, assert_readiness=False)
+                        reexecute = (portal.entropy_infuser.random()
+                            < self.p_reexecution)
+                        self.check_result(address, reexecute)
+                        return True
+            return False
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import sys
+
+from pythagoras._010_basic_portals.portal_aware_classes import PortalAwareClass
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_hash_signature)
+
+import pythagoras as pth
+
+
+def island_bundle_key(augmented_src: str) -> tuple[str, str]:
+    """Build a key for an island bundle.
+
+    Bundles contain marshalled code objects, which can only be loaded
+    by the same version of Python, so the version is a part of the key.
+    """
+    python_version = f"py_{sys.version_info.major}_{sys.version_info.minor}"
+    return (python_version, get_hash_signature(augmented_src))
+
+
+def save_island_bundle(a_fn, portal) -> None:
+    """Save a compiled bundle of a pure function and all its dependencies.
+
+    The bundle contains the bundle states (normalized sources,
+    dependency lists, compiled code, etc.) of all functions from the
+    function's augmented source code. It's stored in the portal's
+    island_bundles, keyed by the augmented source code hash.
+    """
+    with portal:
+        island = portal.known_functions[a_fn.island_name]
+        names = set(a_fn.dependencies)
+        if a_fn.guards is not None:
+            names |= set(a_fn.guards)
+        functions = [island[name]._get_bundle_state()
+            for name in sorted(names)]
+        key = island_bundle_key(a_fn.augmented_fn_source_code)
+        if key in portal.island_bundles:
+            return
+        try:
+            portal.island_bundles[key] = dict(functions=functions)
+        except:
+            pass # some other process has just saved the same bundle
+
+
+def restore_island_bundle(augmented_src: str, portal) -> bool:
+    """Bring to life all functions from a saved island bundle.
+
+    This is a fast alternative to process_augmented_func_src():
+    functions are registered in the portal directly from the bundle,
+    without parsing, normalizing, analyzing and compiling their
+    source code. Returns False if there is no bundle for the
+    augmented source code in the portal.
+    """
+    with portal:
+        key = island_bundle_key(augmented_src)
+        try:
+            bundle = portal.island_bundles[key]
+        except:
+            return False
+
+        supported_classes = {c.__name__: c
+            for c in [pth.AutonomousFn, pth.PureFn]}
+        for state in bundle["functions"]:
+            island_name = state["island_name"]
+            fn_name = state["fn_name"]
+            if island_name not in portal.known_functions:
+                portal.known_functions[island_name] = dict()
+            island = portal.known_functions[island_name]
+            if fn_name in island:
+                a_fn = island[fn_name]
+                assert a_fn.fn_source_code == state["fn_source_code"], (
+                    f"Function {fn_name} is already defined in island"
+                    + f" {island_name} with different source code.")
+                if a_fn._fn_fully_registered:
+                    continue
+            else:
+                fn_class = supported_classes[state["class_name"]]
+                a_fn = fn_class.__new__(fn_class)
+                PortalAwareClass.__init__(a_fn, portal=portal)
+                island[fn_name] = a_fn
+            a_fn._set_bundle_state(state)
+        return True
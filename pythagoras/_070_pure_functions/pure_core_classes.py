@@ -13,14 +13,19 @@ from persidict import PersiDict, FileDirDict
 
 from pythagoras import OverlappingMultiDict, LoggingPortal
 from pythagoras import PortalAwareClass, BasicPortal
-from pythagoras._010_basic_portals.foundation import _persistent
+from pythagoras._010_basic_portals.foundation import _persistent, _runtime
 from pythagoras._820_strings_signatures_converters.random_signatures import (
     get_random_signature)
-from pythagoras._800_persidict_extensions.first_entry_dict import FirstEntryDict
+from pythagoras._800_persidict_extensions.first_entry_dict import (
+    FirstEntryDict, compare_addresses)
+from pythagoras._800_persidict_extensions.compressing_dict import (
+    CompressingDict)
 from pythagoras._020_logging_portals.logging_portals import NeedsRandomization, AlreadyRandomized
 
 from pythagoras._030_data_portals.hash_addresses import HashAddr
 from pythagoras._030_data_portals.value_addresses import ValueAddr
+from pythagoras._030_data_portals.values_cache import (
+    get_cached_value, cache_value)
 
 from pythagoras._060_autonomous_functions.autonomous_core_classes import (
     AutonomousFn, AutonomousCodePortal)
@@ -29,13 +34,22 @@ from pythagoras._040_ordinary_functions.ordinary_core_classes import (
     OrdinaryFn)
 
 from pythagoras._070_pure_functions.kw_args import SortedKwArgs
+from pythagoras._070_pure_functions.execution_queue import (
+    ExecutionQueue, PENDING)
+from pythagoras._070_pure_functions.execution_leases import ExecutionLease
+from pythagoras._070_pure_functions.result_memo import PureFnResultMemo
 from pythagoras._070_pure_functions.process_augmented_func_src import (
     process_augmented_func_src)
+from pythagoras._070_pure_functions.island_bundles import (
+    restore_island_bundle, save_island_bundle)
 from pythagoras._810_output_manipulators.output_capturer import OutputCapturer
 from pythagoras._020_logging_portals.execution_environment_summary import (
     build_execution_environment_summary)
 
 
+MAX_EXECUTION_ATTEMPTS = 5
+# TODO: these should not be constants
+
 ASupportingFunc:TypeAlias = str | AutonomousFn
 
 SupportingFuncs:TypeAlias = ASupportingFunc | List[ASupportingFunc] | None
@@ -47,24 +61,50 @@ class PureCodePortal(AutonomousCodePortal):
 
     execution_results: FirstEntryDict | None
     execution_requests: PersiDict | None
+    execution_queue: ExecutionQueue | None
+    execution_leases: PersiDict | None
+    island_bundles: PersiDict | None
     run_history: OverlappingMultiDict | None
+    integrity_discrepancies: PersiDict | None
+    results_memo: PureFnResultMemo | None
 
     def __init__(self
             , root_dict: PersiDict | str | None = None
             , p_consistency_checks: float | None = None
             , default_island_name: str = "Samos"
+            , value_hashing: str | None = None
+            , parallel_hashing_threshold: int | None = None
+            , hash_type: str | None = None
+            , storage_format: str | None = None
+            , compression_threshold: int | None = None
+            , chunking_threshold: int | None = None
+            , fanout_depth: int | None = None
             ):
         super().__init__(root_dict=root_dict
             , p_consistency_checks=p_consistency_checks
-            , default_island_name=default_island_name)
+            , default_island_name=default_island_name
+            , value_hashing=value_hashing
+            , parallel_hashing_threshold=parallel_hashing_threshold
+            , hash_type=hash_type
+            , storage_format=storage_format
+            , compression_threshold=compression_threshold
+            , chunking_threshold=chunking_threshold
+            , fanout_depth=fanout_depth)
 
         results_dict_prototype = self.root_dict.get_subdict(
             "execution_results")
         results_dict_params = results_dict_prototype.get_params()
         results_dict_params.update(immutable_items=True,  file_type = "pkl")
         execution_results = type(self.root_dict)(**results_dict_params)
+        execution_results = self._build_sharded_dict(execution_results)
+        if self.compression_threshold is not None:
+            execution_results = CompressingDict(
+                execution_results, self.compression_threshold)
         execution_results = FirstEntryDict(
-            execution_results, p_consistency_checks)
+            execution_results, p_consistency_checks
+            , comparator=compare_addresses
+            , existence_index=self._build_existence_index(
+                "execution_results"))
         self.execution_results = execution_results
 
         requests_dict_prototype = self.root_dict.get_subdict(
@@ -74,6 +114,25 @@ class PureCodePortal(AutonomousCodePortal):
         execution_requests = type(self.root_dict)(**requests_dict_params)
         self.execution_requests = execution_requests
 
+        leases_dict_prototype = self.root_dict.get_subdict("execution_leases")
+        leases_dict_params = leases_dict_prototype.get_params()
+        leases_dict_params.update(immutable_items=False, file_type="json")
+        execution_leases = type(self.root_dict)(**leases_dict_params)
+        self.execution_leases = execution_leases
+
+        queue_dict_prototype = self.root_dict.get_subdict("execution_queue")
+        queue_dict_params = queue_dict_prototype.get_params()
+        queue_dict_params.update(immutable_items=False, file_type="json")
+        queue_dict = type(self.root_dict)(**queue_dict_params)
+        self.execution_queue = ExecutionQueue(
+            queue_dict, execution_leases)
+
+        bundles_dict_prototype = self.root_dict.get_subdict("island_bundles")
+        bundles_dict_params = bundles_dict_prototype.get_params()
+        bundles_dict_params.update(immutable_items=True, file_type="pkl")
+        island_bundles = type(self.root_dict)(**bundles_dict_params)
+        self.island_bundles = island_bundles
+
         run_history_prototype = self.root_dict.get_subdict("run_history")
         run_history_shared_params = run_history_prototype.get_params()
         dict_type = type(self.root_dict)
@@ -87,6 +146,15 @@ class PureCodePortal(AutonomousCodePortal):
             )
         self.run_history = run_history
 
+        discrepancies_prototype = self.root_dict.get_subdict(
+            "integrity_discrepancies")
+        discrepancies_params = discrepancies_prototype.get_params()
+        discrepancies_params.update(immutable_items=False, file_type="json")
+        integrity_discrepancies = type(self.root_dict)(**discrepancies_params)
+        self.integrity_discrepancies = integrity_discrepancies
+
+        self.results_memo = PureFnResultMemo()
+
 
     def describe(self) -> pd.DataFrame:
         """Get a DataFrame describing the portal's current state"""
@@ -97,7 +165,11 @@ class PureCodePortal(AutonomousCodePortal):
             , len(self.execution_results)))
         all_params.append(_persistent(
             "Execution queue size"
-            , len(self.execution_requests)))
+            , self.execution_queue.count(PENDING)))
+        if self.compression_threshold is not None:
+            all_params.append(_runtime(
+                "Compression ratio, execution results"
+                , self.execution_results.compression_ratio))
 
         result = pd.concat(all_params)
         result.reset_index(drop=True, inplace=True)
@@ -106,9 +178,19 @@ class PureCodePortal(AutonomousCodePortal):
     def _clear(self):
         self.execution_results = None
         self.execution_requests = None
+        self.execution_queue = None
+        self.execution_leases = None
+        self.island_bundles = None
         self.run_history = None
+        self.integrity_discrepancies = None
+        self.results_memo = None
         super()._clear()
 
+    def _forget_known_functions(self) -> None:
+        """Forget all registered functions and their memoized results."""
+        super()._forget_known_functions()
+        self.results_memo.clear()
+
 
     @classmethod
     def get_best_portal_to_use(cls, suggested_portal: PureCodePortal | None = None
@@ -134,6 +216,7 @@ class PureCodePortal(AutonomousCodePortal):
 class PureFn(AutonomousFn):
 
     _augmented_source_code: str | None
+    _fn_value_addr: ValueAddr | None
     guards: SupportingFuncs
     call_stack:list[PureFnExecutionFrame]
     def __init__(self, a_fn: Callable | str | OrdinaryFn
@@ -143,6 +226,7 @@ class PureFn(AutonomousFn):
         super().__init__(a_fn, island_name = island_name, portal = portal)
         self.guards = self._preprocess_guards(guards)
         self._augmented_source_code = None
+        self._fn_value_addr = None
         #TODO: decide how to handle guards if a_fn is PureFn
         self.call_stack = []
         if type(self) == PureFn:
@@ -156,9 +240,16 @@ class PureFn(AutonomousFn):
         super().update(other)
         self.guards = other.guards
         self._augmented_source_code = other._augmented_source_code
+        self._fn_value_addr = getattr(other, "_fn_value_addr", None)
         self.call_stack = other.call_stack
 
 
+    def _direct_call_target(self) -> Callable:
+        """Calls from other functions of the island go through execute(),
+        so their results are memoized."""
+        return self.execute
+
+
     def _preprocess_guards(self
             , supporting_funcs: SupportingFuncs = None
             ) -> List[str]|None:
@@ -270,6 +361,42 @@ class PureFn(AutonomousFn):
         return island[self.fn_name]._augmented_source_code
 
 
+    @property
+    def fn_value_addr(self) -> ValueAddr:
+        """The address of the function object in the portal's value store.
+
+        Computing the address requires pickling and hashing the function
+        together with its augmented source code. The address never changes
+        within a session, so it's computed once and cached
+        in the function's island entry. At the same time, the island
+        bundle of the function is saved to the portal.
+        """
+        if self._fn_value_addr is not None:
+            return self._fn_value_addr
+        with self.portal:
+            island = self.portal.known_functions[self.island_name]
+            registered_fn = island[self.fn_name]
+            if registered_fn._fn_value_addr is None:
+                registered_fn._fn_value_addr = ValueAddr(self)
+                # workers will need the island bundle to unpickle the function
+                save_island_bundle(registered_fn, portal=self.portal)
+            self._fn_value_addr = registered_fn._fn_value_addr
+            return self._fn_value_addr
+
+
+    def _get_bundle_state(self) -> dict:
+        state = super()._get_bundle_state()
+        state.update(guards = self.guards
+            , augmented_fn_source_code = self.augmented_fn_source_code)
+        return state
+
+    def _set_bundle_state(self, state: dict) -> None:
+        super()._set_bundle_state(state)
+        self.guards = state["guards"]
+        self._augmented_source_code = state["augmented_fn_source_code"]
+        self._fn_value_addr = None
+        self.call_stack = list()
+
     def __getstate__(self):
         """Return the state of the object for pickling. """
         self._complete_fn_registration()
@@ -295,6 +422,7 @@ class PureFn(AutonomousFn):
         self.strictly_autonomous = state["strictly_autonomous"]
         self.guards = state["guards"]
         self._augmented_source_code = None
+        self._fn_value_addr = None
         self._portal = None
         self.capture_portal()
         self.call_stack = list()
@@ -307,8 +435,15 @@ class PureFn(AutonomousFn):
             if not island[fn_name]._fn_fully_registered:
                 island[fn_name]._augmented_source_code = (
                     state["augmented_fn_source_code"])
-                process_augmented_func_src(
-                    state["augmented_fn_source_code"], portal=portal)
+                if restore_island_bundle(
+                        state["augmented_fn_source_code"], portal=portal):
+                    if island[fn_name] is not self:
+                        self.update(island[fn_name])
+                else:
+                    process_augmented_func_src(
+                        state["augmented_fn_source_code"], portal=portal)
+                    self._complete_fn_registration()
+                    save_island_bundle(island[fn_name], portal=portal)
             else:
                 assert state["augmented_fn_source_code"] == (
                     island[fn_name]._augmented_source_code)
@@ -370,6 +505,8 @@ class PureFn(AutonomousFn):
         name = self.fn_name
         if not hasattr(island[name], "_augmented_source_code"):
             island[name]._augmented_source_code = None
+        if not hasattr(island[name], "_fn_value_addr"):
+            island[name]._fn_value_addr = None
 
     def get_address(self, **kwargs) -> PureFnExecutionResultAddr:
         with self.portal:
@@ -411,35 +548,59 @@ class PureFn(AutonomousFn):
         """
 
         with self.portal as portal:
-            packed_kwargs = SortedKwArgs(**kwargs).pack(portal)
-            output_address = PureFnExecutionResultAddr(self, packed_kwargs)
             random_x = portal.entropy_infuser.random()
             p_consistency_checks = portal.p_consistency_checks
+            check_drawn = (p_consistency_checks not in [None,0]
+                and random_x < p_consistency_checks)
+            memo_key = None
+            if not check_drawn:
+                memo_key = portal.results_memo.key_for(
+                    self.island_name, self.fn_name, kwargs)
+                if memo_key is not None:
+                    found, result = portal.results_memo.get(memo_key)
+                    if found:
+                        return result
+            packed_kwargs = SortedKwArgs(**kwargs).pack(portal)
+            output_address = PureFnExecutionResultAddr(self, packed_kwargs)
             conduct_consistency_checks = False
             if output_address.ready:
-                if p_consistency_checks in [None,0]:
-                    return output_address.get()
-                if not random_x < p_consistency_checks:
-                    return output_address.get()
+                if not check_drawn:
+                    result = output_address.get()
+                    if memo_key is not None:
+                        portal.results_memo.put(memo_key, result)
+                    return result
                 conduct_consistency_checks = True
-            with PureFnExecutionFrame(output_address) as frame:
-                output_address.request_execution()
-                assert self.can_be_executed(**kwargs)
-                unpacked_kwargs = SortedKwArgs(**packed_kwargs).unpack()
-                result = super().execute(**unpacked_kwargs)
-                result_addr = ValueAddr(result)
-                frame.register_execution_result(result_addr)
-                try:
-                    if conduct_consistency_checks:
-                        portal.execution_results._p_consistency_checks = 1
-                    portal.execution_results[output_address] = result_addr
-                except:
-                    raise # TODO: raise a proper exception here
-                finally:
-                    portal.execution_results._p_consistency_checks = (
-                        p_consistency_checks)
-                output_address.drop_execution_request()
+            lease = output_address.execution_lease
+            if not lease.acquire_or_wait(
+                    is_done=lambda: output_address.ready):
+                # Another process has executed the call while we waited
+                result = output_address.get()
+                if memo_key is not None:
+                    portal.results_memo.put(memo_key, result)
                 return result
+            try:
+                with PureFnExecutionFrame(output_address) as frame:
+                    output_address.request_execution()
+                    assert self.can_be_executed(**kwargs)
+                    unpacked_kwargs = SortedKwArgs(**packed_kwargs).unpack()
+                    result = super().execute(**unpacked_kwargs)
+                    result_addr = ValueAddr(result)
+                    frame.register_execution_result(result_addr)
+                    try:
+                        if conduct_consistency_checks:
+                            portal.execution_results._p_consistency_checks = 1
+                        portal.execution_results[output_address] = result_addr
+                    except:
+                        raise # TODO: raise a proper exception here
+                    finally:
+                        portal.execution_results._p_consistency_checks = (
+                            p_consistency_checks)
+                    output_address.drop_execution_request()
+                    if memo_key is not None:
+                        portal.results_memo.put(memo_key, result)
+                    return result
+            finally:
+                lease.release()
 
     def swarm_list(
             self
@@ -472,12 +633,25 @@ class PureFn(AutonomousFn):
                 an_addr.execute()
         return addrs
 
+    def _pack_grid(self, grid_of_kwargs:dict[str, list]) -> dict[str, list]:
+        """Replace grid values with their addresses.
+
+        Each value in the grid gets hashed only once, no matter
+        how many combinations of parameters it participates in.
+        """
+        with self.portal:
+            packed_grid = dict()
+            for name, values in grid_of_kwargs.items():
+                packed_grid[name] = [ValueAddr(v) for v in values]
+            return packed_grid
+
     def swarm_grid(
             self
             , grid_of_kwargs:dict[str, list] # refactor
             ) -> list[PureFnExecutionResultAddr]:
         with self.portal:
-            param_list = list(ParameterGrid(grid_of_kwargs))
+            packed_grid = self._pack_grid(grid_of_kwargs)
+            param_list = list(ParameterGrid(packed_grid))
             addrs = self.swarm_list(param_list)
             return addrs
 
@@ -486,7 +660,8 @@ class PureFn(AutonomousFn):
             , grid_of_kwargs:dict[str, list] # refactor
             ) -> list[PureFnExecutionResultAddr]:
         with self.portal:
-            param_list = list(ParameterGrid(grid_of_kwargs))
+            packed_grid = self._pack_grid(grid_of_kwargs)
+            param_list = list(ParameterGrid(packed_grid))
             addrs = self.run_list(param_list)
             return addrs
 
@@ -509,7 +684,7 @@ class PureFnCallSignature(PortalAwareClass):
         with portal:
             self.fn_name = a_fn.fn_name
             self.island_name = a_fn.island_name
-            self.fn_addr = ValueAddr(a_fn)
+            self.fn_addr = a_fn.fn_value_addr
             self.args_addr = ValueAddr(arguments.pack(portal))
 
     def __getstate__(self):
@@ -653,12 +828,14 @@ class PureFnExecutionResultAddr(HashAddr):
             else:
                 if self not in portal.execution_requests:
                     portal.execution_requests[self] = True
+                portal.execution_queue.add(self)
 
 
     def drop_execution_request(self):
         """Remove the request for execution of the function."""
         with self.portal:
             self.portal.execution_requests.delete_if_exists(self)
+            self.portal.execution_queue.mark_done(self)
 
 
     @property
@@ -668,6 +845,14 @@ class PureFnExecutionResultAddr(HashAddr):
             return self in self.portal.execution_requests
 
 
+    def _load_result(self) -> Any:
+        """Load the (ready) result from the current portal."""
+        with self.portal as portal:
+            result_addr = portal.execution_results[self]
+            result = result_addr.get_from_current_portal()
+            cache_value(self, result)
+            return result
+
     def get(self, timeout: int = None):
         """Retrieve value, referenced by the address.
 
@@ -683,11 +868,15 @@ class PureFnExecutionResultAddr(HashAddr):
         if hasattr(self, "_result"):
             return self._result
 
+        is_cached, result = get_cached_value(self)
+        if is_cached:
+            self._result = result
+            return result
+
         with self.portal as portal:
 
             if self.ready:
-                result_addr = portal.execution_results[self]
-                self._result = portal.value_store[result_addr]
+                self._result = self._load_result()
                 return self._result
 
             self.request_execution()
@@ -701,8 +890,7 @@ class PureFnExecutionResultAddr(HashAddr):
 
             while True:
                 if self.ready:
-                    result_addr = portal.execution_results[self]
-                    self._result = portal.value_store[result_addr]
+                    self._result = self._load_result()
                     self.drop_execution_request()
                     return self._result
                 else:
@@ -790,34 +978,39 @@ class PureFnExecutionResultAddr(HashAddr):
             return self.function.can_be_executed(**self.kwargs)
 
 
+    @property
+    def execution_lease(self) -> ExecutionLease:
+        """The lease that grants exclusive right to execute the function."""
+        with self.portal as portal:
+            return ExecutionLease(portal.execution_leases, self)
+
+
     @property
     def needs_execution(self) -> bool:
         """Indicates if the function is a good candidate for execution.
 
-        Returns False if the result is already available, or if some other
-        process is currently working on it. Otherwise, returns True.
+        Returns False if the result is already available, if the function
+        was attempted too many times, or if some other process
+        is currently working on it (holds a live execution lease).
+        Otherwise, returns True.
         """
-        DEFAULT_EXECUTION_TIME = 10
-        MAX_EXECUTION_ATTEMPTS = 5
-        # TODO: these should not be constants
         if self.ready:
             return False
         with self.portal:
-            past_attempts = self.execution_attempts
-            n_past_attempts = len(past_attempts)
-            if n_past_attempts == 0:
-                return True
-            if n_past_attempts > MAX_EXECUTION_ATTEMPTS:
+            if self.execution_attempts_exhausted:
                 #TODO: log this event. Should we have DLQ?
                 return False
-            most_recent_timestamp = max(
-                past_attempts.timestamp(a) for a in past_attempts)
-            current_timestamp = time.time()
-            if (current_timestamp - most_recent_timestamp
-                    > DEFAULT_EXECUTION_TIME*(2**n_past_attempts)):
-                return True
-            return False
+            if self.execution_lease.held_by_others:
+                return False
+            return True
+
+
 
+    @property
+    def execution_attempts_exhausted(self) -> bool:
+        """Indicates if the function was attempted too many times."""
+        with self.portal:
+            return len(self.execution_attempts) > MAX_EXECUTION_ATTEMPTS
 
 
     @property
@@ -922,6 +1115,8 @@ class PureFnExecutionFrame(PortalAwareClass):
     exception_counter: int
     event_counter: int
     fn: PureFn
+    lease: ExecutionLease
+    lease_acquired: bool
 
     def __init__(self, f_address: PureFnExecutionResultAddr):
         super().__init__(portal=f_address.portal)
@@ -932,6 +1127,8 @@ class PureFnExecutionFrame(PortalAwareClass):
         self.exception_counter = 0
         self.event_counter = 0
         self.context_used = False
+        self.lease = f_address.execution_lease
+        self.lease_acquired = False
 
 
     @property
@@ -946,6 +1143,9 @@ class PureFnExecutionFrame(PortalAwareClass):
             "An instance of PureFnExecutionFrame can be used only once.")
         assert self.event_counter == 0, (
             "An instance of PureFnExecutionFrame can be used only once.")
+        self.lease_acquired = self.lease.acquire()
+        assert self.lease_acquired, (
+            "The execution lease is held by another process.")
         self.portal.__enter__()
         self.output_capturer.__enter__()
         self.fn.call_stack.append(self)
@@ -976,6 +1176,8 @@ class PureFnExecutionFrame(PortalAwareClass):
         # self.register_exception(
         #     exc_type=exc_type, exc_value=exc_value, trace_back=trace_back)
 
+        if self.lease_acquired:
+            self.lease.release()
         self.portal.__exit__(exc_type, exc_value, traceback)
         self.fn.call_stack.pop()
 
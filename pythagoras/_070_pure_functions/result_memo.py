@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import pickle
+from typing import Any, Hashable
+
+from pythagoras._830_memory_caches.size_bounded_lru import SizeBoundedLRU
+
+
+MEMO_MAX_ITEMS = 10_000
+MEMO_MAX_BYTES = 2**28 # 256 MB
+
+_MAX_FINGERPRINT_DEPTH = 3
+_IMMUTABLE_RESULT_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+def _fingerprint(value: Any, depth: int = 0) -> Hashable | None:
+    """Build a cheap type-tagged fingerprint of an argument value.
+
+    Only scalars of basic immutable types and (shallow) tuples
+    of them get fingerprints; for everything else None is returned.
+    Type tags keep 1, 1.0 and True apart. Floats are represented
+    via float.hex(), so 0.0 and -0.0 are different too.
+    """
+    value_type = type(value)
+    if value_type is float:
+        return (float, value.hex())
+    if value_type in (type(None), bool, int, str, bytes):
+        return (value_type, value)
+    if value_type is tuple and depth < _MAX_FINGERPRINT_DEPTH:
+        items = []
+        for v in value:
+            fp = _fingerprint(v, depth + 1)
+            if fp is None:
+                return None
+            items.append(fp)
+        return (tuple, tuple(items))
+    return None
+
+
+class PureFnResultMemo:
+    """An in-process memo table for results of pure functions.
+
+    A cache hit in PureFn.execute normally has to pack (hash and store)
+    all the arguments, hash the call signature and look up the result
+    in the portal's persistent storage. The memo table lets repeated calls
+    with simple arguments (None, bools, numbers, strings, bytes and
+    tuples of them) skip all this work: it maps the function identity
+    and cheap fingerprints of the arguments directly to the result.
+
+    Results of immutable basic types are stored as is, all other results
+    are stored pickled and unpickled on every hit, so callers always get
+    their own copy (same as when a result is loaded from the portal).
+
+    The table is bounded by the number of items and the total size,
+    the least recently used items are evicted first.
+    """
+
+    def __init__(self
+            , max_items: int = MEMO_MAX_ITEMS
+            , max_bytes: int = MEMO_MAX_BYTES):
+        self._cache = SizeBoundedLRU(max_items=max_items, max_bytes=max_bytes)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    @staticmethod
+    def key_for(island_name: str, fn_name: str
+            , kwargs: dict[str, Any]) -> Hashable | None:
+        """Build a memo key for a call, or None if it can't be memoized."""
+        fingerprints = []
+        for name in sorted(kwargs):
+            fp = _fingerprint(kwargs[name])
+            if fp is None:
+                return None
+            fingerprints.append((name, fp))
+        return (island_name, fn_name, tuple(fingerprints))
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """Return (True, result) on a hit, (False, None) on a miss."""
+        item = self._cache.get(key)
+        if item is None:
+            return False, None
+        is_pickled, payload = item
+        if is_pickled:
+            return True, pickle.loads(payload)
+        return True, payload
+
+    def put(self, key: Hashable, result: Any) -> None:
+        """Remember the result of a call."""
+        if type(result) in _IMMUTABLE_RESULT_TYPES:
+            self._cache.put(key, (False, result))
+            return
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except:
+            return
+        self._cache.put(key, (True, payload), size=len(payload))
+
+    def clear(self) -> None:
+        self._cache.clear()
@@ -3,11 +3,13 @@ from __future__ import annotations
 import atexit
 import os
 from copy import deepcopy
-from time import sleep
+from time import sleep, time
+from typing import Callable
 import random
 
 import pandas as pd
 import parameterizable
+import psutil
 from persidict import FileDirDict, PersiDict
 
 from pythagoras import BasicPortal, build_execution_environment_summary
@@ -17,6 +19,10 @@ from pythagoras._800_persidict_extensions.overlapping_multi_dict import (
     OverlappingMultiDict)
 from pythagoras._070_pure_functions.pure_core_classes import (
     PureCodePortal, PureFnExecutionResultAddr)
+from pythagoras._070_pure_functions.execution_queue import (
+    STALE_CLAIMS_SWEEP_INTERVAL)
+from pythagoras._070_pure_functions.integrity_scrubber import (
+    IntegrityScrubber)
 # from pythagoras._090_swarming_portals.clean_runtime_id import clean_runtime_id
 from pythagoras._820_strings_signatures_converters.node_signatures import get_node_signature
 
@@ -27,7 +33,29 @@ from pythagoras._810_output_manipulators.output_suppressor import (
 
 
 class SwarmingPortal(PureCodePortal):
+    """A portal that executes pure functions in background worker processes.
+
+    Each background worker is a long-lived process that keeps executing
+    random execution requests from the portal in a loop.
+    A worker process is recycled (replaced with a fresh one) after it has
+    processed max_tasks_per_worker requests, after it has been running for
+    more than max_worker_lifetime seconds, or after its resident memory
+    has grown beyond max_worker_rss_mb megabytes, whichever comes first.
+    A value of None disables the corresponding limit.
+    If a worker process crashes, it is replaced with a fresh one as well.
+
+    While there are no execution requests, workers verify the content
+    of the portal with an IntegrityScrubber. scrubbing_budget is the
+    fraction of idle time a worker spends on it (None disables scrubbing),
+    scrubbing_p_reexecution is the probability to re-execute
+    a function call, whose stored result is being checked.
+    """
     compute_nodes: OverlappingMultiDict | None
+    max_tasks_per_worker: int | None
+    max_worker_lifetime: float | None
+    max_worker_rss_mb: float | None
+    scrubbing_budget: float | None
+    scrubbing_p_reexecution: float
 
     def __init__(self
                  , root_dict: PersiDict | str | None = None
@@ -35,14 +63,54 @@ class SwarmingPortal(PureCodePortal):
                  , p_consistency_checks:float|None = None
                  , n_background_workers:int|None = 3
                  , runtime_id:str|None = None
+                 , max_tasks_per_worker:int|None = 100
+                 , max_worker_lifetime:float|None = 3600
+                 , max_worker_rss_mb:float|None = None
+                 , scrubbing_budget:float|None = None
+                 , scrubbing_p_reexecution:float = 0.1
+                 , value_hashing:str|None = None
+                 , parallel_hashing_threshold:int|None = None
+                 , hash_type:str|None = None
+                 , storage_format:str|None = None
+                 , compression_threshold:int|None = None
+                 , chunking_threshold:int|None = None
+                 , fanout_depth:int|None = None
                  ):
         super().__init__(root_dict=root_dict
                          , p_consistency_checks=p_consistency_checks
-                         , default_island_name=default_island_name)
+                         , default_island_name=default_island_name
+                         , value_hashing=value_hashing
+                         , parallel_hashing_threshold=parallel_hashing_threshold
+                         , hash_type=hash_type
+                         , storage_format=storage_format
+                         , compression_threshold=compression_threshold
+                         , chunking_threshold=chunking_threshold
+                         , fanout_depth=fanout_depth)
         n_background_workers = int(n_background_workers)
         assert n_background_workers >= 0
         self.n_background_workers = n_background_workers
 
+        if max_tasks_per_worker is not None:
+            max_tasks_per_worker = int(max_tasks_per_worker)
+            assert max_tasks_per_worker >= 1
+        self.max_tasks_per_worker = max_tasks_per_worker
+        if max_worker_lifetime is not None:
+            max_worker_lifetime = float(max_worker_lifetime)
+            assert max_worker_lifetime > 0
+        self.max_worker_lifetime = max_worker_lifetime
+        if max_worker_rss_mb is not None:
+            max_worker_rss_mb = float(max_worker_rss_mb)
+            assert max_worker_rss_mb > 0
+        self.max_worker_rss_mb = max_worker_rss_mb
+        if scrubbing_budget is not None:
+            scrubbing_budget = float(scrubbing_budget)
+            assert 0 < scrubbing_budget <= 1
+        self.scrubbing_budget = scrubbing_budget
+        scrubbing_p_reexecution = float(scrubbing_p_reexecution)
+        assert 0 <= scrubbing_p_reexecution <= 1
+        self.scrubbing_p_reexecution = scrubbing_p_reexecution
+        self._scrubber = None
+
         compute_nodes_prototype = self.root_dict.get_subdict("compute_nodes")
         compute_nodes_shared_params = compute_nodes_prototype.get_params()
         dict_type = type(self.root_dict)
@@ -72,6 +140,9 @@ class SwarmingPortal(PureCodePortal):
             self.compute_nodes.json[address] = summary
             # for portal in self.get_noncurrent_portals():
             #     portal.compute_nodes.json[address] = summary
+
+            self.execution_queue.import_legacy_requests(
+                self.execution_requests)
         else:
             self.runtime_id = runtime_id
 
@@ -84,6 +155,11 @@ class SwarmingPortal(PureCodePortal):
         params = super().get_params()
         params["n_background_workers"]=self.n_background_workers
         params["runtime_id"]=self.runtime_id
+        params["max_tasks_per_worker"]=self.max_tasks_per_worker
+        params["max_worker_lifetime"]=self.max_worker_lifetime
+        params["max_worker_rss_mb"]=self.max_worker_rss_mb
+        params["scrubbing_budget"]=self.scrubbing_budget
+        params["scrubbing_p_reexecution"]=self.scrubbing_p_reexecution
         return params
 
     def describe(self) -> pd.DataFrame:
@@ -118,6 +194,48 @@ class SwarmingPortal(PureCodePortal):
         return False
 
 
+    def worker_needs_recycling(self
+            , n_tasks_done:int
+            , start_time:float
+            ) -> bool:
+        """Check if the current worker process should be replaced."""
+        if (self.max_tasks_per_worker is not None
+                and n_tasks_done >= self.max_tasks_per_worker):
+            return True
+        if (self.max_worker_lifetime is not None
+                and time() - start_time > self.max_worker_lifetime):
+            return True
+        if self.max_worker_rss_mb is not None:
+            rss_mb = psutil.Process().memory_info().rss / 2**20
+            if rss_mb > self.max_worker_rss_mb:
+                return True
+        return False
+
+
+    def _scrub_while_idle(self) -> None:
+        """Check one stored item, then pause to stay within the budget.
+
+        The pause is long enough for scrubbing to take only
+        scrubbing_budget of a worker's time. Problems found are recorded
+        in integrity_discrepancies; failures of the scrubber itself
+        are logged, but they must not stop the worker.
+        """
+        if self.scrubbing_budget is None:
+            return
+        if self._scrubber is None:
+            self._scrubber = IntegrityScrubber(
+                self, self.scrubbing_p_reexecution)
+        start_time = time()
+        try:
+            with OutputSuppressor():
+                if not self._scrubber.scrub_step():
+                    return
+        except Exception:
+            self._exception_logger()
+        elapsed = time() - start_time
+        sleep(elapsed * (1 - self.scrubbing_budget) / self.scrubbing_budget)
+
+
     def _launch_background_worker(self):
         """Launch one background worker process."""
         init_params = self.__get_portable_params__()
@@ -132,6 +250,7 @@ class SwarmingPortal(PureCodePortal):
         address = [self.node_id, "runtime_id"]
         self.compute_nodes.pkl.delete_if_exists(address)
         self.compute_nodes = None
+        self._scrubber = None
         super()._clear()
 
 
@@ -175,7 +294,13 @@ class SwarmingPortal(PureCodePortal):
 parameterizable.register_parameterizable_class(SwarmingPortal)
 
 def _background_worker(**portal_init_params):
-    """Background worker that keeps processing random execution requests."""
+    """Background worker that keeps processing random execution requests.
+
+    It does not execute requests itself. Instead, it keeps (re)launching
+    long-lived worker processes, which do the actual work.
+    A new worker process is launched every time the previous one exits,
+    either because it needed recycling or because it crashed.
+    """
     portal_init_params["n_background_workers"] = 0
     portal = parameterizable.get_object_from_portable_params(
         portal_init_params)
@@ -188,42 +313,95 @@ def _background_worker(**portal_init_params):
                 if not portal.parent_runtime_is_live():
                     return
                 p = ctx.Process(
-                    target=_process_random_execution_request
+                    target=_process_many_random_execution_requests
                     , kwargs=portal_init_params)
                 p.start()
                 p.join()
                 portal._randomly_delay_execution()
 
 
-def _process_random_execution_request(**portal_init_params):
-    """Process one random execution request."""
+def _process_many_random_execution_requests(**portal_init_params):
+    """Keep processing random execution requests till recycling is needed.
+
+    This function is the body of a long-lived worker process. The portal
+    is constructed only once, and then reused for all the requests.
+    An exception raised while processing one request does not stop
+    the worker: it is logged by the portal, and the worker moves on
+    to the next request. Only successfully processed requests
+    count towards max_tasks_per_worker.
+    """
     portal_init_params["n_background_workers"] = 0
     portal = parameterizable.get_object_from_portable_params(
         portal_init_params)
     assert isinstance(portal, SwarmingPortal)
+    start_time = time()
+    n_tasks_done = 0
     with portal:
-        max_addresses_to_consider = random.randint(200, 5000)
-        # TODO: are 200 and 5000 good values for max_addresses_to_consider?
         with OutputSuppressor():
-            candidate_addresses = []
-            while len(candidate_addresses) == 0:
-                if not portal.parent_runtime_is_live():
-                    return
-                for addr in portal.execution_requests:
-                    new_address = PureFnExecutionResultAddr.from_strings(
-                        prefix=addr[0], hash_signature=addr[1]
-                        , assert_readiness=False) # How does it handle portals?
-                    if not new_address.needs_execution:
-                        continue
-                    if not new_address.can_be_executed:
-                        continue
-                    candidate_addresses.append(new_address)
-                    if len(candidate_addresses) > max_addresses_to_consider:
-                        break
-                if len(candidate_addresses) == 0:
-                    portal._randomly_delay_execution(p=1)
-            random_address = portal.entropy_infuser.choice(candidate_addresses)
-            random_address.execute()
+            needs_recycling = lambda: portal.worker_needs_recycling(
+                n_tasks_done, start_time)
+            while not needs_recycling():
+                try:
+                    if not _execute_random_request(portal, needs_recycling):
+                        return
+                    n_tasks_done += 1
+                except:
+                    portal._exception_logger()
+                finally:
+                    portal._forget_known_functions()
+
+
+def _execute_random_request(portal: SwarmingPortal
+        , needs_recycling: Callable[[], bool] = lambda: False) -> bool:
+    """Claim a random execution request and execute it.
+
+    Wait till at least one suitable request is available.
+    Returns False if the parent runtime is not live anymore,
+    or if the worker needs recycling while it waits
+    (and hence nothing was executed), otherwise returns True.
+    """
+    queue = portal.execution_queue
+    while True:
+        if not portal.parent_runtime_is_live():
+            return False
+        key = queue.claim()
+        if key is None:
+            if needs_recycling():
+                return False
+            queue.requeue_stale_claims(
+                min_interval=STALE_CLAIMS_SWEEP_INTERVAL)
+            portal._scrub_while_idle()
+            portal._randomly_delay_execution(p=1)
+            continue
+        address = PureFnExecutionResultAddr.from_strings(
+            prefix=key[0], hash_signature=key[1]
+            , assert_readiness=False)
+        if address.ready:
+            address.drop_execution_request()
+            continue
+        if address.execution_attempts_exhausted:
+            #TODO: log this event
+            queue.mark_failed(address)
+            continue
+        if not (address.needs_execution and address.can_be_executed):
+            queue.release(address)
+            portal._randomly_delay_execution()
+            continue
+        with address.execution_lease as lease:
+            if not lease.acquired:
+                # some other worker has just started executing it
+                queue.release(address)
+                portal._randomly_delay_execution()
+                continue
+            try:
+                address.execute()
+            except:
+                if address.execution_attempts_exhausted:
+                    queue.mark_failed(address)
+                else:
+                    queue.release(address)
+                raise
+        return True
 
 
 def _clean_runtime_id():
@@ -1,2 +1,11 @@
 from .overlapping_multi_dict import OverlappingMultiDict
 
+from .serializing_dict import SerializingDict
+
+from .compressing_dict import CompressingDict
+
+from .chunking_dict import ChunkingDict
+
+from .existence_index import ExistenceIndex
+
+from .sharded_dict import ShardedDict
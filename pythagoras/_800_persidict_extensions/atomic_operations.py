@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+from typing import Any
+
+from persidict import PersiDict, FileDirDict, SafeStrTuple
+from persidict.persi_dict import PersiDictKey
+
+from pythagoras._800_persidict_extensions.file_dir_dict_adapter import (
+    get_file_name, save_to_file)
+
+
+def create_if_absent(a_dict: PersiDict, key: PersiDictKey, value: Any) -> bool:
+    """Store a value in a dictionary, unless the key is already present.
+
+    Returns True if the value was stored by this call, False if the key
+    already existed. For FileDirDict, the check and the write are done
+    as one atomic filesystem operation: the value is first written
+    to a temporary file, which is then hard-linked to its final name.
+    Linking fails if the target file exists, so out of several processes
+    trying to create the same key, only one succeeds, and no process
+    can ever see a partially written file.
+
+    Dictionaries that wrap other dictionaries (e.g. SerializingDict)
+    provide their own create_if_absent() method, which is used instead.
+    For other types of dictionaries, the operation is not atomic:
+    if a write fails because the key was created concurrently,
+    False is returned.
+    """
+    assert isinstance(a_dict, PersiDict)
+    key = SafeStrTuple(key)
+
+    own_method = getattr(type(a_dict), "create_if_absent", None)
+    if own_method is not None:
+        return own_method(a_dict, key, value)
+
+    if not isinstance(a_dict, FileDirDict):
+        if key in a_dict:
+            return False
+        try:
+            a_dict[key] = value
+        except:
+            if key in a_dict:
+                return False
+            raise
+        return True
+
+    file_name = get_file_name(a_dict, key, create_subdirs=True)
+    if os.path.exists(file_name):
+        return False
+
+    dir_name = os.path.dirname(file_name)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=dir_name, prefix=".tmp_", suffix=".tmp")
+    os.close(fd)
+    try:
+        save_to_file(a_dict, tmp_name, value)
+    except:
+        os.remove(tmp_name)
+        raise
+    return publish_file_if_absent(tmp_name, file_name)
+
+
+def publish_file_if_absent(tmp_name: str, file_name: str) -> bool:
+    """Atomically give a file its final name, unless it already exists.
+
+    Returns True if the file was published, False if a file with
+    the same name already existed. The temporary file is removed
+    in both cases.
+
+    If the filesystem does not support hard links, the final name is
+    reserved by exclusively creating a separate reservation file,
+    so readers never see an empty or partially written file.
+    While the name is reserved by another process, the call waits
+    till that process publishes its file, so False is only returned
+    when the file actually exists. A reservation left behind
+    by a crashed process is removed after RESERVATION_TIMEOUT seconds.
+    """
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    try:
+        os.link(tmp_name, file_name)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        # The filesystem does not support hard links
+        return _publish_with_reservation(tmp_name, file_name)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+
+RESERVATION_TIMEOUT = 60 # seconds
+RESERVATION_POLL_INTERVAL = 0.01 # seconds
+
+def _publish_with_reservation(tmp_name: str, file_name: str) -> bool:
+    reservation_name = file_name + ".reserved"
+    while True:
+        try:
+            reservation = os.open(
+                reservation_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            pass
+        if os.path.exists(file_name):
+            return False
+        try:
+            reservation_age = time.time() - os.path.getmtime(reservation_name)
+            if reservation_age > RESERVATION_TIMEOUT:
+                os.remove(reservation_name)
+        except OSError:
+            pass
+        time.sleep(RESERVATION_POLL_INTERVAL)
+    os.close(reservation)
+    try:
+        # The file could have been published before we reserved its name
+        if os.path.exists(file_name):
+            return False
+        os.replace(tmp_name, file_name)
+        return True
+    finally:
+        os.remove(reservation_name)
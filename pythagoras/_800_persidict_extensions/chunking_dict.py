@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import hashlib
+import pickle
+import threading
+from typing import Any
+
+import numpy as np
+from persidict import PersiDict
+from persidict.persi_dict import PersiDictKey
+
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent)
+from pythagoras._820_strings_signatures_converters.base_16_32_convertors import (
+    convert_base16_to_base32)
+
+
+CHUNK_MIN_SIZE: int = 2**18 # 256 KB
+CHUNK_AVG_SIZE: int = 2**20 # 1 MB, must be a power of 2
+CHUNK_MAX_SIZE: int = 2**22 # 4 MB
+CHUNK_WINDOW: int = 64
+
+_SCAN_BLOCK_SIZE = 2**22
+_GEAR_TABLE = np.random.default_rng(20240517).integers(
+    0, 2**32, size=256, dtype=np.uint64)
+
+
+def _find_boundary_candidates(data: memoryview) -> np.ndarray:
+    """Find positions, where content-defined chunks may end.
+
+    Every byte is mapped to a pseudo-random number; a chunk may end
+    after a byte, if the sum of numbers of the last CHUNK_WINDOW bytes
+    is divisible by CHUNK_AVG_SIZE. The sum depends only on the content
+    of the window, so inserting or removing bytes in one place
+    of a value doesn't move boundaries in the rest of it.
+    Sums are computed as differences of cumulative sums,
+    block by block, to limit the memory footprint.
+    """
+    all_bytes = np.frombuffer(data, dtype=np.uint8)
+    mask = np.uint64(CHUNK_AVG_SIZE - 1)
+    result = []
+    for start in range(0, len(all_bytes), _SCAN_BLOCK_SIZE):
+        block_start = max(0, start - CHUNK_WINDOW)
+        block = all_bytes[block_start:start + _SCAN_BLOCK_SIZE]
+        cumulative = np.cumsum(_GEAR_TABLE[block], dtype=np.uint64)
+        window_sums = cumulative[CHUNK_WINDOW:] - cumulative[:-CHUNK_WINDOW]
+        positions = np.flatnonzero((window_sums & mask) == 0)
+        # positions are given for the last byte in a window,
+        # boundaries are right after that byte
+        positions += block_start + CHUNK_WINDOW + 1
+        result.append(positions[positions > start])
+    if len(result) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(result)
+
+
+def split_into_chunks(data: memoryview) -> list[memoryview]:
+    """Split data into content-defined chunks.
+
+    Chunks are between CHUNK_MIN_SIZE and CHUNK_MAX_SIZE bytes long
+    (except the last one), CHUNK_AVG_SIZE bytes on average.
+    """
+    data = memoryview(data).cast("B")
+    size = data.nbytes
+    boundaries = []
+    last = 0
+    for position in _find_boundary_candidates(data).tolist():
+        while position - last > CHUNK_MAX_SIZE:
+            last += CHUNK_MAX_SIZE
+            boundaries.append(last)
+        if position - last >= CHUNK_MIN_SIZE and position < size:
+            boundaries.append(position)
+            last = position
+    while size - last > CHUNK_MAX_SIZE:
+        last += CHUNK_MAX_SIZE
+        boundaries.append(last)
+    boundaries.append(size)
+    chunks = []
+    start = 0
+    for end in boundaries:
+        if end > start:
+            chunks.append(data[start:end])
+        start = end
+    return chunks
+
+
+def get_chunk_signature(chunk: memoryview) -> str:
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(chunk)
+    return convert_base16_to_base32(hasher.hexdigest())
+
+
+class ChunkManifest:
+    """A list of chunks, a value is made of, as stored by ChunkingDict."""
+
+    __slots__ = ("chunk_signatures", "raw_size")
+
+    def __init__(self, chunk_signatures: list[str], raw_size: int):
+        self.chunk_signatures = chunk_signatures
+        self.raw_size = raw_size
+
+    def __getstate__(self):
+        return (self.chunk_signatures, self.raw_size)
+
+    def __setstate__(self, state):
+        self.chunk_signatures, self.raw_size = state
+
+
+class ChunkingDict(PersiDict):
+    """An immutable dictionary that stores large values as deduplicated chunks.
+
+    A value is pickled; if the pickle is at least chunking_threshold
+    bytes long, it's split into content-defined chunks (see
+    split_into_chunks()). Every chunk is saved in the chunks dictionary
+    under its own hash, once, no matter how many values contain it;
+    the wrapped dict gets a ChunkManifest instead of the value.
+    Values that differ by a few rows or elements share most
+    of their chunks. Smaller values are stored as is.
+
+    Reading is transparent, values are reassembled from their chunks.
+    Values that the wrapped dict saves in their own formats
+    (see SerializingDict.serializer_for) are never chunked.
+    """
+
+    _wrapped_dict: PersiDict
+    chunks: PersiDict
+    chunking_threshold: int
+    new_chunks_count: int
+    reused_chunks_count: int
+
+    def __init__(self
+            , wrapped_dict: PersiDict
+            , chunks: PersiDict
+            , chunking_threshold: int = 2**24):
+        assert isinstance(wrapped_dict, PersiDict)
+        assert isinstance(chunks, PersiDict)
+        assert wrapped_dict.immutable_items == True
+        assert chunks.immutable_items == True
+        assert chunking_threshold >= 0
+        super().__init__(
+            base_class_for_values=wrapped_dict.base_class_for_values
+            , immutable_items=True
+            , digest_len=wrapped_dict.digest_len)
+        self._wrapped_dict = wrapped_dict
+        self.chunks = chunks
+        self.chunking_threshold = chunking_threshold
+        self.new_chunks_count = 0
+        self.reused_chunks_count = 0
+        self._stats_lock = threading.Lock()
+
+    def _is_saved_natively(self, value: Any) -> bool:
+        serializer_for = getattr(self._wrapped_dict, "serializer_for", None)
+        return serializer_for is not None and serializer_for(value) is not None
+
+    def _save_chunk(self, signature: str, chunk: memoryview | None
+            , source: PersiDict | None = None) -> None:
+        """Save a chunk, unless it's already there.
+
+        If source is given, the chunk is copied from it.
+        """
+        is_new = False
+        if signature not in self.chunks:
+            if source is not None:
+                chunk = source[signature]
+            is_new = create_if_absent(self.chunks, signature, bytes(chunk))
+        with self._stats_lock:
+            if is_new:
+                self.new_chunks_count += 1
+            else:
+                self.reused_chunks_count += 1
+
+    def _load_chunked(self, manifest: ChunkManifest) -> Any:
+        data = bytearray(manifest.raw_size)
+        position = 0
+        for signature in manifest.chunk_signatures:
+            chunk = self.chunks[signature]
+            data[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        assert position == manifest.raw_size
+        return pickle.loads(data)
+
+    def __contains__(self, key: PersiDictKey) -> bool:
+        return key in self._wrapped_dict
+
+    def __getitem__(self, key: PersiDictKey) -> Any:
+        value = self._wrapped_dict[key]
+        if isinstance(value, ChunkManifest):
+            value = self._load_chunked(value)
+        return value
+
+    def _encode(self, value: Any) -> Any:
+        """Get the object to store for a value: the value or its manifest.
+
+        Chunks of the value are saved by this call.
+        """
+        if self._is_saved_natively(value):
+            return value
+        raw_data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(raw_data) < self.chunking_threshold:
+            encode_pickled = getattr(self._wrapped_dict, "encode_pickled", None)
+            if encode_pickled is not None:
+                # Let the wrapped dict (e.g. CompressingDict) reuse the pickle
+                return encode_pickled(value, raw_data)
+            return value
+        signatures = []
+        for chunk in split_into_chunks(memoryview(raw_data)):
+            signature = get_chunk_signature(chunk)
+            self._save_chunk(signature, chunk)
+            signatures.append(signature)
+        return ChunkManifest(signatures, len(raw_data))
+
+    def __setitem__(self, key: PersiDictKey, value: Any) -> None:
+        if not self.create_if_absent(key, value):
+            raise KeyError("Can't modify an immutable key-value pair")
+
+    def create_if_absent(self, key: PersiDictKey, value: Any) -> bool:
+        """Store a value unless the key is present, see create_if_absent().
+
+        The manifest is saved after all the chunks: a value
+        is never visible before all its chunks are saved.
+        """
+        if key in self._wrapped_dict:
+            return False
+        return create_if_absent(self._wrapped_dict, key, self._encode(value))
+
+    def copy_item(self, key: PersiDictKey, source: ChunkingDict
+            , source_key: PersiDictKey | None = None) -> bool:
+        """Copy a chunked value from another ChunkingDict.
+
+        Only chunks that are missing in this dictionary are transferred,
+        the value itself is never reassembled. source_key is the key
+        of the value in the source (the same as key by default).
+        Returns False if the value in the source is not chunked
+        (then it must be copied as a regular value).
+        """
+        if source_key is None:
+            source_key = key
+        manifest = source._wrapped_dict[source_key]
+        if not isinstance(manifest, ChunkManifest):
+            return False
+        if key in self._wrapped_dict:
+            return True
+        for signature in manifest.chunk_signatures:
+            self._save_chunk(signature, None, source=source.chunks)
+        create_if_absent(self._wrapped_dict, key, manifest)
+        return True
+
+    def __delitem__(self, key: PersiDictKey) -> None:
+        raise KeyError("Can't delete an immutable key-value pair")
+
+    def __len__(self) -> int:
+        return len(self._wrapped_dict)
+
+    def _generic_iter(self, iter_type: str):
+        assert iter_type in {"keys", "values", "items"}
+        for key in self._wrapped_dict.keys():
+            if iter_type == "keys":
+                yield key
+            elif iter_type == "values":
+                yield self[key]
+            else:
+                yield (key, self[key])
+
+    def timestamp(self, key: PersiDictKey) -> float:
+        return self._wrapped_dict.timestamp(key)
+
+    def get_subdict(self, prefix_key: PersiDictKey) -> ChunkingDict:
+        return ChunkingDict(self._wrapped_dict.get_subdict(prefix_key)
+            , self.chunks, self.chunking_threshold)
+
+    def __getattr__(self, name):
+        # Forward attribute access to the wrapped object
+        return getattr(self._wrapped_dict, name)
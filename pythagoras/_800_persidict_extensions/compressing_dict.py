@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import pickle
+import threading
+from typing import Any
+
+import lz4.frame
+from persidict import PersiDict
+from persidict.persi_dict import PersiDictKey
+
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent)
+
+
+class CompressedPickle:
+    """An lz4-compressed pickle of a value, as stored by CompressingDict.
+
+    raw_size is the size of the uncompressed pickle (in bytes).
+    """
+
+    __slots__ = ("data", "raw_size")
+
+    def __init__(self, data: bytes, raw_size: int):
+        self.data = data
+        self.raw_size = raw_size
+
+    def __getstate__(self):
+        return (self.data, self.raw_size)
+
+    def __setstate__(self, state):
+        self.data, self.raw_size = state
+
+    def load(self) -> Any:
+        return pickle.loads(lz4.frame.decompress(self.data))
+
+
+class CompressingDict(PersiDict):
+    """An immutable dictionary that compresses large values with lz4.
+
+    A value is pickled; if the pickle is at least compression_threshold
+    bytes long, the wrapped dict gets a CompressedPickle instead
+    of the value, otherwise the value is stored as is. Reading
+    is transparent: compressed values are decompressed on the fly,
+    so values saved with any threshold (or without the wrapper)
+    can always be read back.
+
+    Values that the wrapped dict saves in their own formats
+    (see SerializingDict.serializer_for) are never compressed.
+
+    The dictionary counts sizes of the compressed values it writes
+    and reads, see compression_ratio.
+    """
+
+    _wrapped_dict: PersiDict
+    compression_threshold: int
+    raw_bytes: int
+    compressed_bytes: int
+
+    def __init__(self
+            , wrapped_dict: PersiDict
+            , compression_threshold: int = 2**16):
+        assert isinstance(wrapped_dict, PersiDict)
+        assert wrapped_dict.immutable_items == True
+        assert compression_threshold >= 0
+        super().__init__(
+            base_class_for_values=wrapped_dict.base_class_for_values
+            , immutable_items=True
+            , digest_len=wrapped_dict.digest_len)
+        self._wrapped_dict = wrapped_dict
+        self.compression_threshold = compression_threshold
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, compressed: CompressedPickle) -> None:
+        with self._stats_lock:
+            self.raw_bytes += compressed.raw_size
+            self.compressed_bytes += len(compressed.data)
+
+    @property
+    def compression_ratio(self) -> float | None:
+        """Raw / compressed size of all compressed values seen so far."""
+        if self.compressed_bytes == 0:
+            return None
+        return self.raw_bytes / self.compressed_bytes
+
+    def _is_saved_natively(self, value: Any) -> bool:
+        serializer_for = getattr(self._wrapped_dict, "serializer_for", None)
+        return serializer_for is not None and serializer_for(value) is not None
+
+    def __contains__(self, key: PersiDictKey) -> bool:
+        return key in self._wrapped_dict
+
+    def __getitem__(self, key: PersiDictKey) -> Any:
+        value = self._wrapped_dict[key]
+        if isinstance(value, CompressedPickle):
+            self._count(value)
+            value = value.load()
+        return value
+
+    def _encode(self, value: Any) -> Any:
+        """Get the object to store: the value or its compressed pickle."""
+        if isinstance(value, CompressedPickle):
+            return value # already encoded, see encode_pickled()
+        if self._is_saved_natively(value):
+            return value
+        raw_data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return self.encode_pickled(value, raw_data)
+
+    def encode_pickled(self, value: Any, raw_data: bytes) -> Any:
+        """Get the object to store for a value, that is already pickled.
+
+        Wrapping dictionaries that pickle values anyway (ChunkingDict)
+        use it to avoid pickling the same value again; the result
+        can then be passed to create_if_absent() as is.
+        """
+        if len(raw_data) < self.compression_threshold:
+            return value
+        return CompressedPickle(lz4.frame.compress(raw_data), len(raw_data))
+
+    def __setitem__(self, key: PersiDictKey, value: Any) -> None:
+        if not self.create_if_absent(key, value):
+            raise KeyError("Can't modify an immutable key-value pair")
+
+    def create_if_absent(self, key: PersiDictKey, value: Any) -> bool:
+        """Store a value unless the key is present, see create_if_absent()."""
+        if key in self._wrapped_dict:
+            return False
+        encoded = self._encode(value)
+        is_created = create_if_absent(self._wrapped_dict, key, encoded)
+        if is_created and isinstance(encoded, CompressedPickle):
+            self._count(encoded)
+        return is_created
+
+    def __delitem__(self, key: PersiDictKey) -> None:
+        raise KeyError("Can't delete an immutable key-value pair")
+
+    def __len__(self) -> int:
+        return len(self._wrapped_dict)
+
+    def _generic_iter(self, iter_type: str):
+        assert iter_type in {"keys", "values", "items"}
+        for key in self._wrapped_dict.keys():
+            if iter_type == "keys":
+                yield key
+            elif iter_type == "values":
+                yield self[key]
+            else:
+                yield (key, self[key])
+
+    def timestamp(self, key: PersiDictKey) -> float:
+        return self._wrapped_dict.timestamp(key)
+
+    def get_subdict(self, prefix_key: PersiDictKey) -> CompressingDict:
+        return CompressingDict(self._wrapped_dict.get_subdict(prefix_key)
+            , self.compression_threshold)
+
+    def __getattr__(self, name):
+        # Forward attribute access to the wrapped object
+        return getattr(self._wrapped_dict, name)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+from persidict import SafeStrTuple
+from persidict.persi_dict import PersiDictKey
+
+from pythagoras._820_strings_signatures_converters.random_signatures import (
+    get_random_signature)
+
+
+_SNAPSHOT_FILE = "snapshot.u64"
+_JOURNAL_SUFFIX = ".journal.u64"
+
+
+class ExistenceIndex:
+    """A compact in-memory index of keys present in an immutable dictionary.
+
+    Keys are represented by 64-bit fingerprints, kept in a sorted Numpy
+    array (plus a small set of recently added ones). Items of immutable
+    dictionaries are never deleted, so a key found in the index
+    is known to be present without a lookup in the dictionary.
+    A key missing from the index may still have been added
+    by another process, so misses must be confirmed by a lookup.
+
+    If journal_dir is given, keys of newly created items are appended
+    to a journal file of the current process, and all journals
+    (and the snapshot they are periodically compacted into)
+    are loaded when the index is created. Journals are a hint,
+    not a log: a lost or damaged entry only costs an extra lookup.
+    """
+
+    journal_dir: str | None
+    max_recent: int
+    max_journals: int
+
+    def __init__(self
+            , journal_dir: str | None = None
+            , max_recent: int = 2**16
+            , max_journals: int = 64):
+        assert max_recent >= 1
+        assert max_journals >= 1
+        self.journal_dir = journal_dir
+        self.max_recent = max_recent
+        self.max_journals = max_journals
+        self._sorted = np.zeros(0, dtype=np.uint64)
+        self._recent: set[int] = set()
+        self._journal = None
+        self._journal_pid = None
+        self._lock = threading.Lock()
+        if journal_dir is not None:
+            os.makedirs(journal_dir, exist_ok=True)
+            self.load()
+
+    @staticmethod
+    def _fingerprint(key: PersiDictKey) -> int:
+        key = SafeStrTuple(key)
+        hasher = hashlib.blake2b(digest_size=8)
+        hasher.update("/".join(key.str_chain).encode())
+        return int.from_bytes(hasher.digest(), "little")
+
+    def __contains__(self, key: PersiDictKey) -> bool:
+        fingerprint = self._fingerprint(key)
+        if fingerprint in self._recent:
+            return True
+        sorted_keys = self._sorted
+        position = np.searchsorted(sorted_keys, np.uint64(fingerprint))
+        return (position < len(sorted_keys)
+            and int(sorted_keys[position]) == fingerprint)
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent)
+
+    def _merge(self, fingerprints: np.ndarray) -> None:
+        self._sorted = np.union1d(self._sorted, fingerprints)
+
+    def add(self, key: PersiDictKey, persist: bool = False) -> None:
+        """Add a key to the index.
+
+        If persist is True (the key's item has just been created
+        by this process), the key is also appended to the journal.
+        """
+        fingerprint = self._fingerprint(key)
+        with self._lock:
+            self._recent.add(fingerprint)
+            if len(self._recent) >= self.max_recent:
+                self._merge(np.fromiter(self._recent, dtype=np.uint64))
+                self._recent.clear()
+            if persist and self.journal_dir is not None:
+                self._append_to_journal(fingerprint)
+
+    def _append_to_journal(self, fingerprint: int) -> None:
+        """Persist a fingerprint; it's best-effort, I/O errors are ignored."""
+        try:
+            if self._journal_pid != os.getpid():
+                # Forked processes must not share journals
+                file_name = os.path.join(self.journal_dir
+                    , get_random_signature() + _JOURNAL_SUFFIX)
+                self._journal = open(file_name, "ab", buffering=0)
+                self._journal_pid = os.getpid()
+            self._journal.write(fingerprint.to_bytes(8, "little"))
+        except OSError:
+            pass # the key will be added to the index again when it's seen
+
+    def _list_journals(self) -> list[str]:
+        return [os.path.join(self.journal_dir, name)
+            for name in os.listdir(self.journal_dir)
+            if name.endswith(_JOURNAL_SUFFIX)]
+
+    @staticmethod
+    def _read_fingerprints(file_name: str) -> np.ndarray:
+        try:
+            with open(file_name, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return np.zeros(0, dtype=np.uint64)
+        # An incomplete last entry is ignored
+        data = data[:len(data) - len(data) % 8]
+        return np.frombuffer(data, dtype="<u8").astype(np.uint64)
+
+    def load(self) -> None:
+        """Load the snapshot and all journals from journal_dir."""
+        assert self.journal_dir is not None
+        journals = self._list_journals()
+        all_fingerprints = [self._read_fingerprints(
+            os.path.join(self.journal_dir, _SNAPSHOT_FILE))]
+        for file_name in journals:
+            all_fingerprints.append(self._read_fingerprints(file_name))
+        with self._lock:
+            self._merge(np.concatenate(all_fingerprints))
+        if len(journals) > self.max_journals:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge all journals (except the current one) into the snapshot.
+
+        Entries that other processes append to a journal while
+        it's being merged may be lost, which is harmless.
+        """
+        assert self.journal_dir is not None
+        own_journal = None if self._journal is None else self._journal.name
+        journals = [f for f in self._list_journals() if f != own_journal]
+        snapshot_name = os.path.join(self.journal_dir, _SNAPSHOT_FILE)
+        all_fingerprints = [self._read_fingerprints(snapshot_name)]
+        for file_name in journals:
+            all_fingerprints.append(self._read_fingerprints(file_name))
+        merged = np.unique(np.concatenate(all_fingerprints))
+        fd, tmp_name = tempfile.mkstemp(dir=self.journal_dir
+            , prefix=".tmp_", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(merged.astype("<u8").tobytes())
+        os.replace(tmp_name, snapshot_name)
+        for file_name in journals:
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._merge(merged)
@@ -0,0 +1,55 @@
+"""Access to the files of FileDirDict, beyond its public API.
+
+Pythagoras sometimes works with the files of a FileDirDict directly,
+e.g. to create them atomically. persidict doesn't expose file names
+and file writing publicly, so this module is the only place that
+calls the private methods of FileDirDict. They are checked once,
+when the module is imported: an incompatible version of persidict
+fails early, instead of breaking writes at some later point.
+"""
+
+from __future__ import annotations
+
+import inspect
+from importlib.metadata import version, PackageNotFoundError
+from typing import Any
+
+from persidict import FileDirDict, SafeStrTuple
+from persidict.persi_dict import PersiDictKey
+
+
+_REQUIRED_METHODS = dict(
+    _build_full_path = ["key", "create_subdirs"]
+    , _save_to_file = ["file_name", "value"])
+
+
+def _check_file_dir_dict_api() -> None:
+    """Check that the installed persidict has the methods we use."""
+    try:
+        persidict_version = version("persidict")
+    except PackageNotFoundError:
+        persidict_version = "(unknown version)"
+    for method_name, arg_names in _REQUIRED_METHODS.items():
+        method = getattr(FileDirDict, method_name, None)
+        if method is None or not set(arg_names) <= set(
+                inspect.signature(method).parameters):
+            raise ImportError(f"persidict {persidict_version}"
+                + f" is not supported: FileDirDict.{method_name}()"
+                + f" is missing or has an unexpected signature.")
+
+
+_check_file_dir_dict_api()
+
+
+def get_file_name(a_dict: FileDirDict, key: PersiDictKey
+        , create_subdirs: bool = False) -> str:
+    """Get the name of the file, a key is stored in."""
+    assert isinstance(a_dict, FileDirDict)
+    return a_dict._build_full_path(
+        SafeStrTuple(key), create_subdirs=create_subdirs)
+
+
+def save_to_file(a_dict: FileDirDict, file_name: str, value: Any) -> None:
+    """Save a value into a file, the way a_dict saves its values."""
+    assert isinstance(a_dict, FileDirDict)
+    a_dict._save_to_file(file_name, value)
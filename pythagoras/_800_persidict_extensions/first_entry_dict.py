@@ -1,4 +1,5 @@
-import time
+import sys
+from typing import Any, Callable
 
 from deepdiff import DeepDiff
 from persidict import PersiDict
@@ -6,18 +7,133 @@ import random
 
 from persidict.persi_dict import PersiDictKey
 
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent)
+from pythagoras._800_persidict_extensions.existence_index import (
+    ExistenceIndex)
+from pythagoras._820_strings_signatures_converters.hash_signatures import (
+    get_base16_typed_hash_signature)
+
+
+Comparator = Callable[[PersiDictKey, Any, Any], bool]
+
+
+def compare_by_hashes(key: PersiDictKey
+        , stored_value: Any, new_value: Any) -> bool:
+    """Compare two values by their (typed) hash signatures.
+
+    Works for values of any type; large arrays and DataFrames
+    are hashed without pickling them.
+    """
+    return (get_base16_typed_hash_signature(stored_value)
+        == get_base16_typed_hash_signature(new_value))
+
+
+def _with_contiguous_layout(x: Any) -> Any:
+    """Get a contiguous copy of an array or a tensor (other values as is)."""
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(x, np.ndarray):
+        return np.ascontiguousarray(x)
+    torch = sys.modules.get("torch")
+    if torch is not None and isinstance(x, torch.Tensor):
+        return x.contiguous()
+    return x
+
+
+def get_content_checksum(value: Any) -> str:
+    """Get a hash signature of a value's contents, regardless of its layout.
+
+    Unlike typed hashes, it's the same for a value and its copy,
+    saved and loaded back: arrays and tensors are hashed
+    as contiguous copies, Pandas objects column by column,
+    along with their names, dtypes and indexes.
+    """
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, pd.Series):
+        return get_base16_typed_hash_signature((type(value).__name__
+            , value.name, str(value.dtype)
+            , get_content_checksum(value.index.to_numpy())
+            , get_content_checksum(value.to_numpy())))
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return get_base16_typed_hash_signature((type(value).__name__
+            , get_content_checksum(value.columns.to_numpy())
+            , [str(dtype) for dtype in value.dtypes]
+            , get_content_checksum(value.index.to_numpy())
+            , [get_content_checksum(value.iloc[:, i].to_numpy())
+                for i in range(value.shape[1])]))
+    return get_base16_typed_hash_signature(_with_contiguous_layout(value))
+
+
+def compare_by_contents(key: PersiDictKey
+        , stored_value: Any, new_value: Any) -> bool:
+    """Compare two values by their contents, regardless of memory layouts.
+
+    Typed hashes include layouts (e.g. strides), so equal arrays,
+    one of which was saved and loaded back, can have different hashes.
+    Here arrays and tensors are hashed as contiguous copies,
+    and Pandas objects are compared by equals().
+    """
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(stored_value, (pd.DataFrame, pd.Series)):
+        return (type(stored_value) is type(new_value)
+            and stored_value.equals(new_value))
+    return compare_by_hashes(key
+        , _with_contiguous_layout(stored_value)
+        , _with_contiguous_layout(new_value))
+
+
+def compare_addresses(key: PersiDictKey
+        , stored_value: Any, new_value: Any) -> bool:
+    """Compare two values that are addresses (e.g. ValueAddr-s).
+
+    Addresses are compared as strings, without retrieving the values
+    they point to. Other values are compared by their hashes.
+    """
+    result = (stored_value == new_value)
+    if isinstance(result, bool):
+        return result
+    return compare_by_hashes(key, stored_value, new_value)
+
 
 class FirstEntryDict(PersiDict):
     """ A dictionary that always keeps the first value assigned to a key.
+
+    With probability p_consistency_checks, an attempt to assign
+    a value to an existing key is checked against the stored value.
+    The check is done by a comparator, a fast function chosen
+    by the dictionary's role (compare_by_hashes() by default,
+    compare_addresses() for dictionaries of addresses).
+    A mismatch is double-checked by compare_by_contents(), which
+    doesn't depend on memory layouts of the values (unlike the typed
+    hashes). A confirmed mismatch raises an AssertionError;
+    only then the values are compared by DeepDiff, to explain
+    the difference.
+
+    An optional existence_index keeps keys known to be present,
+    which saves lookups in the wrapped dictionary
+    and repeated writes of the same values.
+
+    An optional content_checksums dictionary gets a checksum
+    (see get_content_checksum()) of every new value, for which
+    needs_checksum() returns True, so that the stored values
+    can later be verified independently of their memory layouts.
     """
     _wrapped_dict: PersiDict
     _p_consistency_checks: float | None
+    _comparator: Comparator
     _total_checks_count: int
     _successful_checks_count: int
+    existence_index: ExistenceIndex | None
+    content_checksums: PersiDict | None
+    _needs_checksum: Callable[[Any], bool]
 
     def __init__(self
                  , wrapped_dict:PersiDict
-                 , p_consistency_checks: float | None=None):
+                 , p_consistency_checks: float | None=None
+                 , comparator: Comparator | None = None
+                 , existence_index: ExistenceIndex | None = None
+                 , content_checksums: PersiDict | None = None
+                 , needs_checksum: Callable[[Any], bool] | None = None):
         assert isinstance(wrapped_dict, PersiDict)
         assert wrapped_dict.immutable_items == True
         assert p_consistency_checks is None or (0 <= p_consistency_checks <= 1)
@@ -27,6 +143,14 @@ class FirstEntryDict(PersiDict):
             ,digest_len=wrapped_dict.digest_len)
         self._wrapped_dict = wrapped_dict
         self._p_consistency_checks = p_consistency_checks
+        if comparator is None:
+            comparator = compare_by_hashes
+        self._comparator = comparator
+        self.existence_index = existence_index
+        self.content_checksums = content_checksums
+        if needs_checksum is None:
+            needs_checksum = lambda value: True
+        self._needs_checksum = needs_checksum
         self._successful_checks_count = 0
         self._total_checks_count = 0
 
@@ -35,45 +159,100 @@ class FirstEntryDict(PersiDict):
 
         If the key is already set, it checks the value
         against the value that was first set.
+        The check and the write are done by create_if_absent(),
+        atomically for file-based dictionaries,
+        so concurrent writers never have to wait or retry.
+        Keys found in the existence index are not written again
+        (the value is not even serialized), as long as a lookup
+        in the wrapped dictionary confirms that they are present:
+        the index may be out of sync with the stored files
+        (e.g. if they were deleted or replaced).
         """
-        check_needed = False
-
-        try: # extra protections to better handle concurrent writes
-            if key in self._wrapped_dict:
-                check_needed = True
-            else:
-                self._wrapped_dict[key] = value
-        except:
-            time.sleep(random.random()/random.randint(1,5))
-            if key in self._wrapped_dict:
-                check_needed = True
-            else:
-                self._wrapped_dict[key] = value
-
-        assert key in self._wrapped_dict
-
-        if (check_needed
-            and self._p_consistency_checks is not None
+        index = self.existence_index
+        if (index is None or key not in index
+                or key not in self._wrapped_dict):
+            is_created = create_if_absent(self._wrapped_dict, key, value)
+            if index is not None:
+                index.add(key, persist=is_created)
+            if is_created:
+                self._store_checksum(key, value)
+                return
+        self._check_consistency(key, value)
+
+    def _check_consistency(self, key, value) -> None:
+        """With probability p_consistency_checks, compare a value
+        with the value, already stored under the key."""
+        if (self._p_consistency_checks is not None
             and self._p_consistency_checks > 0):
             if random.random() < self._p_consistency_checks:
-                diff_dict = DeepDiff(self._wrapped_dict[key], value)
-                # We are using DeepDiff here to compare the values
-                # because the values can be complex objects,
-                # e.g. Pandas DataFrames
+                stored_value = self._wrapped_dict[key]
                 self._total_checks_count += 1
-                assert len(diff_dict) == 0, (
-                    f"FirstEntryDict: key {key} is already set "
-                    + f"to {self._wrapped_dict[key]} "
-                    + f"and the new value is {value} is different, "
-                    + f"which is not allowed. Details here: {diff_dict} "
-                    )
+                is_consistent = self._comparator(key, stored_value, value)
+                if (not is_consistent
+                        and self._comparator is not compare_by_contents):
+                    # Equal values may be stored in different forms
+                    # (e.g. arrays with different memory layouts)
+                    is_consistent = compare_by_contents(
+                        key, stored_value, value)
+                if not is_consistent:
+                    # DeepDiff is slow, it's only used to explain
+                    # the difference in the error message
+                    diff_dict = DeepDiff(stored_value, value)
+                    assert is_consistent, (
+                        f"FirstEntryDict: key {key} is already set "
+                        + f"to {stored_value} "
+                        + f"and the new value is {value} is different, "
+                        + f"which is not allowed. Details here: {diff_dict} "
+                        )
                 self._successful_checks_count += 1
 
+    def _store_checksum(self, key, value) -> None:
+        """Save the content checksum of a newly stored value, if needed."""
+        if (self.content_checksums is not None
+                and self._needs_checksum(value)):
+            create_if_absent(self.content_checksums
+                , key, get_content_checksum(value))
+
+    def is_stored(self, key) -> bool:
+        """Check if a key is present in the wrapped dictionary.
+
+        Unlike the in operator, it doesn't rely on the existence index,
+        so it detects keys whose files were deleted.
+        """
+        return key in self._wrapped_dict
+
+    def _note_present(self, key, is_created: bool = False) -> None:
+        """Add a key, known to be present, to the index."""
+        if self.existence_index is not None:
+            self.existence_index.add(key, persist=is_created)
+
+    def _note_stored(self, key, value, is_created: bool) -> None:
+        """Account for a value, written bypassing __setitem__().
+
+        Such values (e.g. pickled directly into files) get the same
+        treatment as values assigned to the dictionary: the key is added
+        to the index, and if the key already existed (is_created
+        is False), the value may be checked against the stored one.
+        """
+        self._note_present(key, is_created)
+        if is_created:
+            self._store_checksum(key, value)
+        else:
+            self._check_consistency(key, value)
+
     def __contains__(self, item):
-        return item in self._wrapped_dict
+        index = self.existence_index
+        if index is not None and item in index:
+            return True
+        result = item in self._wrapped_dict
+        if result:
+            self._note_present(item)
+        return result
 
     def __getitem__(self, key):
-        return self._wrapped_dict[key]
+        value = self._wrapped_dict[key]
+        self._note_present(key)
+        return value
 
     def __len__(self):
         return len(self._wrapped_dict)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Any
+
+from persidict import PersiDict, FileDirDict, SafeStrTuple
+from persidict.persi_dict import PersiDictKey
+
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent, publish_file_if_absent)
+from pythagoras._800_persidict_extensions.file_dir_dict_adapter import (
+    get_file_name)
+from pythagoras._800_persidict_extensions.value_serializers import (
+    ValueSerializer, VALUE_SERIALIZERS, STORAGE_FORMATS, get_value_serializers)
+
+
+class SerializingDict(PersiDict):
+    """An immutable file-based dictionary that saves values in type-specific formats.
+
+    Values are saved by the first serializer from the storage format's
+    list that accepts them (e.g. Numpy arrays go to .npy files,
+    which are loaded memory-mapped); all other values are pickled
+    by the wrapped FileDirDict, exactly as they would be without
+    the wrapper. Values saved by any registered serializer can be read,
+    regardless of the storage format.
+    Files of all formats share the same directory, each format is
+    represented by a FileDirDict with its own file_type.
+    Serializers are looked up in the registry on every use, so
+    serializers registered later are picked up by existing dictionaries.
+    """
+
+    pickle_dict: FileDirDict
+    storage_format: str
+    _format_dicts: dict[str, FileDirDict]
+
+    def __init__(self
+            , pickle_dict: FileDirDict
+            , storage_format: str = "mmap"):
+        assert isinstance(pickle_dict, FileDirDict)
+        assert pickle_dict.file_type == "pkl"
+        assert pickle_dict.immutable_items == True
+        assert storage_format in STORAGE_FORMATS
+        super().__init__(
+            base_class_for_values=pickle_dict.base_class_for_values
+            , immutable_items=True
+            , digest_len=pickle_dict.digest_len)
+        self.pickle_dict = pickle_dict
+        self.storage_format = storage_format
+        self._format_dicts = dict()
+
+    @property
+    def _serializers(self) -> list[ValueSerializer]:
+        """Serializers, used to save values (in order of preference)."""
+        return get_value_serializers(STORAGE_FORMATS[self.storage_format])
+
+    @property
+    def _readers(self) -> list[ValueSerializer]:
+        """Serializers, used to read values: all registered ones."""
+        return list(VALUE_SERIALIZERS)
+
+    def _format_dict(self, file_type: str) -> FileDirDict:
+        """Get a dictionary for the files of a given type."""
+        format_dict = self._format_dicts.get(file_type)
+        if format_dict is None:
+            params = self.pickle_dict.get_params()
+            params.update(file_type=file_type, base_class_for_values=str)
+            format_dict = FileDirDict(**params)
+            self._format_dicts[file_type] = format_dict
+        return format_dict
+
+    def _all_format_dicts(self) -> list[FileDirDict]:
+        return [self._format_dict(s.file_type) for s in self._readers]
+
+    @property
+    def base_dir(self) -> str:
+        return self.pickle_dict.base_dir
+
+    def serializer_for(self, value: Any) -> ValueSerializer | None:
+        """Get the serializer for a value, None means it will be pickled."""
+        for serializer in self._serializers:
+            if serializer.can_save(value):
+                return serializer
+        return None
+
+    def _find_file(self, key: PersiDictKey) -> tuple[ValueSerializer, str]:
+        for serializer in self._readers:
+            format_dict = self._format_dict(serializer.file_type)
+            file_name = get_file_name(format_dict, key)
+            if os.path.isfile(file_name):
+                return serializer, file_name
+        return None, None
+
+    def __contains__(self, key: PersiDictKey) -> bool:
+        key = SafeStrTuple(key)
+        if key in self.pickle_dict:
+            return True
+        return self._find_file(key)[0] is not None
+
+    def __getitem__(self, key: PersiDictKey) -> Any:
+        key = SafeStrTuple(key)
+        try:
+            # Most values are pickled, so the pickle is tried first
+            return self.pickle_dict[key]
+        except KeyError:
+            pass
+        serializer, file_name = self._find_file(key)
+        if serializer is None:
+            raise KeyError(f"Key {key} not found")
+        return serializer.load(file_name)
+
+    def __setitem__(self, key: PersiDictKey, value: Any) -> None:
+        if not self.create_if_absent(key, value):
+            raise KeyError("Can't modify an immutable key-value pair")
+
+    def create_if_absent(self, key: PersiDictKey, value: Any) -> bool:
+        """Store a value unless the key is present, see create_if_absent()."""
+        key = SafeStrTuple(key)
+        serializer = self.serializer_for(value)
+        if serializer is None:
+            if self._find_file(key)[0] is not None:
+                return False
+            return create_if_absent(self.pickle_dict, key, value)
+        if key in self:
+            return False
+        format_dict = self._format_dict(serializer.file_type)
+        file_name = get_file_name(format_dict, key, create_subdirs=True)
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(file_name)
+            , prefix=".tmp_", suffix=".tmp")
+        os.close(fd)
+        try:
+            serializer.save(value, tmp_name)
+        except:
+            # The value can't be saved in the serializer's format
+            os.remove(tmp_name)
+            return create_if_absent(self.pickle_dict, key, value)
+        return publish_file_if_absent(tmp_name, file_name)
+
+    def __delitem__(self, key: PersiDictKey) -> None:
+        raise KeyError("Can't delete an immutable key-value pair")
+
+    def __len__(self) -> int:
+        return len(self.pickle_dict) + sum(
+            len(d) for d in self._all_format_dicts())
+
+    def _generic_iter(self, iter_type: str):
+        assert iter_type in {"keys", "values", "items"}
+        for d in [self.pickle_dict, *self._all_format_dicts()]:
+            for key in d.keys():
+                if iter_type == "keys":
+                    yield key
+                elif iter_type == "values":
+                    yield self[key]
+                else:
+                    yield (key, self[key])
+
+    def timestamp(self, key: PersiDictKey) -> float:
+        key = SafeStrTuple(key)
+        serializer, file_name = self._find_file(key)
+        if serializer is not None:
+            return os.path.getmtime(file_name)
+        return self.pickle_dict.timestamp(key)
+
+    def get_subdict(self, prefix_key: PersiDictKey) -> SerializingDict:
+        return SerializingDict(
+            self.pickle_dict.get_subdict(prefix_key), self.storage_format)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import Any
+
+from persidict import PersiDict, SafeStrTuple
+from persidict.persi_dict import PersiDictKey
+
+from pythagoras._800_persidict_extensions.atomic_operations import (
+    create_if_absent)
+from pythagoras._820_strings_signatures_converters.base_16_32_convertors import (
+    base32_alphabet)
+
+
+SHARD_WIDTH: int = 2 # 32**2 = 1024 subdirectories per level
+
+
+def get_shard_names(signature: str, fanout_depth: int) -> list[str]:
+    """Get names of nested subdirectories for a hash signature.
+
+    Names are taken from the end of the signature: its beginning
+    is a human-readable descriptor, and leading digits of base32
+    hashes (which are not zero-padded) are not uniformly distributed.
+    """
+    padded = signature.rjust(SHARD_WIDTH * fanout_depth, "_")
+    names = []
+    for level in range(fanout_depth):
+        end = len(padded) - SHARD_WIDTH * level
+        names.append(padded[end - SHARD_WIDTH:end])
+    return names
+
+
+def is_shard_name(name: str) -> bool:
+    """Check if a name can be a shard name, see get_shard_names()."""
+    return (len(name) == SHARD_WIDTH
+        and all(c in base32_alphabet or c == "_" for c in name))
+
+
+def shard_key(key: PersiDictKey, fanout_depth: int) -> SafeStrTuple:
+    """Insert shard names before the last (hash) component of a key."""
+    str_chain = SafeStrTuple(key).str_chain
+    shards = get_shard_names(str_chain[-1], fanout_depth)
+    return SafeStrTuple(*str_chain[:-1], *shards, str_chain[-1])
+
+
+def unshard_key(key: PersiDictKey, fanout_depth: int) -> SafeStrTuple:
+    """Remove shard names from a key, the opposite of shard_key()."""
+    str_chain = SafeStrTuple(key).str_chain
+    if fanout_depth == 0:
+        return SafeStrTuple(*str_chain)
+    return SafeStrTuple(*str_chain[:-fanout_depth - 1], str_chain[-1])
+
+
+def is_sharded_key(key: PersiDictKey, fanout_depth: int) -> bool:
+    """Check if a key has the shard names of its hash, see shard_key()."""
+    str_chain = SafeStrTuple(key).str_chain
+    if len(str_chain) <= fanout_depth:
+        return False
+    shards = list(str_chain[-fanout_depth - 1:-1])
+    return (all(is_shard_name(name) for name in shards)
+        and shards == get_shard_names(str_chain[-1], fanout_depth))
+
+
+class ShardedDict(PersiDict):
+    """A dictionary that fans its keys out into nested subdirectories.
+
+    Keys of content-addressed stores end with hash signatures,
+    a type prefix can have millions of them. The wrapped
+    (file-based) dictionary gets keys with fanout_depth extra
+    components, derived from the hash (see shard_key()), so that
+    no folder holds more than a few thousand entries.
+    Keys of this dictionary stay the same as without sharding.
+    """
+
+    _wrapped_dict: PersiDict
+    fanout_depth: int
+
+    def __init__(self, wrapped_dict: PersiDict, fanout_depth: int = 2):
+        assert isinstance(wrapped_dict, PersiDict)
+        assert fanout_depth >= 1
+        super().__init__(
+            base_class_for_values=wrapped_dict.base_class_for_values
+            , immutable_items=wrapped_dict.immutable_items
+            , digest_len=wrapped_dict.digest_len)
+        self._wrapped_dict = wrapped_dict
+        self.fanout_depth = fanout_depth
+
+    def shard_key(self, key: PersiDictKey) -> SafeStrTuple:
+        """Get the key, an item is stored under in the wrapped dictionary."""
+        return shard_key(key, self.fanout_depth)
+
+    def __contains__(self, key: PersiDictKey) -> bool:
+        return self.shard_key(key) in self._wrapped_dict
+
+    def __getitem__(self, key: PersiDictKey) -> Any:
+        return self._wrapped_dict[self.shard_key(key)]
+
+    def __setitem__(self, key: PersiDictKey, value: Any) -> None:
+        self._wrapped_dict[self.shard_key(key)] = value
+
+    def create_if_absent(self, key: PersiDictKey, value: Any) -> bool:
+        """Store a value unless the key is present, see create_if_absent()."""
+        return create_if_absent(
+            self._wrapped_dict, self.shard_key(key), value)
+
+    def __delitem__(self, key: PersiDictKey) -> None:
+        del self._wrapped_dict[self.shard_key(key)]
+
+    def __len__(self) -> int:
+        return len(self._wrapped_dict)
+
+    def _generic_iter(self, iter_type: str):
+        assert iter_type in {"keys", "values", "items"}
+        for key in self._wrapped_dict.keys():
+            if not is_sharded_key(key, self.fanout_depth):
+                continue # e.g. a key, stored before sharding
+            if iter_type == "keys":
+                yield unshard_key(key, self.fanout_depth)
+            elif iter_type == "values":
+                yield self._wrapped_dict[key]
+            else:
+                yield (unshard_key(key, self.fanout_depth)
+                    , self._wrapped_dict[key])
+
+    def timestamp(self, key: PersiDictKey) -> float:
+        return self._wrapped_dict.timestamp(self.shard_key(key))
+
+    def get_subdict(self, prefix_key: PersiDictKey) -> ShardedDict:
+        return ShardedDict(self._wrapped_dict.get_subdict(prefix_key)
+            , self.fanout_depth)
+
+    def __getattr__(self, name):
+        # Forward attribute access to the wrapped object
+        return getattr(self._wrapped_dict, name)
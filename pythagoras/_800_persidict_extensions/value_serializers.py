@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import io
+import os
+import pickle
+import struct
+import sys
+from abc import ABC, abstractmethod
+from typing import Any
+
+
+class ValueSerializer(ABC):
+    """A way to save values of some types to files (and load them back).
+
+    Serializers are used by SerializingDict: a value is saved by the
+    first serializer that accepts it, values that are not accepted
+    by any serializer are pickled. Each serializer has its own
+    file_type (file extension), which tells how to load a file.
+    """
+
+    file_type: str
+
+    @abstractmethod
+    def can_save(self, value: Any) -> bool:
+        """Check if the serializer supports the value."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, value: Any, file_name: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def load(self, file_name: str) -> Any:
+        raise NotImplementedError
+
+
+def _is_plain_array(x: Any) -> bool:
+    """Check if x is a non-empty Numpy array of a fixed-size dtype."""
+    if "numpy" not in sys.modules:
+        return False
+    np = sys.modules["numpy"]
+    return (type(x) in (np.ndarray, np.memmap)
+        and not x.dtype.hasobject and x.size > 0)
+
+
+class NumpySerializer(ValueSerializer):
+    """Saves Numpy arrays as .npy files, loads them memory-mapped.
+
+    Loaded arrays are read-only ndarray views of memory-mapped files:
+    the data is not copied into the process memory, so processes
+    on the same node that load the same array share the OS page cache.
+    """
+
+    file_type = "npy"
+
+    def can_save(self, value: Any) -> bool:
+        return _is_plain_array(value)
+
+    def save(self, value: Any, file_name: str) -> None:
+        import numpy as np
+        with open(file_name, "wb") as f:
+            np.save(f, value, allow_pickle=False)
+
+    def load(self, file_name: str) -> Any:
+        import numpy as np
+        result = np.load(file_name, mmap_mode="r", allow_pickle=False)
+        return result.view(np.ndarray)
+
+
+_COLUMNS_MAGIC = b"PTHCOLS1"
+_COLUMNS_ALIGNMENT = 64
+
+
+def _mappable_columns(df: Any) -> list:
+    """Names of DataFrame columns with fixed-size Numpy dtypes."""
+    np = sys.modules["numpy"]
+    return [name for name, column in df.items()
+        if isinstance(column.dtype, np.dtype)
+        and not column.dtype.hasobject]
+
+
+class _ArraysExternalizingPickler(pickle.Pickler):
+    """Pickles an object, writing its Numpy arrays into a separate file.
+
+    Buffers of contiguous arrays with fixed-size dtypes are written
+    to the data file (aligned), the pickle only gets their locations.
+    """
+
+    def __init__(self, file, data_file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.data_file = data_file
+
+    def persistent_id(self, obj):
+        np = sys.modules["numpy"]
+        if type(obj) is not np.ndarray or obj.dtype.hasobject:
+            return None
+        if obj.flags.c_contiguous:
+            data, order = obj, "C"
+        elif obj.flags.f_contiguous:
+            data, order = obj.T, "F"
+        else:
+            return None
+        offset = self.data_file.tell()
+        padding = -offset % _COLUMNS_ALIGNMENT
+        self.data_file.write(b"\0" * padding)
+        offset += padding
+        self.data_file.write(memoryview(data.reshape(-1).view(np.uint8)))
+        return ("ndarray", data.dtype, data.shape, order, offset)
+
+
+class _ArraysMappingUnpickler(pickle.Unpickler):
+    """Loads a pickle, written by _ArraysExternalizingPickler.
+
+    Arrays are read-only ndarray views of memory-mapped buffers.
+    """
+
+    def __init__(self, file, data_file_name: str):
+        super().__init__(file)
+        self.data_file_name = data_file_name
+
+    def persistent_load(self, pid):
+        import numpy as np
+        kind, dtype, shape, order, offset = pid
+        assert kind == "ndarray"
+        if int(np.prod(shape)) == 0:
+            result = np.zeros(shape, dtype=dtype)
+            result.flags.writeable = False
+        else:
+            result = np.memmap(self.data_file_name, dtype=dtype
+                , mode="r", offset=offset, shape=shape).view(np.ndarray)
+        return result.T if order == "F" else result
+
+
+class DataFrameColumnsSerializer(ValueSerializer):
+    """Saves DataFrames so that their numeric columns can be memory-mapped.
+
+    A frame is pickled, but buffers of its arrays with fixed-size Numpy
+    dtypes (numeric blocks, index values) are written one after another
+    (aligned to 64 bytes) instead of being embedded into the pickle,
+    which is put at the end of the file. Loaded frames have exactly
+    the same structure (blocks, index, metadata) as the saved ones,
+    hence the same hash signatures, and they are built on top of
+    read-only memory-mapped arrays.
+    """
+
+    file_type = "pdcols"
+
+    def can_save(self, value: Any) -> bool:
+        if "pandas" not in sys.modules:
+            return False
+        pd = sys.modules["pandas"]
+        if type(value) is not pd.DataFrame or len(value) == 0:
+            return False
+        return len(_mappable_columns(value)) > 0
+
+    def save(self, value: Any, file_name: str) -> None:
+        header = io.BytesIO()
+        with open(file_name, "wb") as f:
+            f.write(_COLUMNS_MAGIC)
+            _ArraysExternalizingPickler(header, f).dump(value)
+            header_offset = f.tell()
+            f.write(header.getbuffer())
+            f.write(struct.pack("<Q", header_offset))
+
+    def load(self, file_name: str) -> Any:
+        with open(file_name, "rb") as f:
+            assert f.read(len(_COLUMNS_MAGIC)) == _COLUMNS_MAGIC
+            f.seek(-8, os.SEEK_END)
+            header_offset, = struct.unpack("<Q", f.read(8))
+            f.seek(header_offset)
+            return _ArraysMappingUnpickler(f, file_name).load()
+
+
+def _is_plain_str_column(column: Any) -> bool:
+    pd = sys.modules["pandas"]
+    if isinstance(column.dtype, pd.StringDtype):
+        return True
+    return (column.dtype == object
+        and all(type(v) is str for v in column.to_numpy()))
+
+
+class ParquetSerializer(ValueSerializer):
+    """Saves DataFrames in the Parquet format (requires pyarrow).
+
+    Only frames that survive a round trip through Parquet unchanged
+    are accepted: string column labels, columns with fixed-size Numpy
+    dtypes or with strings only, and a default or numeric index.
+    """
+
+    file_type = "parquet"
+
+    def can_save(self, value: Any) -> bool:
+        if "pandas" not in sys.modules:
+            return False
+        pd = sys.modules["pandas"]
+        if type(value) is not pd.DataFrame or len(value) == 0:
+            return False
+        if type(value.columns) is not pd.Index or not value.columns.is_unique:
+            return False
+        if not all(type(c) is str for c in value.columns):
+            return False
+        if type(value.index) is not pd.RangeIndex and not (
+                type(value.index) is pd.Index
+                and value.index.dtype.kind in "iuf"):
+            return False
+        mappable = set(_mappable_columns(value))
+        if not all(name in mappable or _is_plain_str_column(column)
+                for name, column in value.items()):
+            return False
+        try:
+            import pyarrow
+        except:
+            return False
+        return True
+
+    def save(self, value: Any, file_name: str) -> None:
+        value.to_parquet(file_name, engine="pyarrow")
+
+    def load(self, file_name: str) -> Any:
+        import pandas as pd
+        return pd.read_parquet(file_name, engine="pyarrow")
+
+
+class TorchSerializer(ValueSerializer):
+    """Saves CPU Torch tensors in Torch's native format.
+
+    Tensors are loaded memory-mapped (when Torch supports it).
+    """
+
+    file_type = "pt"
+
+    def can_save(self, value: Any) -> bool:
+        if "torch" not in sys.modules:
+            return False
+        torch = sys.modules["torch"]
+        return (type(value) is torch.Tensor and value.device.type == "cpu"
+            and not value.requires_grad and value.numel() > 0)
+
+    def save(self, value: Any, file_name: str) -> None:
+        import torch
+        value = value.contiguous()
+        n_bytes = value.numel() * value.element_size()
+        if value.untyped_storage().nbytes() > n_bytes:
+            # torch.save() writes the whole storage, not just the slice
+            value = value.clone()
+        torch.save(value, file_name)
+
+    def load(self, file_name: str) -> Any:
+        import torch
+        try:
+            return torch.load(file_name, mmap=True, weights_only=True)
+        except TypeError: # old versions of Torch
+            return torch.load(file_name)
+
+
+VALUE_SERIALIZERS: list[ValueSerializer] = [
+    NumpySerializer()
+    , DataFrameColumnsSerializer()
+    , ParquetSerializer()
+    , TorchSerializer()]
+
+STORAGE_FORMATS: dict[str, list[str]] = dict(
+    mmap = ["npy", "pdcols", "pt"]
+    , columnar = ["npy", "parquet", "pt"]
+    , pickle = [])
+"""Which serializers (file types) are used to save values.
+
+"pickle" (the default for portals) pickles everything;
+"mmap" favours fast, zero-copy (read-only) loading;
+"columnar" saves DataFrames in a compact, portable format.
+Values are always readable regardless of the storage format
+used to save them.
+"""
+
+
+def register_value_serializer(serializer: ValueSerializer
+        , storage_formats: list[str] | None = None) -> None:
+    """Add a serializer to the registry.
+
+    The serializer becomes available for reading immediately,
+    including in already existing SerializingDict-s.
+    For saving, it's used by the listed storage formats
+    (before their other serializers).
+    """
+    assert isinstance(serializer, ValueSerializer)
+    assert serializer.file_type not in [
+        s.file_type for s in VALUE_SERIALIZERS] + ["pkl"]
+    VALUE_SERIALIZERS.append(serializer)
+    for storage_format in storage_formats or []:
+        STORAGE_FORMATS[storage_format].insert(0, serializer.file_type)
+
+
+def get_value_serializers(file_types: list[str]) -> list[ValueSerializer]:
+    by_file_type = {s.file_type: s for s in VALUE_SERIALIZERS}
+    return [by_file_type[file_type] for file_type in file_types]
@@ -1,5 +1,9 @@
+import hashlib
+import os
 import sys
-from typing import Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple
 
 import joblib.hashing
 
@@ -10,20 +14,300 @@ from pythagoras._820_strings_signatures_converters.base_16_32_convertors import
 hash_type: str = "sha256"
 max_signature_length: int = 22
 
-def get_base16_hash_signature(x:Any) -> str:
+HASHING_ENGINES = ("joblib", "typed")
+
+PARALLEL_HASHING_CHUNK_SIZE: int = 2**24 # 16 MB
+
+_hashing_pool: tuple[int, ThreadPoolExecutor] | None = None
+_hashing_pool_lock = threading.Lock()
+
+HASH_ALGORITHMS: dict[str, Callable[[], Any]] = dict()
+
+
+def register_hash_algorithm(name: str, factory: Callable[[], Any]) -> None:
+    """Add a hash algorithm to the registry.
+
+    factory() must return a new hashlib-compatible hasher object.
+    Hash signatures of all values stored in a portal depend on
+    the algorithm, so an algorithm can never be redefined:
+    a changed definition has to be registered under a new name
+    (by convention, names end with a version suffix, e.g. "_v2").
+    """
+    assert isinstance(name, str) and len(name) > 0
+    assert callable(factory)
+    assert name not in HASH_ALGORITHMS, (
+        f"Hash algorithm {name} is already registered")
+    HASH_ALGORITHMS[name] = factory
+
+
+register_hash_algorithm("sha256", hashlib.sha256) # legacy default
+register_hash_algorithm("blake2b_v1", lambda: hashlib.blake2b(digest_size=32))
+register_hash_algorithm("blake2s_v1", lambda: hashlib.blake2s(digest_size=32))
+register_hash_algorithm("sha3_256_v1", hashlib.sha3_256)
+register_hash_algorithm("sha512_v1", hashlib.sha512)
+
+
+def new_hasher(hash_type_name: str | None = None) -> Any:
+    """Create a new hasher for a registered algorithm.
+
+    If no algorithm is specified, the module default hash_type is used.
+    """
+    if hash_type_name is None:
+        hash_type_name = hash_type
+    assert hash_type_name in HASH_ALGORITHMS, (
+        f"Unknown hash algorithm {hash_type_name}, registered algorithms"
+        + f" are: {list(HASH_ALGORITHMS)}")
+    return HASH_ALGORITHMS[hash_type_name]()
+
+
+class _HashingOptions(NamedTuple):
+    hash_type: str
+    parallel_threshold: int | None
+
+
+def get_base16_joblib_hash_signature(x:Any
+        , hash_type_name:str|None = None) -> str:
     if 'numpy' in sys.modules:
-        hasher = joblib.hashing.NumpyHasher(hash_name=hash_type)
+        hasher = joblib.hashing.NumpyHasher(hash_name="sha256")
     else:
-        hasher = joblib.hashing.Hasher(hash_name=hash_type)
+        hasher = joblib.hashing.Hasher(hash_name="sha256")
+    # joblib only supports hashlib algorithm names,
+    # so its internal hash object is replaced
+    hasher._hash = new_hasher(hash_type_name)
     hash_signature = hasher.hash(x)
     return str(hash_signature)
 
-def get_base32_hash_signature(x:Any) -> str:
+
+def _update_with_str(hasher, s: str) -> None:
+    """Feed a length-prefixed string into a hasher."""
+    data = s.encode("utf-8", errors="surrogatepass")
+    hasher.update(str(len(data)).encode() + b":")
+    hasher.update(data)
+
+
+def _update_with_type(hasher, x: Any) -> None:
+    _update_with_str(hasher
+        , type(x).__module__ + "." + type(x).__qualname__)
+
+
+def _update_with_joblib(hasher, x: Any, options: _HashingOptions) -> None:
+    _update_with_str(hasher, "joblib")
+    _update_with_str(hasher
+        , get_base16_joblib_hash_signature(x, options.hash_type))
+
+
+def _get_hashing_pool() -> ThreadPoolExecutor:
+    """Get a thread pool for parallel hashing (one per process)."""
+    global _hashing_pool
+    with _hashing_pool_lock:
+        if _hashing_pool is None or _hashing_pool[0] != os.getpid():
+            _hashing_pool = (os.getpid(), ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1
+                , thread_name_prefix="pythagoras_hashing"))
+        return _hashing_pool[1]
+
+
+def _hash_chunk(hash_type_name: str, chunk: memoryview) -> bytes:
+    hasher = new_hasher(hash_type_name)
+    hasher.update(chunk)
+    return hasher.digest()
+
+
+def _update_with_data(hasher, data: memoryview
+        , options: _HashingOptions) -> None:
+    """Feed a contiguous buffer into a hasher.
+
+    Buffers of options.parallel_threshold bytes or more are hashed as a tree:
+    chunks of PARALLEL_HASHING_CHUNK_SIZE bytes are hashed on a thread
+    pool (hashlib releases the GIL), then digests of all the chunks
+    are fed into the hasher. A tree hash differs from a sequential one,
+    so all processes must use the same threshold to get the same hashes.
+    """
+    data = data.cast("B")
+    parallel_threshold = options.parallel_threshold
+    if not parallel_threshold or data.nbytes < parallel_threshold:
+        hasher.update(data)
+        return
+    chunks = [data[i:i + PARALLEL_HASHING_CHUNK_SIZE]
+        for i in range(0, data.nbytes, PARALLEL_HASHING_CHUNK_SIZE)]
+    digests = _get_hashing_pool().map(
+        _hash_chunk, [options.hash_type] * len(chunks), chunks)
+    _update_with_str(hasher
+        , f"tree|{options.hash_type}|{PARALLEL_HASHING_CHUNK_SIZE}")
+    for digest in digests:
+        hasher.update(digest)
+
+
+def _update_with_buffer(hasher, x: Any
+        , options: _HashingOptions) -> bool:
+    """Feed bytes, bytearrays, memoryviews and strings into a hasher."""
+    if isinstance(x, str):
+        _update_with_type(hasher, x)
+        _update_with_str(hasher, x)
+        return True
+    if isinstance(x, memoryview):
+        if not x.c_contiguous:
+            return False
+        _update_with_type(hasher, x)
+        _update_with_str(hasher, f"{x.format}|{x.shape}")
+    elif isinstance(x, (bytes, bytearray)):
+        _update_with_type(hasher, x)
+    else:
+        return False
+    _update_with_str(hasher, str(memoryview(x).nbytes))
+    _update_with_data(hasher, memoryview(x), options)
+    return True
+
+
+def _update_with_ndarray(hasher, x: Any
+        , options: _HashingOptions) -> bool:
+    """Feed a Numpy array into a hasher, without pickling it.
+
+    The array's type, dtype, shape and strides are hashed together
+    with its data buffer. C- or F-contiguous buffers are hashed
+    in place; other arrays are copied into a contiguous buffer first.
+    Arrays of Python objects are not supported.
+    """
+    np = sys.modules["numpy"]
+    if type(x) not in (np.ndarray, np.memmap) or x.dtype.hasobject:
+        return False
+    _update_with_str(hasher, "numpy.ndarray")
+    _update_with_str(hasher
+        , f"{x.dtype.str}|{x.dtype.descr}|{x.shape}|{x.strides}")
+    if x.flags.c_contiguous:
+        data = x
+    elif x.flags.f_contiguous:
+        data = x.T
+    else:
+        data = np.ascontiguousarray(x)
+    _update_with_data(hasher
+        , memoryview(data.reshape(-1).view(np.uint8)), options)
+    return True
+
+
+def _update_with_str_array(hasher, x: Any) -> bool:
+    """Feed a 1-D object array of strings into a hasher, without pickling it."""
+    np = sys.modules["numpy"]
+    if x.ndim != 1 or not all(type(s) is str for s in x):
+        return False
+    encoded = [s.encode("utf-8", errors="surrogatepass") for s in x]
+    lengths = np.fromiter(map(len, encoded), dtype="<i8", count=len(encoded))
+    _update_with_str(hasher, "str_array")
+    hasher.update(memoryview(lengths.view(np.uint8)))
+    hasher.update(b"".join(encoded))
+    return True
+
+
+def _update_with_pandas(hasher, x: Any
+        , options: _HashingOptions) -> bool:
+    """Feed a Pandas Index, Series or DataFrame into a hasher.
+
+    Columns with Numpy (non-object) dtypes are hashed as arrays,
+    so are object columns that contain only strings;
+    all other columns (and labels) are hashed by joblib.
+    """
+    pd = sys.modules["pandas"]
+    if type(x) is pd.DataFrame:
+        _update_with_type(hasher, x)
+        _update_with_typed(hasher, x.columns, options)
+        _update_with_typed(hasher, x.index, options)
+        for _, column in x.items():
+            _update_with_typed(hasher, column, options)
+        return True
+    if type(x) is pd.Series:
+        _update_with_type(hasher, x)
+        _update_with_joblib(hasher, x.name, options)
+        _update_with_typed(hasher, x.index, options)
+        _update_with_str(hasher, str(x.dtype))
+    elif type(x) is pd.Index:
+        _update_with_type(hasher, x)
+        _update_with_joblib(hasher, x.name, options)
+        _update_with_str(hasher, str(x.dtype))
+    else:
+        return False
+    np = sys.modules["numpy"]
+    if isinstance(x.dtype, np.dtype) and not x.dtype.hasobject:
+        _update_with_ndarray(
+            hasher, x.to_numpy(copy=False), options)
+    else:
+        values = x.to_numpy()
+        if not _update_with_str_array(hasher, values):
+            _update_with_joblib(hasher, values, options)
+    return True
+
+
+def _update_with_tensor(hasher, x: Any
+        , options: _HashingOptions) -> bool:
+    """Feed a CPU Torch tensor into a hasher, without pickling it."""
+    torch = sys.modules["torch"]
+    if type(x) is not torch.Tensor or x.device.type != "cpu":
+        return False
+    x = x.detach()
+    _update_with_type(hasher, x)
+    _update_with_str(hasher
+        , f"{x.dtype}|{tuple(x.shape)}|{x.stride()}|{x.requires_grad}")
+    data = x.contiguous().reshape(-1).view(torch.uint8)
+    _update_with_data(hasher, memoryview(data.numpy()), options)
+    return True
+
+
+def _update_with_typed(hasher, x: Any
+        , options: _HashingOptions) -> None:
+    if _update_with_buffer(hasher, x, options):
+        return
+    if ("numpy" in sys.modules
+            and _update_with_ndarray(hasher, x, options)):
+        return
+    if ("pandas" in sys.modules
+            and _update_with_pandas(hasher, x, options)):
+        return
+    if ("torch" in sys.modules
+            and _update_with_tensor(hasher, x, options)):
+        return
+    _update_with_joblib(hasher, x, options)
+
+
+def get_base16_typed_hash_signature(x:Any
+        , parallel_threshold:int|None = None
+        , hash_type_name:str|None = None) -> str:
+    """Return base16 hash signature of an object, hashing its buffers directly.
+
+    Strings, bytes, Numpy arrays, Pandas objects and CPU Torch tensors
+    are hashed without pickling: their contiguous data buffers are fed
+    directly into the hash, together with their types and layouts.
+    All other objects are hashed by joblib.
+
+    Buffers of parallel_threshold bytes or more (if it's not None/0)
+    are hashed in parallel, see _update_with_data().
+    """
+    if hash_type_name is None:
+        hash_type_name = hash_type
+    hasher = new_hasher(hash_type_name)
+    options = _HashingOptions(hash_type_name, parallel_threshold)
+    _update_with_typed(hasher, x, options)
+    return hasher.hexdigest()
+
+
+def get_base16_hash_signature(x:Any, engine:str = "joblib"
+        , parallel_threshold:int|None = None
+        , hash_type_name:str|None = None) -> str:
+    assert engine in HASHING_ENGINES
+    if engine == "typed":
+        return get_base16_typed_hash_signature(
+            x, parallel_threshold, hash_type_name)
+    return get_base16_joblib_hash_signature(x, hash_type_name)
+
+def get_base32_hash_signature(x:Any, engine:str = "joblib"
+        , parallel_threshold:int|None = None
+        , hash_type_name:str|None = None) -> str:
     """Return base32 hash signature of an object"""
-    base_16_hash = get_base16_hash_signature(x)
+    base_16_hash = get_base16_hash_signature(
+        x, engine, parallel_threshold, hash_type_name)
     base_32_hash = convert_base16_to_base32(base_16_hash)
     return base_32_hash
 
-def get_hash_signature(x:Any) -> str:
-    return get_base32_hash_signature(x)[:max_signature_length]
-
+def get_hash_signature(x:Any, engine:str = "joblib"
+        , parallel_threshold:int|None = None
+        , hash_type_name:str|None = None) -> str:
+    return get_base32_hash_signature(
+        x, engine, parallel_threshold, hash_type_name)[:max_signature_length]
@@ -0,0 +1 @@
+from .size_bounded_lru import *
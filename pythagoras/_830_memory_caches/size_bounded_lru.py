@@ -0,0 +1,112 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+def estimate_size(value: Any) -> int:
+    """Roughly estimate the memory footprint of a value, in bytes.
+
+    Numpy arrays and Pandas objects report the size of their data,
+    for containers the sizes of (top-level) elements are added up.
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes + sys.getsizeof(value)
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            usage = memory_usage(deep=True)
+            return int(getattr(usage, "sum", lambda: usage)())
+        except:
+            pass
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(v) for v in value)
+    elif isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v)
+            for k, v in value.items())
+    return size
+
+
+class SizeBoundedLRU:
+    """An in-memory mapping with least-recently-used eviction.
+
+    The mapping is bounded both by the number of items
+    and by the total (estimated) size of stored values.
+    When either limit is exceeded, the least recently used items
+    are evicted. Values larger than max_bytes are not stored at all.
+
+    The class is thread-safe. It counts cache hits and misses,
+    which helps to tune the limits.
+    """
+
+    max_items: int
+    max_bytes: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_items: int = 10_000, max_bytes: int = 2**28):
+        assert int(max_items) >= 1
+        assert int(max_bytes) >= 1
+        self.max_items = int(max_items)
+        self.max_bytes = int(max_bytes)
+        self._items: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    @property
+    def total_bytes(self) -> int:
+        """Estimated total size of all stored values."""
+        return self._total_bytes
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value for key (marking it recently used), or default."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any, size: int | None = None) -> None:
+        """Store a value, evicting least recently used items if needed."""
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            old_item = self._items.pop(key, None)
+            if old_item is not None:
+                self._total_bytes -= old_item[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self._total_bytes += size
+            while (len(self._items) > self.max_items
+                    or self._total_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def discard(self, key: Hashable) -> None:
+        """Remove a key, if present."""
+        with self._lock:
+            old_item = self._items.pop(key, None)
+            if old_item is not None:
+                self._total_bytes -= old_item[1]
+
+    def clear(self) -> None:
+        """Remove all items."""
+        with self._lock:
+            self._items.clear()
+            self._total_bytes = 0
@@ -12,6 +12,7 @@ from persidict import PersiDict
 from pythagoras._800_persidict_extensions import *
 from pythagoras._810_output_manipulators import *
 from pythagoras._820_strings_signatures_converters import *
+from pythagoras._830_memory_caches import *
 
 from pythagoras._010_basic_portals import *
 from pythagoras._010_basic_portals import _PortalTester
@@ -27,6 +27,7 @@ setuptools.setup(
         , "pythagoras._800_persidict_extensions"
         , "pythagoras._810_output_manipulators"
         , "pythagoras._820_strings_signatures_converters"
+        , "pythagoras._830_memory_caches"
         ]
     ,classifiers=[
         "Development Status :: 3 - Alpha"